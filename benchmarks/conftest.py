@@ -0,0 +1,32 @@
+"""
+Headless benchmarks of the core runtime and the GStreamer paths, run with pytest-benchmark:
+
+```sh
+pytest benchmarks --benchmark-json=benchmark.json
+pytest benchmarks --benchmark-autosave                     # saved under .benchmarks/, with the commit
+pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:10%
+```
+
+GStreamer benchmarks only require `videotestsrc`, so they run without a desktop, and are skipped without GStreamer.
+"""
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def gst():
+    """The `Gst` module, with `owa_env_gst` importable. Skips the benchmark if GStreamer is not installed."""
+    try:
+        import gi
+
+        gi.require_version("Gst", "1.0")
+        from gi.repository import Gst
+
+        import owa_env_gst  # noqa: F401
+    except (ImportError, ValueError) as e:
+        pytest.skip(f"GStreamer is not available: {e}")
+    if not Gst.is_initialized():
+        Gst.init(None)
+    if Gst.ElementFactory.find("videotestsrc") is None:
+        pytest.skip("videotestsrc is not installed")
+    return Gst
@@ -0,0 +1,76 @@
+import itertools
+
+import pytest
+
+pytest.importorskip("data_collection")
+
+from data_collection.binlog import BinaryLogSink  # noqa: E402
+from data_collection.decimation import MoveDecimator  # noqa: E402
+from data_collection.writer import EventWriter, FileSink, serialize_event  # noqa: E402
+
+NUM_EVENTS = 10_000
+
+
+def _events(num_events: int) -> list[tuple]:
+    """A mix of the events of a recording, dominated by mouse moves."""
+    events = []
+    for i in range(num_events):
+        if i % 10 == 0:
+            event = ("keyboard.press", 65 + i % 26)
+        elif i % 25 == 0:
+            event = ("mouse.click", i % 1920, i % 1080, "left", True)
+        else:
+            event = ("mouse.move", i % 1920, i % 1080)
+        events.append((1_741_608_540_000_000_000 + i * 1_000_000, "control_publisher", event))
+    return events
+
+
+def test_serialize_event(benchmark):
+    benchmark(serialize_event, 1_741_608_540_000_000_000, "control_publisher", ("mouse.move", 960, 540))
+
+
+def test_event_writer_put(benchmark, tmp_path):
+    """Cost of `put` on the input hook thread, with the writer draining to a file in the background."""
+    writer = EventWriter().configure(FileSink(tmp_path / "events.jsonl"))
+    writer.start()
+    counter = itertools.count()
+    try:
+        benchmark(lambda: writer.put(("mouse.move", next(counter) % 1920, 540), source="control_publisher"))
+    finally:
+        writer.stop()
+        writer.join()
+    benchmark.extra_info["writer_stats"] = writer.stats()
+
+
+@pytest.mark.parametrize("sink", ["jsonl", "jsonl.zst", "evlog"])
+def test_sink_write_events(benchmark, tmp_path, sink):
+    """Throughput of the writer thread: serialization and I/O of a batch of events."""
+    if sink == "jsonl.zst":
+        zstdlog = pytest.importorskip("data_collection.zstdlog", reason="zstandard is not installed")
+        pytest.importorskip("zstandard")
+        make_sink = zstdlog.ZstdLogSink
+    else:
+        make_sink = {"jsonl": FileSink, "evlog": BinaryLogSink}[sink]
+    events = _events(NUM_EVENTS)
+    paths = (tmp_path / f"events_{i}.{sink}" for i in itertools.count())
+
+    def run():
+        event_sink = make_sink(next(paths))
+        event_sink.write_events(events)
+        event_sink.close()
+
+    benchmark(run)
+    benchmark.extra_info["num_events"] = NUM_EVENTS
+
+
+def test_move_decimator(benchmark):
+    events = _events(NUM_EVENTS)
+    emitted = []
+
+    def run():
+        decimator = MoveDecimator(lambda event, timestamp_ns: emitted.append(event), max_rate=60)
+        for timestamp_ns, _, event in events:
+            decimator.put(event, timestamp_ns)
+        decimator.close()
+
+    benchmark(run)
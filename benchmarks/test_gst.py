@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from owa.metrics import MetricManager
+
+WIDTH, HEIGHT = 1920, 1080
+DELIVERY_SECONDS = 3.0
+
+
+@pytest.fixture
+def frame_sample(gst):
+    """A 1080p BGRA sample, as delivered by the screen capture."""
+    caps = gst.Caps.from_string(f"video/x-raw,format=BGRA,width={WIDTH},height={HEIGHT}")
+    buf = gst.Buffer.new_wrapped(bytes(WIDTH * HEIGHT * 4))
+    return gst.Sample.new(buf, caps, None, None)
+
+
+def test_sample_to_ndarray(benchmark, frame_sample):
+    from owa_env_gst.utils import sample_to_ndarray
+
+    frame = benchmark(sample_to_ndarray, frame_sample)
+    assert frame.shape == (HEIGHT, WIDTH, 4)
+
+
+@pytest.mark.parametrize("fps", [60, 240])
+def test_appsink_delivery(benchmark, gst, fps):
+    """
+    Frames of a live `videotestsrc` delivered to a Python callback at the given rate. Besides the wall-clock time
+    of the run, the delivered rate, the dropped frames and the latency percentiles are reported in `extra_info`.
+    """
+    from owa_env_gst.gst_runner import GstPipelineRunner
+    from owa_env_gst.utils import sample_to_ndarray
+
+    metrics = MetricManager(max_history=int(fps * DELIVERY_SECONDS))
+
+    def callback(sample, metadata):
+        sample_to_ndarray(sample)
+        metrics.append(metadata["frame_time_ns"], metadata["latency"])
+
+    def run():
+        runner = GstPipelineRunner().configure(
+            f"videotestsrc is-live=true pattern=ball ! "
+            f"video/x-raw,format=BGRA,width={WIDTH},height={HEIGHT},framerate={fps}/1 ! "
+            "queue leaky=downstream max-size-buffers=1 ! appsink name=appsink"
+        )
+        runner.register_appsink_callback(callback)
+        runner.enable_drop_stats()
+        runner.start()
+        time.sleep(DELIVERY_SECONDS)
+        drop_stats = runner.get_drop_stats()
+        runner.stop()
+        runner.join()
+        return drop_stats
+
+    drop_stats = benchmark.pedantic(run, rounds=1, iterations=1)
+
+    benchmark.extra_info.update(
+        target_fps=fps,
+        delivered_fps=metrics.fps,
+        latency_p50_ms=metrics.latency_p50 * 1000,
+        latency_p99_ms=metrics.latency_p99 * 1000,
+        jitter_ms=metrics.jitter * 1000,
+        dropped=sum(stage["dropped"] or 0 for stage in drop_stats.values()),
+    )
@@ -0,0 +1,67 @@
+from owa.listener import ListenerThread
+from owa.metrics import MetricManager
+from owa.runnable import RunnableProcess, RunnableThread
+
+
+class IdleThread(RunnableThread):
+    def loop(self, *, stop_event):
+        stop_event.wait()
+
+
+class IdleProcess(RunnableProcess):
+    def loop(self, *, stop_event):
+        stop_event.wait()
+
+
+class BurstListener(ListenerThread):
+    """Listener which delivers `num_events` events to its callback as fast as possible."""
+
+    def on_configure(self, num_events: int):
+        self.num_events = num_events
+
+    def loop(self, *, stop_event, callback):
+        for i in range(self.num_events):
+            callback(i)
+
+
+def _start_stop(runnable_cls):
+    runnable = runnable_cls().configure()
+    runnable.start()
+    runnable.stop()
+    runnable.join()
+
+
+def test_thread_start_stop(benchmark):
+    benchmark(_start_stop, IdleThread)
+
+
+def test_process_start_stop(benchmark):
+    benchmark.pedantic(_start_stop, args=(IdleProcess,), rounds=5, iterations=1, warmup_rounds=1)
+
+
+def test_listener_dispatch(benchmark):
+    num_events = 100_000
+    received = []
+
+    def run():
+        received.clear()
+        listener = BurstListener().configure(num_events, callback=received.append)
+        listener.start()
+        listener.join()
+
+    benchmark(run)
+    assert len(received) == num_events
+    benchmark.extra_info["num_events"] = num_events
+
+
+def test_metric_manager_append(benchmark):
+    metrics = MetricManager()
+    timestamp = iter(range(0, 1 << 62, 16_666_667))
+    benchmark(lambda: metrics.append(next(timestamp), 5_000_000))
+
+
+def test_metric_manager_report(benchmark):
+    metrics = MetricManager()
+    for i in range(100):
+        metrics.append(i * 16_666_667, 5_000_000 + i)
+    benchmark(metrics.summary)
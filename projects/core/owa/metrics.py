@@ -0,0 +1,183 @@
+"""
+Metrics for listeners which deliver a stream of timestamped events, e.g. frames of a screen capture.
+"""
+
+import math
+
+import numpy as np
+
+S_TO_NS = 1_000_000_000
+
+
+class MetricManager:
+    """
+    Fixed-size ring buffer of event timestamps and latencies with O(1) append.
+
+    Reports tail latency (p50/p95/p99), inter-event jitter, the longest gap between events and both a windowed
+    and an exponentially-decayed rate estimate. Statistics are computed over the most recent `max_history` events.
+
+    Example:
+    ```python
+    metrics = MetricManager()
+
+    def callback(frame):
+        metrics.append(frame.timestamp_ns, latency_ns)
+        print(f"FPS: {metrics.fps:.2f}, p99 latency: {metrics.latency_p99 * 1000:.2f} ms")
+    ```
+    """
+
+    def __init__(self, max_history: int = 100, fps_time_constant: float = 1.0):
+        """
+        Args:
+            max_history: Number of most recent events kept in the ring buffer.
+            fps_time_constant: Time constant in seconds of the exponentially-decayed rate estimate.
+        """
+        self._max_history = max_history
+        self._timestamps = np.zeros(max_history, dtype=np.int64)
+        self._latencies = np.zeros(max_history, dtype=np.int64)
+        self._count = 0
+
+        self._fps_time_constant_ns = fps_time_constant * S_TO_NS
+        self._interval_ema_ns = 0.0
+
+    def __len__(self):
+        return min(self._count, self._max_history)
+
+    def append(self, timestamp_ns: int, latency: int):
+        """
+        Add a new event timestamp and latency measurement.
+
+        Args:
+            timestamp_ns: Event timestamp in nanoseconds
+            latency: Latency in nanoseconds
+        """
+        idx = self._count % self._max_history
+        if self._count > 0:
+            interval_ns = timestamp_ns - int(self._timestamps[idx - 1])
+            if self._interval_ema_ns == 0.0:
+                self._interval_ema_ns = float(interval_ns)
+            elif interval_ns > 0:
+                # weight each interval by the time it spans, so the estimate decays with time, not event count
+                alpha = 1.0 - math.exp(-interval_ns / self._fps_time_constant_ns)
+                self._interval_ema_ns += alpha * (interval_ns - self._interval_ema_ns)
+
+        self._timestamps[idx] = timestamp_ns
+        self._latencies[idx] = latency
+        self._count += 1
+
+    def _ordered(self, values: np.ndarray) -> np.ndarray:
+        """Return the recorded values in chronological order."""
+        if self._count <= self._max_history:
+            return values[: self._count]
+        idx = self._count % self._max_history
+        return np.concatenate((values[idx:], values[:idx]))
+
+    def _intervals(self) -> np.ndarray:
+        return np.diff(self._ordered(self._timestamps))
+
+    @property
+    def latency(self) -> float:
+        """
+        Returns the average latency in seconds.
+
+        Returns:
+            float: Average latency or 0.0 if no data
+        """
+        if self._count == 0:
+            return 0.0
+        return float(self._latencies[: len(self)].mean()) / S_TO_NS
+
+    def latency_percentile(self, q: float) -> float:
+        """
+        Returns the q-th percentile of latency in seconds.
+
+        Args:
+            q: Percentile to compute, between 0 and 100
+
+        Returns:
+            float: Latency percentile or 0.0 if no data
+        """
+        if self._count == 0:
+            return 0.0
+        return float(np.percentile(self._latencies[: len(self)], q)) / S_TO_NS
+
+    @property
+    def latency_p50(self) -> float:
+        return self.latency_percentile(50)
+
+    @property
+    def latency_p95(self) -> float:
+        return self.latency_percentile(95)
+
+    @property
+    def latency_p99(self) -> float:
+        return self.latency_percentile(99)
+
+    @property
+    def fps(self) -> float:
+        """
+        Calculate events per second over the recorded window.
+
+        Returns:
+            float: Calculated FPS or 0.0 if insufficient data
+        """
+        if self._count < 2:
+            return 0.0
+
+        timestamps = self._ordered(self._timestamps)
+        time_diff_sec = (timestamps[-1] - timestamps[0]) / S_TO_NS
+        if time_diff_sec <= 0:
+            return 0.0
+        return (len(timestamps) - 1) / time_diff_sec
+
+    @property
+    def decayed_fps(self) -> float:
+        """
+        Exponentially-decayed events per second, which reacts to rate changes within `fps_time_constant`.
+
+        Returns:
+            float: Decayed FPS or 0.0 if insufficient data
+        """
+        if self._interval_ema_ns <= 0:
+            return 0.0
+        return S_TO_NS / self._interval_ema_ns
+
+    @property
+    def jitter(self) -> float:
+        """
+        Standard deviation of the intervals between events, in seconds.
+
+        Returns:
+            float: Jitter or 0.0 if insufficient data
+        """
+        if self._count < 3:
+            return 0.0
+        return float(self._intervals().std()) / S_TO_NS
+
+    @property
+    def max_gap(self) -> float:
+        """
+        Longest interval between two consecutive events, in seconds.
+
+        Returns:
+            float: Longest gap or 0.0 if insufficient data
+        """
+        if self._count < 2:
+            return 0.0
+        return float(self._intervals().max()) / S_TO_NS
+
+    def summary(self) -> dict:
+        """Returns every metric as a dictionary, e.g. for logging."""
+        return dict(
+            fps=self.fps,
+            decayed_fps=self.decayed_fps,
+            latency=self.latency,
+            latency_p50=self.latency_p50,
+            latency_p95=self.latency_p95,
+            latency_p99=self.latency_p99,
+            jitter=self.jitter,
+            max_gap=self.max_gap,
+        )
+
+
+__all__ = ["MetricManager"]
@@ -8,6 +8,7 @@ optimized for Windows environments with special handling for process group signa
 
 import signal
 import subprocess
+import threading
 
 from loguru import logger
 
@@ -80,17 +81,21 @@ class SubprocessRunner(RunnableThread):
     ```
     """
 
-    def on_configure(self, subprocess_args, stop_signal=signal.CTRL_BREAK_EVENT):
+    def on_configure(self, subprocess_args, stop_signal=signal.CTRL_BREAK_EVENT, output_callback=None):
         """
         Configure the subprocess runner with command arguments.
 
         Args:
             subprocess_args: List or string containing the command and arguments
                              to be executed as a subprocess.
+            output_callback: (Optional) called with every line of the standard output of the subprocess,
+                             from a dedicated thread. If None, the output is inherited from this process.
         """
         self._process = None  # Reference to the subprocess once started
         self.subprocess_args = subprocess_args
         self._stop_signal = stop_signal
+        self._output_callback = output_callback
+        self._output_thread = None
 
     def loop(self):
         """
@@ -113,7 +118,19 @@ class SubprocessRunner(RunnableThread):
         When a stop is requested, sends a break event to allow clean termination.
         """
         # Start the subprocess with CREATE_NEW_PROCESS_GROUP flag for proper signal handling in Windows
-        self._process = subprocess.Popen(self.subprocess_args, creationflags=subprocess.CREATE_NEW_PROCESS_GROUP)
+        if self._output_callback is None:
+            self._process = subprocess.Popen(self.subprocess_args, creationflags=subprocess.CREATE_NEW_PROCESS_GROUP)
+        else:
+            self._process = subprocess.Popen(
+                self.subprocess_args,
+                creationflags=subprocess.CREATE_NEW_PROCESS_GROUP,
+                stdout=subprocess.PIPE,
+                text=True,
+                errors="replace",
+                bufsize=1,
+            )
+            self._output_thread = threading.Thread(target=self._read_output, args=(self._process.stdout,), daemon=True)
+            self._output_thread.start()
 
         # Monitor the process and check for stop event
         while self._process.poll() is None:  # None indicates the process is still running
@@ -131,6 +148,14 @@ class SubprocessRunner(RunnableThread):
         else:
             logger.error(f"SubprocessRunner terminated with return code {rt}")
 
+    def _read_output(self, stream):
+        """Forward the output of the subprocess line by line, until it closes its output."""
+        for line in stream:
+            try:
+                self._output_callback(line.rstrip("\r\n"))
+            except Exception:
+                logger.exception("Output callback of SubprocessRunner raised an exception.")
+
     def cleanup(self):
         """
         Clean up resources and ensure subprocess termination.
@@ -156,5 +181,10 @@ class SubprocessRunner(RunnableThread):
                 traceback.print_exc()
                 pass  # Continue cleanup despite errors
 
+        # Deliver the remaining output before the process is released
+        if self._output_thread is not None:
+            self._output_thread.join(timeout=5)
+            self._output_thread = None
+
         # Clear the process reference
         self._process = None
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from owa.metrics import MetricManager
+
+
+def test_metric_manager_empty():
+    metrics = MetricManager()
+    assert metrics.fps == 0.0
+    assert metrics.decayed_fps == 0.0
+    assert metrics.latency == 0.0
+    assert metrics.latency_p99 == 0.0
+    assert metrics.jitter == 0.0
+    assert metrics.max_gap == 0.0
+
+
+def test_metric_manager_ring():
+    metrics = MetricManager(max_history=100, fps_time_constant=0.2)
+    interval_ns = 1_000_000_000 // 60
+    timestamp_ns = 0
+    for i in range(250):
+        # a single 100 ms stall inside the last window
+        timestamp_ns += 100_000_000 if i == 200 else interval_ns
+        metrics.append(timestamp_ns, latency=(i % 10) * 1_000_000)
+
+    assert len(metrics) == 100
+    assert metrics.max_gap == pytest.approx(0.1)
+    assert metrics.fps == pytest.approx(99 / ((99 * interval_ns + 100_000_000 - interval_ns) / 1e9))
+    assert metrics.latency == pytest.approx(0.0045)
+    assert metrics.latency_p50 == pytest.approx(np.percentile(np.arange(10), 50) / 1000)
+    assert metrics.latency_p99 == pytest.approx(0.009, abs=1e-4)
+    assert metrics.jitter > 0
+    # the decayed estimate has recovered to the nominal rate after the stall
+    assert metrics.decayed_fps == pytest.approx(60, rel=0.05)
@@ -0,0 +1,176 @@
+"""
+Alignment of input events with video frames.
+
+Every frame owns a window of time, and the events within it are summarized into per-frame columns with
+`np.searchsorted` and scatter operations, without a Python loop over events or frames.
+
+Window semantics:
+- `past`: frame `i` owns `(t[i-1], t[i]]`, i.e. the input which led to the frame being displayed.
+- `future`: frame `i` owns `[t[i], t[i+1])`, i.e. the input performed while the frame was displayed.
+
+The first `past` window and the last `future` window span one frame interval.
+
+Example:
+```python
+events = load_events("recording.jsonl")
+frame_utc_ns = read_timestamp_track("recording.mkv").pts_to_utc(build_video_index("recording.mkv").pts_ns)
+actions = align_events(events, frame_utc_ns, window="future")
+actions.keys_down  # [N, 256] bool
+```
+"""
+
+from typing import Literal, NamedTuple
+
+import numpy as np
+
+from .events import EventKind, EventTable
+
+NUM_KEYS = 256
+NUM_BUTTONS = 3
+
+Window = Literal["past", "future"]
+
+
+class FrameActions(NamedTuple):
+    """Per-frame summary of input events. State columns are taken at the end of each frame's window."""
+
+    keys_down: np.ndarray  # [N, 256] bool, keys held down
+    keys_pressed: np.ndarray  # [N, 256] bool, keys pressed within the window, including taps shorter than a frame
+    buttons_down: np.ndarray  # [N, 3] bool, left/right/middle buttons held down
+    clicks: np.ndarray  # [N, 3] int32, number of button presses within the window
+    mouse_xy: np.ndarray  # [N, 2] int32, pointer position, zero until the first mouse event
+    mouse_delta: np.ndarray  # [N, 2] int32, pointer movement within the window
+    scroll: np.ndarray  # [N, 2] int32, sum of scroll amounts within the window
+    num_events: np.ndarray  # [N] int32, number of events within the window
+
+    def __len__(self):
+        return len(self.num_events)
+
+
+def window_edges(frame_utc_ns: np.ndarray, window: Window = "past") -> np.ndarray:
+    """
+    Boundaries of the frames' windows, where frame `i` owns the window between edges `i` and `i + 1`.
+
+    Args:
+        frame_utc_ns: [N] sorted timestamps of the frames
+        window: Window semantics, "past" or "future"
+
+    Returns:
+        np.ndarray: [N + 1] int64 window edges
+    """
+    frame_utc_ns = np.asarray(frame_utc_ns, dtype=np.int64)
+    if len(frame_utc_ns) == 0:
+        raise ValueError("At least one frame is required")
+    interval = int(frame_utc_ns[-1] - frame_utc_ns[-2]) if len(frame_utc_ns) > 1 else 0
+    if window == "past":
+        first_interval = int(frame_utc_ns[1] - frame_utc_ns[0]) if len(frame_utc_ns) > 1 else 0
+        return np.concatenate(([frame_utc_ns[0] - first_interval], frame_utc_ns))
+    if window == "future":
+        return np.concatenate((frame_utc_ns, [frame_utc_ns[-1] + interval]))
+    raise ValueError(f"Unknown window: {window}")
+
+
+def assign_events(timestamp_ns: np.ndarray, edges: np.ndarray, window: Window = "past") -> np.ndarray:
+    """
+    Index of the frame whose window contains each event.
+
+    Args:
+        timestamp_ns: [E] timestamps of the events
+        edges: [N + 1] window edges, see `window_edges`
+        window: Window semantics, which decides whether windows are closed on the right or on the left
+
+    Returns:
+        np.ndarray: [E] int64 frame indices, -1 for events before the first window and N for events after the last
+    """
+    side = "left" if window == "past" else "right"
+    idx = np.searchsorted(edges, timestamp_ns, side=side) - 1
+    return np.clip(idx, -1, len(edges) - 1)
+
+
+def _last_state(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, shape: tuple) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Forward-filled state of each column at the end of each row, given chronological (row, col, value) updates.
+    Row 0 holds the state before the first window, so `rows` are frame indices plus one.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: [R, C] states and whether each state has ever been set
+    """
+    num_rows, num_cols = shape
+    # keep the last update of every (row, col) pair; updates are chronological, so the last occurrence wins
+    flat = rows * num_cols + cols
+    _, last = np.unique(flat[::-1], return_index=True)
+    last = len(flat) - 1 - last
+
+    state = np.zeros(shape, dtype=values.dtype)
+    state[rows[last], cols[last]] = values[last]
+    updated = np.zeros(shape, dtype=bool)
+    updated[rows[last], cols[last]] = True
+
+    # carry every column's most recent update forward over the rows without one
+    source = np.where(updated, np.arange(num_rows)[:, None], 0)
+    np.maximum.accumulate(source, axis=0, out=source)
+    valid = np.logical_or.accumulate(updated, axis=0)
+    return state[source, np.arange(num_cols)], valid
+
+
+def align_events(events: EventTable, frame_utc_ns: np.ndarray, *, window: Window = "past") -> FrameActions:
+    """
+    Summarize the events of each frame's window.
+
+    Args:
+        events: Events of the recording, sorted by timestamp
+        frame_utc_ns: [N] sorted UTC timestamps of the frames
+        window: Window semantics, "past" or "future"
+
+    Returns:
+        FrameActions: Per-frame summary of the events
+    """
+    edges = window_edges(frame_utc_ns, window)
+    num_frames = len(edges) - 1
+    # events after the last window affect none of the columns
+    end = np.searchsorted(events.timestamp_ns, edges[-1], side="right" if window == "past" else "left")
+    events = events.select(slice(0, end))
+    frame_idx = assign_events(events.timestamp_ns, edges, window)
+    in_window = (frame_idx >= 0) & (frame_idx < num_frames)
+
+    keys = (events.kind == EventKind.KEY) & (events.code >= 0) & (events.code < NUM_KEYS)
+    clicks = (events.kind == EventKind.MOUSE_CLICK) & (events.code >= 1) & (events.code <= NUM_BUTTONS)
+    mouse = events.kind != EventKind.KEY
+    scroll = (events.kind == EventKind.MOUSE_SCROLL) & in_window
+
+    # stateful columns use row 0 for the state before the first window
+    state_rows = frame_idx + 1
+    keys_down, _ = _last_state(state_rows[keys], events.code[keys], events.pressed[keys], (num_frames + 1, NUM_KEYS))
+    buttons_down, _ = _last_state(
+        state_rows[clicks], events.code[clicks] - 1, events.pressed[clicks], (num_frames + 1, NUM_BUTTONS)
+    )
+    mouse_rows = np.repeat(state_rows[mouse], 2)
+    mouse_cols = np.tile([0, 1], int(mouse.sum()))
+    mouse_values = np.stack([events.x[mouse], events.y[mouse]], axis=-1).ravel()
+    mouse_xy, mouse_valid = _last_state(mouse_rows, mouse_cols, mouse_values, (num_frames + 1, 2))
+    mouse_delta = np.where(mouse_valid[:-1], mouse_xy[1:] - mouse_xy[:-1], 0)
+
+    pressed_keys = keys & in_window & events.pressed
+    keys_pressed = np.zeros((num_frames, NUM_KEYS), dtype=bool)
+    keys_pressed[frame_idx[pressed_keys], events.code[pressed_keys]] = True
+
+    presses = clicks & in_window & events.pressed
+    click_counts = np.zeros((num_frames, NUM_BUTTONS), dtype=np.int32)
+    np.add.at(click_counts, (frame_idx[presses], events.code[presses] - 1), 1)
+
+    scroll_sums = np.zeros((num_frames, 2), dtype=np.int32)
+    np.add.at(scroll_sums, frame_idx[scroll], np.stack([events.dx[scroll], events.dy[scroll]], axis=-1))
+
+    return FrameActions(
+        keys_down=keys_down[1:],
+        keys_pressed=keys_pressed,
+        buttons_down=buttons_down[1:],
+        clicks=click_counts,
+        mouse_xy=mouse_xy[1:],
+        mouse_delta=mouse_delta.astype(np.int32),
+        scroll=scroll_sums,
+        num_events=np.bincount(frame_idx[in_window], minlength=num_frames).astype(np.int32),
+    )
+
+
+__all__ = ["FrameActions", "Window", "window_edges", "assign_events", "align_events"]
@@ -0,0 +1,477 @@
+"""
+Chunked binary event log, e.g. `recording.evlog` next to `recording.mkv`, as an alternative to `.jsonl`.
+
+Layout:
+- File header: magic, version.
+- Chunks, each holding the events of about one second: a chunk header (start and end timestamp, number of
+  records, compression, sizes) followed by a payload, optionally compressed with zstd. The payload is a list of
+  sections, one per record schema:
+  - control events (`control_publisher`) are fixed-width `CONTROL_DTYPE` records, read with a single
+    `np.frombuffer` instead of parsing JSON,
+  - events of other sources are length-prefixed (timestamp, source, JSON data) records.
+- Index blocks listing the offset and time range of the chunks written since the previous index block, emitted
+  every `index_interval` chunks.
+- On close, a footer index of every chunk, followed by a trailer pointing at it.
+
+A file without trailer, e.g. of a crashed recording, is indexed by walking the chunk headers and seeking over the
+payloads; a partially written chunk at the end is ignored.
+
+Example:
+```python
+writer = EventWriter().configure(BinaryLogSink("recording.evlog", compression="zstd"))
+...
+events = load_binlog("recording.evlog")  # EventTable, in milliseconds for an hour of events
+```
+"""
+
+import os
+import struct
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional
+
+import numpy as np
+import orjson
+from loguru import logger
+from pydantic import BaseModel
+
+from .events import CONTROL_SOURCE, EventKind, EventTable, control_event_to_row, parse_control_event
+from .writer import EventSink
+from .zstdlog import _zstd, iter_lines
+
+BINLOG_SUFFIX = ".evlog"
+
+MAGIC = b"OWAEVLOG"
+VERSION = 1
+# magic, version
+_FILE_HEADER = struct.Struct("<8sI")
+# tag, compression, uncompressed size, stored size, start_ns, end_ns, number of records
+_CHUNK_HEADER = struct.Struct("<4sB3xIIqqI")
+# tag, number of entries
+_INDEX_HEADER = struct.Struct("<4sI")
+# index offset, magic
+_TRAILER = struct.Struct("<Q8s")
+# schema, number of records, size in bytes
+_SECTION_HEADER = struct.Struct("<H2xII")
+# timestamp_ns, source length, data length
+_RECORD_HEADER = struct.Struct("<qHI")
+
+CHUNK_TAG = b"CHNK"
+INDEX_TAG = b"INDX"
+TRAILER_MAGIC = b"OWAEVEND"
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZSTD = 1
+_COMPRESSIONS = {None: COMPRESSION_NONE, "none": COMPRESSION_NONE, "zstd": COMPRESSION_ZSTD}
+
+SCHEMA_CONTROL = 1
+SCHEMA_RECORDS = 2
+
+CONTROL_DTYPE = np.dtype(
+    [
+        ("timestamp_ns", "<i8"),
+        ("code", "<i4"),
+        ("x", "<i4"),
+        ("y", "<i4"),
+        ("dx", "<i4"),
+        ("dy", "<i4"),
+        ("kind", "u1"),
+        ("pressed", "u1"),
+        ("_reserved", "<u2"),
+    ]
+)
+# range of every field of `CONTROL_DTYPE`
+_CONTROL_LIMITS = [np.iinfo(CONTROL_DTYPE[name]) for name in CONTROL_DTYPE.names]
+INDEX_DTYPE = np.dtype(
+    [("offset", "<u8"), ("start_ns", "<i8"), ("end_ns", "<i8"), ("num_records", "<u4"), ("_reserved", "<u4")]
+)
+
+
+class Record(NamedTuple):
+    """An event which is not stored in a typed schema. `data` is the JSON-serialized event."""
+
+    timestamp_ns: int
+    source: str
+    data: bytes
+
+
+def _encode_control(timestamp_ns: int, event) -> Optional[tuple]:
+    """Convert a control event into a `CONTROL_DTYPE` row, or None if it has no lossless typed form."""
+    if not isinstance(event, (tuple, list)) or not event:
+        return None
+    try:
+        row = control_event_to_row(timestamp_ns, list(event))
+    except (IndexError, TypeError):
+        return None
+    if row is None or (row[1] == EventKind.MOUSE_CLICK and row[2] == 0):
+        # e.g. clicks of side buttons, which are not in MOUSE_BUTTONS, are stored as JSON records
+        return None
+    record = _encode_row(row)
+    # e.g. key names instead of codes or out-of-range coordinates, which would fail the whole chunk in `_write_chunk`
+    return record if _fits_control(record) else None
+
+
+def _fits_control(record: tuple) -> bool:
+    """Whether every field of a `CONTROL_DTYPE` record is an integer in the range of its type."""
+    return all(
+        isinstance(value, (int, np.integer)) and limits.min <= value <= limits.max
+        for value, limits in zip(record, _CONTROL_LIMITS)
+    )
+
+
+def _encode_row(row: tuple) -> tuple:
+    """Reorder an `EventTable` row into a `CONTROL_DTYPE` record."""
+    timestamp_ns, kind, code, pressed, x, y, dx, dy = row
+    return (timestamp_ns, code, x, y, dx, dy, kind, pressed, 0)
+
+
+class BinaryLogSink(EventSink):
+    """
+    Writer of the chunked binary event log, to be drained by an `EventWriter`.
+
+    Events are buffered in memory and written as a chunk once `chunk_interval` seconds of events or `chunk_events`
+    events are buffered, and when the writer flushes on stop.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        *,
+        compression: Optional[str] = None,
+        compression_level: int = 3,
+        chunk_interval: float = 1.0,
+        chunk_events: int = 65536,
+        index_interval: int = 64,
+    ):
+        """
+        Args:
+            path: Path of the event log. An existing file is overwritten.
+            compression: "zstd" to compress each chunk, or None
+            compression_level: zstd compression level
+            chunk_interval: Time span of the events of a chunk in seconds
+            chunk_events: Maximum number of events of a chunk
+            index_interval: Number of chunks between index blocks
+        """
+        if compression not in _COMPRESSIONS:
+            raise ValueError(f"Unknown compression {compression}, choose from none or zstd")
+        self.path = Path(path)
+        self.compression = _COMPRESSIONS[compression]
+        self._compressor = _zstd().ZstdCompressor(level=compression_level) if self.compression else None
+        self.chunk_interval_ns = int(chunk_interval * 1_000_000_000)
+        self.chunk_events = chunk_events
+        self.index_interval = index_interval
+
+        self._controls: list[tuple] = []
+        self._records: list[Record] = []
+        self._start_ns: Optional[int] = None
+        self._end_ns: Optional[int] = None
+        self._index: list[tuple] = []
+        self._last_indexed = 0
+
+        self._file = open(self.path, "wb")
+        self._file.write(_FILE_HEADER.pack(MAGIC, VERSION))
+
+    def __len__(self):
+        return len(self._controls) + len(self._records)
+
+    def write_events(self, events: list[tuple]):
+        for timestamp_ns, source, event in events:
+            if self._start_ns is not None and timestamp_ns - self._start_ns >= self.chunk_interval_ns:
+                self._write_chunk()
+
+            row = _encode_control(timestamp_ns, event) if source == CONTROL_SOURCE else None
+            if row is not None:
+                self._controls.append(row)
+            else:
+                try:
+                    data = event.model_dump_json().encode() if isinstance(event, BaseModel) else orjson.dumps(event)
+                except Exception as e:
+                    logger.error(f"Failed to serialize event from {source}: {event!r} ({e})")
+                    continue
+                self._records.append(Record(timestamp_ns, source, data))
+
+            if self._start_ns is None:
+                self._start_ns = self._end_ns = timestamp_ns
+            else:
+                self._start_ns = min(self._start_ns, timestamp_ns)
+                self._end_ns = max(self._end_ns, timestamp_ns)
+            if len(self) >= self.chunk_events:
+                self._write_chunk()
+
+    def _write_chunk(self):
+        if not len(self):
+            return
+        sections = []
+        if self._controls:
+            payload = np.array(self._controls, dtype=CONTROL_DTYPE).tobytes()
+            sections += [_SECTION_HEADER.pack(SCHEMA_CONTROL, len(self._controls), len(payload)), payload]
+        if self._records:
+            parts = []
+            for record in self._records:
+                source = record.source.encode()
+                parts += [_RECORD_HEADER.pack(record.timestamp_ns, len(source), len(record.data)), source, record.data]
+            payload = b"".join(parts)
+            sections += [_SECTION_HEADER.pack(SCHEMA_RECORDS, len(self._records), len(payload)), payload]
+        payload = b"".join(sections)
+        stored = self._compressor.compress(payload) if self._compressor else payload
+
+        offset = self._file.tell()
+        header = _CHUNK_HEADER.pack(
+            CHUNK_TAG, self.compression, len(payload), len(stored), self._start_ns, self._end_ns, len(self)
+        )
+        self._file.write(header + stored)
+        self._index.append((offset, self._start_ns, self._end_ns, len(self), 0))
+
+        self._controls, self._records = [], []
+        self._start_ns = self._end_ns = None
+        if len(self._index) - self._last_indexed >= self.index_interval:
+            self._write_index(self._index[self._last_indexed :])
+            self._last_indexed = len(self._index)
+
+    def _write_index(self, entries: list[tuple]) -> int:
+        offset = self._file.tell()
+        self._file.write(_INDEX_HEADER.pack(INDEX_TAG, len(entries)) + np.array(entries, dtype=INDEX_DTYPE).tobytes())
+        return offset
+
+    def flush(self):
+        self._file.flush()
+
+    def fsync(self):
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._write_chunk()
+        index_offset = self._write_index(self._index)
+        self._file.write(_TRAILER.pack(index_offset, TRAILER_MAGIC))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+
+def _check_header(data: bytes | memoryview, path) -> None:
+    if len(data) < _FILE_HEADER.size:
+        raise ValueError(f"{path} is not a binary event log: truncated header")
+    magic, version = _FILE_HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a binary event log")
+    if version != VERSION:
+        raise ValueError(f"Unsupported binary event log version {version}")
+
+
+def _scan_chunks(data: memoryview) -> np.ndarray:
+    """Index the complete chunks of a log without footer, by walking the chunk and index headers."""
+    chunks, pos = [], _FILE_HEADER.size
+    while pos + _CHUNK_HEADER.size <= len(data):
+        tag = bytes(data[pos : pos + 4])
+        if tag == CHUNK_TAG:
+            _, _, _, stored_size, start_ns, end_ns, num_records = _CHUNK_HEADER.unpack_from(data, pos)
+            if pos + _CHUNK_HEADER.size + stored_size > len(data):
+                break
+            chunks.append((pos, start_ns, end_ns, num_records, 0))
+            pos += _CHUNK_HEADER.size + stored_size
+        elif tag == INDEX_TAG:
+            _, count = _INDEX_HEADER.unpack_from(data, pos)
+            pos += _INDEX_HEADER.size + count * INDEX_DTYPE.itemsize
+        else:
+            break
+    return np.array(chunks, dtype=INDEX_DTYPE)
+
+
+def _read_index(data: memoryview) -> np.ndarray:
+    if len(data) >= _FILE_HEADER.size + _TRAILER.size:
+        index_offset, magic = _TRAILER.unpack_from(data, len(data) - _TRAILER.size)
+        if magic == TRAILER_MAGIC:
+            _, count = _INDEX_HEADER.unpack_from(data, index_offset)
+            return np.frombuffer(data, dtype=INDEX_DTYPE, count=count, offset=index_offset + _INDEX_HEADER.size)
+    return _scan_chunks(data)
+
+
+def _read_sections(data: memoryview, offset: int, decompressor=None) -> Iterator[tuple[int, int, memoryview]]:
+    """Decode the chunk at `offset` into (schema, number of records, section) tuples."""
+    _, compression, size, stored_size, *_ = _CHUNK_HEADER.unpack_from(data, offset)
+    start = offset + _CHUNK_HEADER.size
+    payload = data[start : start + stored_size]
+    if compression == COMPRESSION_ZSTD:
+        decompressor = decompressor or _zstd().ZstdDecompressor()
+        payload = memoryview(decompressor.decompress(payload, max_output_size=size))
+    elif compression != COMPRESSION_NONE:
+        raise ValueError(f"Unknown compression {compression} of the chunk at {offset}")
+
+    pos = 0
+    while pos < len(payload):
+        schema, count, nbytes = _SECTION_HEADER.unpack_from(payload, pos)
+        pos += _SECTION_HEADER.size
+        yield schema, count, payload[pos : pos + nbytes]
+        pos += nbytes
+
+
+def _iter_records(section: memoryview, count: int) -> Iterator[Record]:
+    pos = 0
+    for _ in range(count):
+        timestamp_ns, source_len, data_len = _RECORD_HEADER.unpack_from(section, pos)
+        pos += _RECORD_HEADER.size
+        source = bytes(section[pos : pos + source_len]).decode()
+        pos += source_len
+        yield Record(timestamp_ns, source, bytes(section[pos : pos + data_len]))
+        pos += data_len
+
+
+class BinaryLog:
+    """
+    Reader of the chunked binary event log. The file is memory-mapped and chunks are decoded on access, so that
+    reading a time range only touches the chunks overlapping it.
+
+    Example:
+    ```python
+    log = BinaryLog("recording.evlog")
+    events = log.control_events(start_ns, end_ns)  # only decodes the chunks overlapping the range
+    windows = [record for record in log.records() if record.source == "window_publisher"]
+    ```
+    """
+
+    def __init__(self, path: str | os.PathLike):
+        """
+        Args:
+            path: Path of the `.evlog` event log
+        """
+        self.path = Path(path)
+        size = os.path.getsize(self.path)
+        _check_header(np.fromfile(self.path, dtype=np.uint8, count=_FILE_HEADER.size).tobytes(), self.path)
+        self._data = memoryview(np.memmap(self.path, dtype=np.uint8, mode="r", shape=(size,)))
+        # offset, start_ns, end_ns and num_records of every chunk, see `INDEX_DTYPE`
+        self.chunks = _read_index(self._data)
+        self._decompressor = None
+
+    def __len__(self):
+        return int(self.chunks["num_records"].sum())
+
+    def _sections(self, offset: int):
+        if self._decompressor is None and _CHUNK_HEADER.unpack_from(self._data, offset)[1] == COMPRESSION_ZSTD:
+            self._decompressor = _zstd().ZstdDecompressor()
+        return _read_sections(self._data, offset, self._decompressor)
+
+    def _chunks_in(self, start_ns: Optional[int], end_ns: Optional[int]) -> list[int]:
+        """Offsets of the chunks overlapping `[start_ns, end_ns)`."""
+        mask = np.ones(len(self.chunks), dtype=bool)
+        if start_ns is not None:
+            mask &= self.chunks["end_ns"] >= start_ns
+        if end_ns is not None:
+            mask &= self.chunks["start_ns"] < end_ns
+        return self.chunks["offset"][mask].tolist()
+
+    def control_events(self, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> EventTable:
+        """Keyboard and mouse events in `[start_ns, end_ns)`, sorted by timestamp."""
+        blocks = []
+        for offset in self._chunks_in(start_ns, end_ns):
+            for schema, count, section in self._sections(offset):
+                if schema == SCHEMA_CONTROL:
+                    blocks.append(np.frombuffer(section, dtype=CONTROL_DTYPE, count=count))
+                elif schema == SCHEMA_RECORDS:
+                    # control events without typed form, e.g. clicks of side buttons, are rare
+                    rows = [
+                        encoded
+                        for record in _iter_records(section, count)
+                        if record.source == CONTROL_SOURCE
+                        and (row := control_event_to_row(record.timestamp_ns, parse_control_event(record.data)))
+                        and _fits_control(encoded := _encode_row(row))
+                    ]
+                    if rows:
+                        blocks.append(np.array(rows, dtype=CONTROL_DTYPE))
+        # copying into a preallocated array is a plain memcpy, unlike concatenating structured arrays
+        rows = np.empty(sum(len(block) for block in blocks), dtype=CONTROL_DTYPE)
+        pos = 0
+        for block in blocks:
+            rows[pos : pos + len(block)] = block
+            pos += len(block)
+
+        if start_ns is not None or end_ns is not None:
+            timestamps = rows["timestamp_ns"]
+            mask = np.ones(len(rows), dtype=bool)
+            if start_ns is not None:
+                mask &= timestamps >= start_ns
+            if end_ns is not None:
+                mask &= timestamps < end_ns
+            rows = rows[mask]
+        if np.any(np.diff(rows["timestamp_ns"]) < 0):
+            rows = rows[np.argsort(rows["timestamp_ns"], kind="stable")]
+        return EventTable(
+            timestamp_ns=rows["timestamp_ns"].astype(np.int64),
+            kind=rows["kind"].astype(np.uint8),
+            code=rows["code"].astype(np.int32),
+            pressed=rows["pressed"].astype(bool),
+            x=rows["x"].astype(np.int32),
+            y=rows["y"].astype(np.int32),
+            dx=rows["dx"].astype(np.int32),
+            dy=rows["dy"].astype(np.int32),
+        )
+
+    def records(self, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> Iterator[Record]:
+        """Events stored without typed schema in `[start_ns, end_ns)`, in the order they were written."""
+        for offset in self._chunks_in(start_ns, end_ns):
+            for schema, count, section in self._sections(offset):
+                if schema != SCHEMA_RECORDS:
+                    continue
+                for record in _iter_records(section, count):
+                    if (start_ns is None or record.timestamp_ns >= start_ns) and (
+                        end_ns is None or record.timestamp_ns < end_ns
+                    ):
+                        yield record
+
+
+def load_binlog(path: str | os.PathLike, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> EventTable:
+    """Load the keyboard and mouse events of a binary event log. See `BinaryLog.control_events`."""
+    return BinaryLog(path).control_events(start_ns, end_ns)
+
+
+def _jsonl_event(source: str, event_data: str):
+    if source == CONTROL_SOURCE:
+        return parse_control_event(event_data)
+    return orjson.loads(event_data)
+
+
+def convert_jsonl(
+    src: str | os.PathLike, dst: Optional[str | os.PathLike] = None, *, compression: Optional[str] = None, **kwargs
+) -> Path:
+    """
+    Convert a `.jsonl` or `.jsonl.zst` event log into a binary event log.
+
+    Args:
+        src: Path of the `.jsonl` or `.jsonl.zst` event log
+        dst: Path of the binary event log. If None, `<name>.evlog` next to `src`.
+        compression: "zstd" to compress each chunk, or None
+        **kwargs: Additional arguments of `BinaryLogSink`
+
+    Returns:
+        Path: Path of the binary event log
+    """
+    if dst is None:
+        dst = Path(os.fspath(src).removesuffix(".zst")).with_suffix(BINLOG_SUFFIX)
+    dst = Path(dst)
+    events = []
+    for line in iter_lines(src):
+        if not line.strip():
+            continue
+        record = orjson.loads(line)
+        source = record["event_src"]
+        events.append((record["timestamp_ns"], source, _jsonl_event(source, record["event_data"])))
+    # chunks cover contiguous time ranges only if events are written in order
+    events.sort(key=lambda event: event[0])
+
+    sink = BinaryLogSink(dst, compression=compression, **kwargs)
+    try:
+        sink.write_events(events)
+    finally:
+        sink.close()
+    return dst
+
+
+__all__ = [
+    "BinaryLogSink",
+    "BinaryLog",
+    "Record",
+    "load_binlog",
+    "convert_jsonl",
+    "BINLOG_SUFFIX",
+    "CONTROL_DTYPE",
+]
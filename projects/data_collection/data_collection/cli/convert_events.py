@@ -0,0 +1,41 @@
+"""
+Convert `.jsonl` and `.jsonl.zst` event logs into the chunked binary `.evlog` format, see `data_collection.binlog`.
+"""
+
+from pathlib import Path
+from typing import Optional
+
+import typer
+from loguru import logger
+from typing_extensions import Annotated
+
+from ..binlog import convert_jsonl
+
+app = typer.Typer()
+
+
+@app.command()
+def main(
+    paths: Annotated[
+        list[Path], typer.Argument(help="`.jsonl` or `.jsonl.zst` event logs, or directories searched recursively")
+    ],
+    *,
+    compression: Annotated[Optional[str], typer.Option(help="Chunk compression, `zstd` or none")] = None,
+    force: Annotated[bool, typer.Option(help="Overwrite existing `.evlog` files")] = False,
+):
+    """Convert event logs, writing `<name>.evlog` next to each `<name>.jsonl`."""
+    sources = []
+    for path in paths:
+        sources += sorted([*path.rglob("*.jsonl"), *path.rglob("*.jsonl.zst")]) if path.is_dir() else [path]
+
+    for src in sources:
+        dst = src.with_name(src.name.removesuffix(".zst")).with_suffix(".evlog")
+        if dst.exists() and not force:
+            logger.info(f"Skipping {src}, {dst} exists")
+            continue
+        convert_jsonl(src, dst, compression=compression)
+        logger.info(f"Converted {src} ({src.stat().st_size} bytes) to {dst} ({dst.stat().st_size} bytes)")
+
+
+if __name__ == "__main__":
+    app()
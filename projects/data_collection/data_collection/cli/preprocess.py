@@ -0,0 +1,242 @@
+"""
+Preprocess a corpus of recordings (`.mkv` + `.jsonl` pairs) into per-recording `.npz` files of aligned actions.
+
+Recordings are sharded over a process pool. Each recording runs through a chain of stages:
+- `timestamps`: extract the timestamp subtitle track, cached next to the recording
+- `resample`: replace the recorded frames with a uniform grid of `fps` frames per second
+- `align`: summarize the events of each frame's window, see `data_collection.alignment`
+- `export`: write the frame timestamps and actions to `<output_dir>/<relative path>.npz`
+
+A checkpoint is written next to every output, so that interrupted runs resume where they stopped.
+"""
+
+import multiprocessing as mp
+import os
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import orjson
+import typer
+from loguru import logger
+from typing_extensions import Annotated
+
+from ..alignment import align_events
+from ..events import event_log_path, load_events
+
+app = typer.Typer()
+
+STAGES = ("timestamps", "resample", "align", "export")
+# prerequisites of each stage, added to the chain automatically
+REQUIRES = {"timestamps": (), "resample": ("timestamps",), "align": ("timestamps",), "export": ("align",)}
+CHECKPOINT_SUFFIX = ".done"
+PROGRESS_INTERVAL = 5.0  # in seconds
+
+
+def resolve_stages(stages: list[str]) -> list[str]:
+    """Add the prerequisites of the requested stages and sort them in execution order."""
+    resolved, pending = set(), list(stages)
+    while pending:
+        stage = pending.pop()
+        if stage not in REQUIRES:
+            raise typer.BadParameter(f"Unknown stage {stage}, choose from {', '.join(STAGES)}")
+        if stage not in resolved:
+            resolved.add(stage)
+            pending.extend(REQUIRES[stage])
+    return [stage for stage in STAGES if stage in resolved]
+
+
+def _stage_timestamps(state: dict, config: dict):
+    from owa_env_gst.reader import build_video_index, read_timestamp_track
+
+    state["timestamps"] = read_timestamp_track(state["path"])
+    state["pts_ns"] = build_video_index(state["path"]).pts_ns
+    state["utc_ns"] = state["timestamps"].pts_to_utc(state["pts_ns"])
+
+
+def _stage_resample(state: dict, config: dict):
+    interval_ns = round(1_000_000_000 / config["fps"])
+    first, last = state["utc_ns"][0], state["utc_ns"][-1]
+    state["utc_ns"] = np.arange(first, last + 1, interval_ns, dtype=np.int64)
+    state["pts_ns"] = state["timestamps"].utc_to_pts(state["utc_ns"])
+
+
+def _stage_align(state: dict, config: dict):
+    events = load_events(event_log_path(state["path"]))
+    state["num_events"] = len(events)
+    state["actions"] = align_events(events, state["utc_ns"], window=config["window"])
+
+
+def _stage_export(state: dict, config: dict):
+    output = Path(state["output"])
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output.with_name(output.name + f".{os.getpid()}.tmp")
+    # write to a temporary file first, so that an interrupted run never leaves a partial output behind
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(f, pts_ns=state["pts_ns"], utc_ns=state["utc_ns"], **state["actions"]._asdict())
+    os.replace(tmp_path, output)
+
+
+STAGE_FUNCTIONS = {
+    "timestamps": _stage_timestamps,
+    "resample": _stage_resample,
+    "align": _stage_align,
+    "export": _stage_export,
+}
+
+
+def _checkpoint_key(path: Path, config: dict) -> dict:
+    stat = path.stat()
+    return dict(source_size=stat.st_size, source_mtime_ns=stat.st_mtime_ns, config=config)
+
+
+def is_done(path: Path, output: Path, config: dict) -> bool:
+    """Whether the checkpoint of a recording matches the recording and the configuration of this run."""
+    checkpoint = output.with_suffix(CHECKPOINT_SUFFIX)
+    try:
+        return orjson.loads(checkpoint.read_bytes())["key"] == _checkpoint_key(path, config)
+    except (OSError, orjson.JSONDecodeError, KeyError):
+        return False
+
+
+def process_recording(path: str, output: str, config: dict) -> dict:
+    """
+    Run the stage chain on a single recording. Exceptions are caught and reported, so that a broken recording
+    does not abort the whole run.
+
+    Returns:
+        dict: Report of the recording with `ok`, `error`, `elapsed`, `bytes`, `frames` and `events`
+    """
+    start = time.perf_counter()
+    state = dict(path=path, output=output)
+    report = dict(path=path, ok=True, error=None, bytes=os.path.getsize(path), frames=0, events=0)
+    try:
+        for stage in config["stages"]:
+            STAGE_FUNCTIONS[stage](state, config)
+        report.update(frames=len(state.get("utc_ns", ())), events=state.get("num_events", 0))
+        checkpoint = dict(key=_checkpoint_key(Path(path), config), frames=report["frames"], events=report["events"])
+        # only `export` creates the output directory, but the checkpoint is written for every stage chain
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        Path(output).with_suffix(CHECKPOINT_SUFFIX).write_bytes(orjson.dumps(checkpoint))
+    except Exception:
+        report.update(ok=False, error=traceback.format_exc())
+    report["elapsed"] = time.perf_counter() - start
+    return report
+
+
+class _Progress:
+    """Periodic progress and throughput reporting."""
+
+    def __init__(self, total: int, total_bytes: int):
+        self.total, self.total_bytes = total, total_bytes
+        self.done = self.failed = self.bytes = self.frames = self.events = 0
+        self.start = self.last_report = time.perf_counter()
+
+    def update(self, report: dict):
+        self.done += 1
+        self.failed += not report["ok"]
+        self.bytes += report["bytes"]
+        self.frames += report["frames"]
+        self.events += report["events"]
+        if time.perf_counter() - self.last_report >= PROGRESS_INTERVAL or self.done == self.total:
+            self.log()
+
+    def log(self):
+        self.last_report = now = time.perf_counter()
+        elapsed = max(now - self.start, 1e-9)
+        remaining_bytes = self.total_bytes - self.bytes
+        eta = remaining_bytes / (self.bytes / elapsed) if self.bytes else float("nan")
+        logger.info(
+            f"{self.done}/{self.total} recordings ({self.failed} failed) | "
+            f"{self.done / elapsed:.2f} rec/s, {self.bytes / elapsed / 2**20:.1f} MiB/s, "
+            f"{self.frames / elapsed:.0f} frames/s, {self.events / elapsed:.0f} events/s | ETA {eta:.0f} s"
+        )
+
+
+def _record_failure(report: dict, error_log: Path):
+    logger.error(f"Failed to process {report['path']}:\n{report['error']}")
+    with open(error_log, "ab") as f:
+        f.write(orjson.dumps(report) + b"\n")
+
+
+def _run_pool(executor, queue, outputs: dict, config: dict, num_workers: int, progress: _Progress, error_log: Path):
+    """Feed recordings to the pool until the queue is exhausted. Returns True if the pool broke down."""
+    in_flight = {}
+    while True:
+        # bound the number of submitted recordings, so that huge corpora do not flood the executor's queue
+        while len(in_flight) < 2 * num_workers and (path := next(queue, None)) is not None:
+            in_flight[executor.submit(process_recording, str(path), str(outputs[path]), config)] = path
+        if not in_flight:
+            return False
+
+        finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in finished:
+            path = in_flight.pop(future)
+            try:
+                report = future.result()
+            except BrokenProcessPool:
+                # a worker crashed, e.g. in native code, so every recording in flight is lost
+                for lost in [path, *in_flight.values()]:
+                    report = dict(path=str(lost), ok=False, error="Worker process died", bytes=lost.stat().st_size)
+                    _record_failure(report, error_log)
+                    progress.update(dict(report, frames=0, events=0))
+                return True
+            if not report["ok"]:
+                _record_failure(report, error_log)
+            progress.update(report)
+
+
+@app.command()
+def main(
+    input_dir: Annotated[Path, typer.Argument(help="Directory of `.mkv` recordings with their `.jsonl` event logs")],
+    output_dir: Annotated[Path, typer.Argument(help="Directory of the outputs, mirroring the input directory")],
+    *,
+    stages: Annotated[
+        list[str], typer.Option("--stage", help=f"Stages to run, prerequisites are added. One of {', '.join(STAGES)}")
+    ] = ["timestamps", "align", "export"],
+    fps: Annotated[float, typer.Option(help="Frame rate of the `resample` stage")] = 20.0,
+    window: Annotated[str, typer.Option(help="Window semantics of the `align` stage, `past` or `future`")] = "past",
+    pattern: Annotated[str, typer.Option(help="Glob pattern of the recordings, relative to the input directory")] = (
+        "**/*.mkv"
+    ),
+    num_workers: Annotated[Optional[int], typer.Option(help="Number of processes, defaults to the CPU count")] = None,
+    force: Annotated[bool, typer.Option(help="Reprocess recordings which have a valid checkpoint")] = False,
+):
+    """Preprocess every recording of a directory in parallel, resuming from checkpoints."""
+    config = dict(stages=resolve_stages(stages), fps=fps, window=window)
+    if window not in ("past", "future"):
+        raise typer.BadParameter(f"Unknown window {window}")
+    num_workers = num_workers or os.cpu_count()
+
+    recordings = sorted(input_dir.glob(pattern))
+    outputs = {path: output_dir / path.relative_to(input_dir).with_suffix(".npz") for path in recordings}
+    pending = [path for path in recordings if force or not is_done(path, outputs[path], config)]
+    logger.info(
+        f"Found {len(recordings)} recordings, {len(recordings) - len(pending)} already done. "
+        f"Running {' -> '.join(config['stages'])} on {len(pending)} recordings with {num_workers} processes"
+    )
+    if not pending:
+        return
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    error_log = output_dir / "errors.jsonl"
+    progress = _Progress(len(pending), sum(path.stat().st_size for path in pending))
+    queue = iter(pending)
+    while True:
+        # GStreamer is not fork-safe, so workers are spawned
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=mp.get_context("spawn")) as executor:
+            broken = _run_pool(executor, queue, outputs, config, num_workers, progress, error_log)
+        if not broken:
+            break
+        logger.warning("A worker process died, restarting the process pool")
+
+    if progress.failed:
+        logger.warning(f"{progress.failed} recordings failed, see {error_log}")
+
+
+if __name__ == "__main__":
+    app()
@@ -9,48 +9,99 @@
 # [tool.uv.sources]
 # open-world-agents = { path = "../" }
 # ///
+import glob
 import time
 from pathlib import Path
 from typing import Optional
 
-import orjson
 import typer
 from loguru import logger
-from pydantic import BaseModel
 from typing_extensions import Annotated
 
 from owa.registry import CALLABLES, LISTENERS, RUNNABLES, activate_module
 
+from ..binlog import BinaryLogSink
+from ..decimation import MoveDecimator
+from ..writer import EventSink, EventWriter, FileSink, SegmentedSink
+from ..zstdlog import ZstdLogSink
+
 app = typer.Typer()
-output_file = None
+event_writer: Optional[EventWriter] = None
+# writer of the undecimated `mouse.move` events, if requested
+raw_writer: Optional[EventWriter] = None
+decimator: Optional[MoveDecimator] = None
+
+# sink of each event log format, which is also the suffix of the event log
+EVENT_SINKS = {"jsonl": FileSink, "jsonl.zst": ZstdLogSink, "evlog": BinaryLogSink}
 
+# interval in seconds between the decimation statistics written to the event log
+DECIMATION_STATS_INTERVAL = 60
 
-class BagEvent(BaseModel):
-    timestamp_ns: int
-    event_src: str
-    event_data: bytes
 
+def window_publisher_callback(event):
+    event_writer.put(event, source="window_publisher")
 
-def write_event_into_jsonl(event, source=None):
-    global output_file
-    # you can find where the event is coming from. e.g. where the calling this function
-    # frame = inspect.currentframe().f_back
 
-    with open(output_file, "ab") as f:
-        if isinstance(event, BaseModel):
-            event_data = event.model_dump_json().encode("utf-8")
-        else:
-            event_data = orjson.dumps(event)
-        bag_event = BagEvent(timestamp_ns=time.time_ns(), event_src=source, event_data=event_data)
-        f.write(bag_event.model_dump_json().encode("utf-8") + b"\n")
+def control_publisher_callback(*event):
+    timestamp_ns = time.time_ns()
+    if raw_writer is not None and event[0] == "mouse.move":
+        raw_writer.put(event, source="control_publisher", timestamp_ns=timestamp_ns)
+    if decimator is not None:
+        decimator.put(event, timestamp_ns)
+    else:
+        event_writer.put(event, source="control_publisher", timestamp_ns=timestamp_ns)
 
 
-def window_publisher_callback(event):
-    write_event_into_jsonl(event, source="window_publisher")
+def decimated_callback(event, timestamp_ns):
+    event_writer.put(event, source="control_publisher", timestamp_ns=timestamp_ns)
 
 
-def control_publisher_callback(*event):
-    write_event_into_jsonl(event, source="control_publisher")
+def decimation_stats_callback():
+    event_writer.put(decimator.stats(), source="mouse_decimation")
+
+
+def watchdog_callback(stall):
+    # the gap in the video is explained in the event log
+    event_writer.put(stall, source="pipeline_watchdog")
+
+
+def segment_callback(segment):
+    # rotate the event logs at the boundaries of the video segments
+    if segment.start_utc_ns is None:
+        return
+    for writer in (event_writer, raw_writer):
+        if writer is not None:
+            writer.sink.start_segment(segment.index, segment.start_utc_ns)
+
+
+def open_event_sink(
+    file_location: str, suffix: str, event_format: str, segment_duration: Optional[float]
+) -> EventSink:
+    """Open the event log `<name><suffix>` of a recording, or `<name>_00000<suffix>`, ... for a segmented one."""
+    location = Path(file_location)
+    if segment_duration is None:
+        return EVENT_SINKS[event_format](location.with_suffix(suffix))
+    return SegmentedSink(
+        lambda index: EVENT_SINKS[event_format](location.with_name(f"{location.stem}_{index:05d}{suffix}")),
+        segment_duration,
+    )
+
+
+def previous_outputs(file_location: str, event_format: str) -> list[Path]:
+    """
+    Event logs and manifest of an earlier recording at the same location.
+
+    They must be deleted before recording, since the sinks append to existing event logs and a stale manifest or
+    segment log would otherwise be read as part of the new recording.
+    """
+    from owa_env_gst.segments import manifest_path
+
+    location = Path(file_location)
+    paths = [manifest_path(location)]
+    for suffix in (f".{event_format}", f".raw.{event_format}"):
+        paths.append(location.with_suffix(suffix))
+        paths += location.parent.glob(f"{glob.escape(location.stem)}_{'[0-9]' * 5}{suffix}")
+    return [path for path in paths if path.exists()]
 
 
 def configure():
@@ -76,19 +127,118 @@ def main(
             help="Additional arguments to pass to the pipeline. For detail, see https://gstreamer.freedesktop.org/documentation/d3d11/d3d11screencapturesrc.html"
         ),
     ] = None,
+    event_format: Annotated[
+        str,
+        typer.Option(
+            help="Format of the event log: `jsonl`, zstd-compressed `jsonl.zst` or the chunked binary `evlog`"
+        ),
+    ] = "jsonl",
+    fps: Annotated[float, typer.Option(help="The frame rate of the video")] = 60,
+    mouse_max_rate: Annotated[
+        Optional[float], typer.Option(help="Maximum number of recorded mouse moves per second")
+    ] = None,
+    mouse_min_distance: Annotated[
+        float, typer.Option(help="Minimum distance in pixels between recorded mouse moves")
+    ] = 0,
+    mouse_per_frame: Annotated[bool, typer.Option(help="Record at most one mouse move per video frame")] = False,
+    keep_raw_mouse: Annotated[
+        bool, typer.Option(help="Also record every mouse move to `<name>.raw.<format>` when decimating")
+    ] = False,
+    segment_duration: Annotated[
+        Optional[float],
+        typer.Option(
+            help="Split the recording into segments of this duration in seconds, e.g. `<name>_00000.mkv` and "
+            "`<name>_00000.jsonl`, listed in `<name>.segments.json`"
+        ),
+    ] = None,
+    in_process: Annotated[
+        bool,
+        typer.Option(
+            help="Run the GStreamer pipeline in this process instead of `gst-launch-1.0`, which also writes the "
+            "exact UTC time of every frame to `<name>.frames.bin`"
+        ),
+    ] = False,
+    preview: Annotated[
+        Optional[str],
+        typer.Option(
+            help="Publish the capture to shared memory under this name, so that other processes attach to it with "
+            "the `screen/shm` listener"
+        ),
+    ] = None,
+    video_encoder: Annotated[
+        str,
+        typer.Option(
+            help="Video encoder element, e.g. `x264enc`, or a policy picking an installed one: `fastest`, "
+            "`smallest` or `quality`"
+        ),
+    ] = "nvd3d11h265enc",
+    audio_encoder: Annotated[
+        str, typer.Option(help="Audio encoder element, e.g. `opusenc`, or a policy as for `--video-encoder`")
+    ] = "avenc_aac",
+    audio_backend: Annotated[
+        Optional[str],
+        typer.Option(
+            help="Source of the recorded audio: `wasapi2` (Windows default), `pulse` (default elsewhere) or `pipewire`"
+        ),
+    ] = None,
+    encoder_preset: Annotated[
+        Optional[str], typer.Option(help="Speed/efficiency preset of the encoders: `fast`, `medium` or `slow`")
+    ] = None,
+    video_bitrate: Annotated[Optional[int], typer.Option(help="Bitrate of the video encoder in kbit/s")] = None,
+    keyframe_interval: Annotated[
+        Optional[int], typer.Option(help="Maximum distance between keyframes of the video in frames")
+    ] = None,
+    watchdog_timeout: Annotated[
+        Optional[float],
+        typer.Option(
+            help="Restart the capture once no frame was captured for this many seconds, continuing in the next "
+            "segment. Requires `--in-process` and `--segment-duration`"
+        ),
+    ] = None,
 ):
-    global output_file
-    output_file = Path(file_location).with_suffix(".jsonl")
+    global event_writer, raw_writer, decimator
+    if event_format not in EVENT_SINKS:
+        raise typer.BadParameter(f"Unknown event format {event_format}")
+    if watchdog_timeout is not None and not (in_process and segment_duration is not None):
+        raise typer.BadParameter("--watchdog-timeout requires --in-process and --segment-duration")
+    output_file = Path(file_location).with_suffix(f".{event_format}")
     if not output_file.parent.exists():
         output_file.parent.mkdir(parents=True, exist_ok=True)
         logger.warning(f"Created directory {output_file.parent}")
-    # delete the file if it exists
-    if output_file.exists():
-        output_file.unlink()
-        logger.warning(f"Deleted existing file {output_file}")
 
     configure()
-    recorder = RUNNABLES["screen/recorder"]()
+    # delete the files if they exist
+    for path in previous_outputs(file_location, event_format):
+        path.unlink()
+        logger.warning(f"Deleted existing file {path}")
+    from owa_env_gst.encoders import POLICIES, EncoderSettings, select_encoder
+    from owa_env_gst.gst_factory import ScreenOutput
+
+    if video_encoder in POLICIES:
+        video_encoder = select_encoder("video", video_encoder)
+    if audio_encoder in POLICIES:
+        audio_encoder = select_encoder("audio", audio_encoder)
+    logger.info(f"Encoding video with {video_encoder} and audio with {audio_encoder}")
+
+    event_writer = EventWriter().configure(
+        open_event_sink(file_location, f".{event_format}", event_format, segment_duration)
+    )
+    if mouse_max_rate or mouse_min_distance or mouse_per_frame:
+        decimator = MoveDecimator(
+            decimated_callback,
+            max_rate=mouse_max_rate,
+            min_distance=mouse_min_distance,
+            interval=1 / fps if mouse_per_frame else None,
+        )
+        if keep_raw_mouse:
+            raw_sink = open_event_sink(file_location, f".raw.{event_format}", event_format, segment_duration)
+            raw_writer = EventWriter().configure(raw_sink)
+    recorder_options = {}
+    if in_process:
+        recorder = RUNNABLES["owa_env_gst/omnimodal/inprocess_recorder"]()
+        recorder_options = dict(watchdog_timeout=watchdog_timeout, watchdog_callback=watchdog_callback)
+    else:
+        recorder = RUNNABLES["owa_env_gst/omnimodal/subprocess_recorder"]()
     keyboard_listener = LISTENERS["keyboard"]().configure(callback=control_publisher_callback)
     mouse_listener = LISTENERS["mouse"]().configure(callback=control_publisher_callback)
     recorder.configure(
@@ -97,23 +247,59 @@ def main(
         record_video=record_video,
         record_timestamp=record_timestamp,
         show_cursor=show_cursor,
+        fps=fps,
         window_name=window_name,
         monitor_idx=monitor_idx,
         additional_args=additional_args,
+        segment_duration=segment_duration,
+        segment_callback=segment_callback,
+        shm_outputs=None if preview is None else [ScreenOutput(name=preview)],
+        video_encoder=video_encoder,
+        video_encoder_settings=EncoderSettings(
+            preset=encoder_preset, bitrate=video_bitrate, keyframe_interval=keyframe_interval
+        ),
+        audio_encoder=audio_encoder,
+        audio_encoder_settings=EncoderSettings(preset=encoder_preset),
+        audio_backend=audio_backend,
+        **recorder_options,
     )
 
     try:
         # TODO?: add `wait` method to Runnable, which waits until the Runnable is ready to operate well.
+        event_writer.start()
+        if raw_writer is not None:
+            raw_writer.start()
         recorder.start()
         keyboard_listener.start()
         mouse_listener.start()
+        tick = 0
         while True:
             active_window = CALLABLES["window.get_active_window"]()
             window_publisher_callback(active_window)
+            if decimator is not None:
+                # the held move is emitted even if the pointer stopped
+                decimator.flush()
+                tick += 1
+                if tick % DECIMATION_STATS_INTERVAL == 0:
+                    decimation_stats_callback()
             time.sleep(1)
     except KeyboardInterrupt:
+        if in_process:
+            # the counters are read from the elements, which are released once the recorder stops
+            logger.info(f"Frame drop statistics: {recorder.get_drop_stats()}")
         recorder.stop()
         recorder.join()
+    finally:
+        if decimator is not None:
+            decimator.close()
+            decimation_stats_callback()
+            logger.info(f"Mouse move decimation statistics: {decimator.stats()}")
+        # the writers drain every queued event before they stop
+        for writer in (event_writer, raw_writer):
+            if writer is not None:
+                writer.stop()
+                writer.join()
+        logger.info(f"Event log statistics: {event_writer.stats()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+"""
+Source-side decimation of `mouse.move` events, which dominate the event log.
+
+Moves are thinned before they are queued, by a minimum interval between moves (a maximum rate, or one move per
+video frame) and a minimum pointer distance. A move which arrives too early is held back and replaced by later
+moves, so that the last position before the pointer stops is not lost: the held move is emitted, with its
+original timestamp, when the interval elapses, or right before the next non-move event. Likewise, a move closer than
+the minimum distance is held back until a later move replaces it, and emitted by `flush`, `close` or right before the
+next non-move event otherwise.
+
+Example:
+```python
+decimator = MoveDecimator(lambda event, timestamp_ns: writer.put(event, "control_publisher", timestamp_ns), max_rate=100)
+listener.configure(callback=decimator)
+...
+decimator.flush()  # e.g. once per second from the main loop
+```
+"""
+
+import math
+import threading
+import time
+from typing import Callable, Optional
+
+S_TO_NS = 1_000_000_000
+
+
+class MoveDecimator:
+    """
+    Decimator of `mouse.move` events, called with the events of the keyboard and mouse listeners.
+    Events other than `mouse.move` are passed through unchanged.
+
+    Statistics:
+        emitted: number of moves passed through
+        coalesced: number of moves replaced by a later move within the interval
+        dropped: number of moves closer than `min_distance` to the last emitted move, replaced by a later move
+    """
+
+    def __init__(
+        self,
+        emit: Callable[[tuple, int], None],
+        *,
+        max_rate: Optional[float] = None,
+        min_distance: float = 0,
+        interval: Optional[float] = None,
+    ):
+        """
+        Args:
+            emit: Called with (event, timestamp_ns) for every event which is passed through.
+            max_rate: Maximum number of moves per second.
+            min_distance: Minimum distance in pixels from the last emitted move.
+            interval: Minimum interval between moves in seconds, e.g. the frame interval of the video.
+                Combined with `max_rate`, the longer interval is used.
+        """
+        self.emit = emit
+        intervals = [value for value in (interval, 1 / max_rate if max_rate else None) if value]
+        self.interval_ns = int(max(intervals) * S_TO_NS) if intervals else 0
+        self.min_distance = min_distance
+
+        self._lock = threading.Lock()
+        self._next_ns = 0  # earliest timestamp of the next emitted move
+        self._last_xy: Optional[tuple] = None  # position of the last emitted move
+        self._pending: Optional[tuple] = None  # (event, timestamp_ns) of the move held back
+        self.emitted = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def __call__(self, *event):
+        """Listener callback, e.g. `("mouse.move", x, y)` or `("keyboard.press", vk)`."""
+        self.put(event, time.time_ns())
+
+    def put(self, event: tuple, timestamp_ns: int):
+        with self._lock:
+            if event[0] != "mouse.move":
+                self._flush_pending(force=True)
+                self.emit(event, timestamp_ns)
+                return
+
+            if timestamp_ns >= self._next_ns:
+                # the held move would have been emitted when its interval elapsed
+                self._flush_pending()
+            if timestamp_ns >= self._next_ns:
+                self._emit_move(event, timestamp_ns, timestamp_ns)
+                return
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = (event, timestamp_ns)
+
+    def _emit_move(self, event: tuple, timestamp_ns: int, slot_ns: int, force: bool = False):
+        if self._pending is not None:
+            # a move closer than `min_distance`, which this later move replaces
+            self._pending = None
+            self.dropped += 1
+        if not force and self._last_xy is not None and self.min_distance:
+            if math.hypot(event[1] - self._last_xy[0], event[2] - self._last_xy[1]) < self.min_distance:
+                # held back, since it may be the position at which the pointer stops
+                self._pending = (event, timestamp_ns)
+                return
+        self._last_xy = (event[1], event[2])
+        self._next_ns = slot_ns + self.interval_ns
+        self.emitted += 1
+        self.emit(event, timestamp_ns)
+
+    def _flush_pending(self, force: bool = False):
+        """Emit the held move. Unless `force`, a move closer than `min_distance` is held back again."""
+        if self._pending is not None:
+            event, timestamp_ns = self._pending
+            self._pending = None
+            # the held move takes the slot at which the interval elapsed, so that the rate is kept
+            self._emit_move(event, timestamp_ns, max(self._next_ns, timestamp_ns), force=force)
+
+    def flush(self, now_ns: Optional[int] = None):
+        """Emit the held move if its interval has elapsed. Called periodically, since the pointer may stop."""
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        with self._lock:
+            if now_ns >= self._next_ns:
+                self._flush_pending(force=True)
+
+    def close(self):
+        """Emit the held move regardless of its interval."""
+        with self._lock:
+            self._flush_pending(force=True)
+
+    def stats(self) -> dict:
+        return dict(emitted=self.emitted, coalesced=self.coalesced, dropped=self.dropped)
+
+
+__all__ = ["MoveDecimator"]
@@ -0,0 +1,126 @@
+"""
+Reader of the event logs written by the recorder, e.g. `recording.jsonl` next to `recording.mkv`.
+
+Keyboard and mouse events are loaded into a columnar `EventTable`, so that downstream processing can operate
+on numpy arrays instead of Python objects.
+"""
+
+import os
+import re
+from enum import IntEnum
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import orjson
+
+
+class EventKind(IntEnum):
+    KEY = 1
+    MOUSE_MOVE = 2
+    MOUSE_CLICK = 3
+    MOUSE_SCROLL = 4
+
+
+MOUSE_BUTTONS = {"left": 1, "right": 2, "middle": 3}
+
+CONTROL_SOURCE = "control_publisher"
+
+
+class EventTable(NamedTuple):
+    """Keyboard and mouse events in columnar form, sorted by timestamp. Unused columns of an event are zero."""
+
+    timestamp_ns: np.ndarray  # int64
+    kind: np.ndarray  # uint8, EventKind
+    code: np.ndarray  # int32, virtual key code of KEY, button of MOUSE_CLICK (see MOUSE_BUTTONS)
+    pressed: np.ndarray  # bool, for KEY and MOUSE_CLICK
+    x: np.ndarray  # int32, pointer position of mouse events
+    y: np.ndarray  # int32
+    dx: np.ndarray  # int32, scroll amount of MOUSE_SCROLL
+    dy: np.ndarray  # int32
+
+    def __len__(self):
+        return len(self.timestamp_ns)
+
+    @classmethod
+    def from_rows(cls, rows: list[tuple]) -> "EventTable":
+        """Build a table from (timestamp_ns, kind, code, pressed, x, y, dx, dy) rows."""
+        rows.sort(key=lambda row: row[0])
+        columns = list(zip(*rows)) if rows else [()] * len(cls._fields)
+        dtypes = (np.int64, np.uint8, np.int32, bool, np.int32, np.int32, np.int32, np.int32)
+        return cls(*(np.asarray(column, dtype=dtype) for column, dtype in zip(columns, dtypes)))
+
+    def select(self, mask: np.ndarray) -> "EventTable":
+        return EventTable(*(column[mask] for column in self))
+
+
+# mouse buttons used to be written as bare words, e.g. `["mouse.click",1446,1107,left,true]`
+_BARE_WORD = re.compile(rb"(?<=[\[,])(?!true\b|false\b|null\b)([A-Za-z_][\w.]*)(?=[,\]])")
+
+
+def parse_control_event(event_data: str | bytes) -> list:
+    """Parse the `event_data` of a control event, e.g. `["keyboard.press",81]`."""
+    if isinstance(event_data, str):
+        event_data = event_data.encode("utf-8")
+    try:
+        return orjson.loads(event_data)
+    except orjson.JSONDecodeError:
+        return orjson.loads(_BARE_WORD.sub(rb'"\1"', event_data))
+
+
+def control_event_to_row(timestamp_ns: int, event: list) -> tuple | None:
+    """Convert a parsed control event into an `EventTable` row. Unknown events are skipped with None."""
+    name = event[0]
+    if name == "keyboard.press" or name == "keyboard.release":
+        return (timestamp_ns, EventKind.KEY, event[1], name == "keyboard.press", 0, 0, 0, 0)
+    if name == "mouse.move":
+        return (timestamp_ns, EventKind.MOUSE_MOVE, 0, False, event[1], event[2], 0, 0)
+    if name == "mouse.click":
+        button = MOUSE_BUTTONS.get(event[3], 0)
+        return (timestamp_ns, EventKind.MOUSE_CLICK, button, bool(event[4]), event[1], event[2], 0, 0)
+    if name == "mouse.scroll":
+        return (timestamp_ns, EventKind.MOUSE_SCROLL, 0, False, event[1], event[2], event[3], event[4])
+    return None
+
+
+def event_log_path(recording: str | os.PathLike) -> Path:
+    """
+    Return the event log of a recording, the first existing of `<name>.evlog`, `<name>.jsonl.zst` and
+    `<name>.jsonl`, or `<name>.jsonl` if none exists.
+    """
+    for suffix in (".evlog", ".jsonl.zst"):
+        if (path := Path(recording).with_suffix(suffix)).exists():
+            return path
+    return Path(recording).with_suffix(".jsonl")
+
+
+def load_events(path: str | os.PathLike) -> EventTable:
+    """
+    Load the keyboard and mouse events of an event log.
+
+    Args:
+        path: Path of the `.jsonl`, zstd-compressed `.jsonl.zst` or binary `.evlog` event log
+
+    Returns:
+        EventTable: Keyboard and mouse events, sorted by timestamp
+    """
+    if os.fspath(path).endswith(".evlog"):
+        from .binlog import load_binlog
+
+        return load_binlog(path)
+    from .zstdlog import iter_lines
+
+    rows = []
+    for line in iter_lines(path):
+        if not line.strip():
+            continue
+        record = orjson.loads(line)
+        if record["event_src"] != CONTROL_SOURCE:
+            continue
+        row = control_event_to_row(record["timestamp_ns"], parse_control_event(record["event_data"]))
+        if row is not None:
+            rows.append(row)
+    return EventTable.from_rows(rows)
+
+
+__all__ = ["EventKind", "EventTable", "MOUSE_BUTTONS", "parse_control_event", "event_log_path", "load_events"]
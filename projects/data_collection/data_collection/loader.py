@@ -0,0 +1,257 @@
+"""
+Batched, prefetching loader of training clips from OWA recordings (`.mkv` + `.jsonl`).
+
+Clips are decoded by a pool of worker processes with `OwaVideoReader` and handed over to the training process
+through shared memory, so that batches never pass through a pipe. At most `prefetch` batches are decoded ahead.
+
+Example:
+```python
+loader = ClipLoader(sorted(Path("recordings").glob("*.mkv")), clip_length=16, height=224, width=224, batch_size=8)
+for batch in loader:
+    frames = torch.from_numpy(batch.frames)  # [B, T, H, W, C], only valid until the next batch is requested
+    keys = batch.actions["keys_down"]  # [B, T, 256]
+```
+"""
+
+import multiprocessing as mp
+import os
+import queue
+import traceback
+from collections import OrderedDict
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import NamedTuple, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+from .alignment import Window, align_events
+from .events import event_log_path, load_events
+
+S_TO_NS = 1_000_000_000
+FORMAT_CHANNELS = {"RGB": 3, "BGR": 3, "RGBA": 4, "BGRA": 4, "GRAY8": 1}
+# interval in seconds at which the loader checks that its workers are alive while it waits for a batch
+WORKER_POLL_INTERVAL = 1.0
+
+
+class ClipBatch(NamedTuple):
+    frames: np.ndarray  # [B, T, H, W, C] uint8, a view into shared memory valid until the next batch
+    pts_ns: np.ndarray  # [B, T] int64, presentation timestamps of the frames
+    utc_ns: np.ndarray  # [B, T] int64, wall-clock timestamps of the frames
+    actions: dict[str, np.ndarray]  # [B, T, ...] per-frame actions, see `FrameActions`
+    recordings: list[str]  # [B] recording of each clip
+
+
+class _LoaderConfig(NamedTuple):
+    recordings: list[str]
+    clip_length: int
+    frame_interval_ns: int
+    height: int
+    width: int
+    format: str
+    batch_size: int
+    window: Window
+    max_open_recordings: int
+
+    @property
+    def batch_shape(self) -> tuple:
+        return (self.batch_size, self.clip_length, self.height, self.width, FORMAT_CHANNELS[self.format])
+
+
+class _Recording:
+    """Per-worker state of an opened recording."""
+
+    def __init__(self, path: str, config: _LoaderConfig):
+        from owa_env_gst.reader import OwaVideoReader, read_timestamp_track
+
+        self.reader = OwaVideoReader(path, width=config.width, height=config.height, format=config.format)
+        self.timestamps = read_timestamp_track(path)
+        self.events = load_events(event_log_path(path))
+
+
+def _load_batch(config: _LoaderConfig, out: np.ndarray, recordings: OrderedDict, seed: Sequence[int]) -> dict:
+    rng = np.random.default_rng(seed)
+    clip_span_ns = (config.clip_length - 1) * config.frame_interval_ns
+    result = dict(pts_ns=[], utc_ns=[], actions=[], recordings=[])
+
+    for i in range(config.batch_size):
+        path = config.recordings[rng.integers(len(config.recordings))]
+        if path not in recordings:
+            recordings[path] = _Recording(path, config)
+            if len(recordings) > config.max_open_recordings:
+                _, evicted = recordings.popitem(last=False)
+                evicted.reader.close()
+        recordings.move_to_end(path)
+        recording = recordings[path]
+
+        first_pts, last_pts = recording.reader.index.pts_ns[[0, -1]]
+        start = rng.integers(first_pts, max(first_pts, last_pts - clip_span_ns) + 1)
+        pts_ns = start + np.arange(config.clip_length, dtype=np.int64) * config.frame_interval_ns
+
+        out[i] = recording.reader.get_frames(pts_ns)
+        utc_ns = recording.timestamps.pts_to_utc(pts_ns)
+        result["pts_ns"].append(pts_ns)
+        result["utc_ns"].append(utc_ns)
+        result["actions"].append(align_events(recording.events, utc_ns, window=config.window)._asdict())
+        result["recordings"].append(path)
+
+    result["pts_ns"] = np.stack(result["pts_ns"])
+    result["utc_ns"] = np.stack(result["utc_ns"])
+    result["actions"] = {key: np.stack([a[key] for a in result["actions"]]) for key in result["actions"][0]}
+    return result
+
+
+def _worker_loop(config: _LoaderConfig, shm_names: list[str], task_queue: mp.Queue, result_queue: mp.Queue):
+    shms = [SharedMemory(name=name) for name in shm_names]
+    slots = [np.ndarray(config.batch_shape, dtype=np.uint8, buffer=shm.buf) for shm in shms]
+    recordings: OrderedDict[str, _Recording] = OrderedDict()
+    try:
+        while (task := task_queue.get()) is not None:
+            batch_idx, slot, seed = task
+            try:
+                result_queue.put((batch_idx, slot, _load_batch(config, slots[slot], recordings, seed), None))
+            except Exception:
+                result_queue.put((batch_idx, slot, None, traceback.format_exc()))
+    finally:
+        for recording in recordings.values():
+            recording.reader.close()
+        del slots
+        for shm in shms:
+            shm.close()
+
+
+def _get_result(result_queue: mp.Queue, workers: list) -> tuple:
+    """Wait for the next result of the workers, raising if one of them exited, e.g. as it was killed."""
+    while True:
+        try:
+            return result_queue.get(timeout=WORKER_POLL_INTERVAL)
+        except queue.Empty:
+            pass
+        for worker in workers:
+            if not worker.is_alive():
+                raise RuntimeError(f"Loader worker {worker.pid} exited unexpectedly with code {worker.exitcode}")
+
+
+class ClipLoader:
+    """
+    Iterate over batches of randomly sampled clips of OWA recordings.
+
+    Each clip has `clip_length` frames, `frame_interval` seconds apart, resized to `height` x `width`.
+    Actions aligned to the frames are delivered alongside, see `align_events`.
+    """
+
+    def __init__(
+        self,
+        recordings: Sequence[str | os.PathLike],
+        *,
+        clip_length: int = 16,
+        frame_interval: float = 0.1,
+        height: int = 224,
+        width: int = 224,
+        format: str = "RGB",
+        batch_size: int = 8,
+        window: Window = "past",
+        num_batches: Optional[int] = None,
+        num_workers: int = 4,
+        prefetch: int = 2,
+        max_open_recordings: int = 8,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            recordings: Paths of `.mkv` recordings. Each must have a `.jsonl` or `.evlog` event log with the same name.
+            clip_length: Number of frames of a clip.
+            frame_interval: Interval between frames of a clip, in seconds.
+            height: Height of the frames.
+            width: Width of the frames.
+            format: Raw video format of the frames, one of "RGB", "BGR", "RGBA", "BGRA" or "GRAY8".
+            batch_size: Number of clips of a batch.
+            window: Window semantics of the aligned actions, "past" or "future". See `align_events`.
+            num_batches: Number of batches to iterate. If None, iterate forever.
+            num_workers: Number of decoding processes.
+            prefetch: Number of batches decoded ahead of the consumer.
+            max_open_recordings: Number of recordings each worker keeps open for reuse.
+            seed: Seed of the clip sampling. Batches are reproducible regardless of `num_workers`.
+        """
+        assert recordings, "At least one recording is required."
+        assert format in FORMAT_CHANNELS, f"Unsupported format: {format}"
+        self.config = _LoaderConfig(
+            recordings=[Path(path).as_posix() for path in recordings],
+            clip_length=clip_length,
+            frame_interval_ns=int(frame_interval * S_TO_NS),
+            height=height,
+            width=width,
+            format=format,
+            batch_size=batch_size,
+            window=window,
+            max_open_recordings=max_open_recordings,
+        )
+        self.num_batches = num_batches
+        self.num_workers = num_workers
+        self.prefetch = prefetch
+        self.seed = seed
+
+    def __iter__(self):
+        # GStreamer is not fork-safe, so workers are spawned
+        ctx = mp.get_context("spawn")
+        batch_shape = self.config.batch_shape
+        # one extra slot holds the batch which the consumer is currently using
+        shms = [SharedMemory(create=True, size=int(np.prod(batch_shape))) for _ in range(self.prefetch + 1)]
+        slots = [np.ndarray(batch_shape, dtype=np.uint8, buffer=shm.buf) for shm in shms]
+        task_queue, result_queue = ctx.Queue(), ctx.Queue()
+        workers = [
+            ctx.Process(
+                target=_worker_loop,
+                args=(self.config, [shm.name for shm in shms], task_queue, result_queue),
+                daemon=True,
+            )
+            for _ in range(self.num_workers)
+        ]
+        for worker in workers:
+            worker.start()
+
+        submitted = 0
+
+        def submit(slot: int):
+            nonlocal submitted
+            if self.num_batches is None or submitted < self.num_batches:
+                task_queue.put((submitted, slot, (self.seed, submitted)))
+                submitted += 1
+
+        try:
+            for slot in range(self.prefetch):
+                submit(slot)
+            # workers finish batches in any order, so they are yielded by index to be reproducible
+            free_slot, next_idx, ready = self.prefetch, 0, {}
+            while self.num_batches is None or next_idx < self.num_batches:
+                while next_idx not in ready:
+                    batch_idx, slot, result, error = _get_result(result_queue, workers)
+                    if error is not None:
+                        raise RuntimeError(f"Failed to load batch {batch_idx}:\n{error}")
+                    ready[batch_idx] = (slot, result)
+                slot, result = ready.pop(next_idx)
+                next_idx += 1
+
+                # decoding of the next batch starts before the consumer gets this one
+                submit(free_slot)
+                yield ClipBatch(frames=slots[slot], **result)
+                free_slot = slot
+        finally:
+            for _ in workers:
+                task_queue.put(None)
+            for worker in workers:
+                worker.join(timeout=5)
+                if worker.is_alive():
+                    logger.warning(f"Terminating unresponsive loader worker {worker.pid}")
+                    worker.terminate()
+            del slots
+            for shm in shms:
+                shm.unlink()
+                try:
+                    shm.close()
+                except BufferError:
+                    # the consumer still holds the last batch; the mapping is released with it
+                    pass
+
+
+__all__ = ["ClipBatch", "ClipLoader"]
@@ -0,0 +1,294 @@
+"""
+Background writer of the recorder's event log.
+
+Input hooks only timestamp an event and append it to an in-memory queue. Serialization and disk I/O happen on a
+dedicated thread, which keeps the sink open and writes events in batches.
+
+Example:
+```python
+writer = EventWriter().configure(FileSink("output.jsonl"))
+writer.start()
+writer.put(("keyboard.press", 81), source="control_publisher")  # never blocks
+writer.stop()
+writer.join()
+```
+"""
+
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from pathlib import Path
+from typing import Callable, Optional
+
+import orjson
+from loguru import logger
+from pydantic import BaseModel
+
+from owa.runnable import RunnableThread
+
+S_TO_NS = 1_000_000_000
+
+
+class EventSink(ABC):
+    """Destination of event records. Methods are only called from the writer thread."""
+
+    @abstractmethod
+    def write_events(self, events: list[tuple]):
+        """
+        Write a batch of events.
+
+        Args:
+            events: (timestamp_ns, source, event) tuples, in the order they were enqueued
+        """
+
+    def flush(self):
+        """Hand the written data over to the operating system."""
+
+    def fsync(self):
+        """Persist the written data to disk."""
+
+    def close(self):
+        pass
+
+
+class LineSink(EventSink):
+    """Destination of the `.jsonl` event log, which receives the events serialized into lines."""
+
+    def write_events(self, events: list[tuple]):
+        lines = []
+        for timestamp_ns, source, event in events:
+            try:
+                lines.append(serialize_event(timestamp_ns, source, event))
+            except Exception as e:
+                logger.error(f"Failed to serialize event from {source}: {event!r} ({e})")
+        self.write(b"".join(lines))
+
+    @abstractmethod
+    def write(self, data: bytes):
+        """Write serialized `.jsonl` lines."""
+
+
+class FileSink(LineSink):
+    """Append serialized records to a file, which is kept open."""
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = Path(path)
+        self._file = open(self.path, "ab")
+
+    def write(self, data: bytes):
+        self._file.write(data)
+
+    def flush(self):
+        self._file.flush()
+
+    def fsync(self):
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class SegmentedSink(EventSink):
+    """
+    Split the event log at the boundaries of the video segments, e.g. into `rec_00000.jsonl`, `rec_00001.jsonl`, ...
+    next to `rec_00000.mkv`, `rec_00001.mkv`, ..., so that each segment is processed independently.
+
+    Segment `k` receives the events in `[start of k, start of k + 1)`. Starts are announced with `start_segment` as
+    the recorder reports them. Events past the expected end of the current segment are held back until the start of
+    the next segment is announced, or `grace` seconds later, after which the expected boundary is used.
+    """
+
+    def __init__(self, make_sink: Callable[[int], EventSink], segment_duration: float, *, grace: float = 5.0):
+        """
+        Args:
+            make_sink: Called with the index of a segment to open its sink.
+            segment_duration: Expected duration of a segment in seconds.
+            grace: Time in seconds to wait for the announcement of a boundary.
+        """
+        self.make_sink = make_sink
+        self.segment_duration_ns = int(segment_duration * S_TO_NS)
+        self.grace_ns = int(grace * S_TO_NS)
+        self.index = 0
+        self.sink = make_sink(0)
+        self._starts: dict[int, int] = {}
+        self._held: deque = deque()
+        self._lock = threading.Lock()
+
+    def start_segment(self, index: int, start_utc_ns: int):
+        """Announce the UTC start of a segment. Thread-safe; announcements after a fallback are ignored."""
+        with self._lock:
+            self._starts.setdefault(index, start_utc_ns)
+
+    def _boundary(self, timestamp_ns: int, force: bool) -> Optional[int]:
+        """End of the current segment for an event at `timestamp_ns`, None if unknown, or -1 to hold the event."""
+        with self._lock:
+            if (end := self._starts.get(self.index + 1)) is not None:
+                return end
+            if (start := self._starts.get(self.index)) is None:
+                return None
+            expected_end = start + self.segment_duration_ns
+            if timestamp_ns < expected_end:
+                return expected_end
+            if force or time.time_ns() - expected_end >= self.grace_ns:
+                logger.warning(f"Start of segment {self.index + 1} was not announced, splitting at the expected time")
+                self._starts[self.index + 1] = expected_end
+                return expected_end
+            return -1
+
+    def _route(self, force: bool = False):
+        batch = []
+        while self._held:
+            timestamp_ns = self._held[0][0]
+            end = self._boundary(timestamp_ns, force)
+            if end == -1:
+                break
+            if end is None or timestamp_ns < end:
+                batch.append(self._held.popleft())
+                continue
+            if batch:
+                self.sink.write_events(batch)
+                batch = []
+            self._rotate()
+        if batch:
+            self.sink.write_events(batch)
+
+    def _rotate(self):
+        self.sink.flush()
+        self.sink.fsync()
+        self.sink.close()
+        self.index += 1
+        self.sink = self.make_sink(self.index)
+
+    def write_events(self, events: list[tuple]):
+        self._held.extend(events)
+        self._route()
+
+    def flush(self):
+        self._route()
+        self.sink.flush()
+
+    def fsync(self):
+        self.sink.fsync()
+
+    def close(self):
+        self._route(force=True)
+        self.sink.close()
+
+
+def serialize_event(timestamp_ns: int, source: str, event) -> bytes:
+    """Serialize an event into a line of the `.jsonl` event log."""
+    if isinstance(event, BaseModel):
+        event_data = event.model_dump_json()
+    else:
+        event_data = orjson.dumps(event).decode("utf-8")
+    return orjson.dumps({"timestamp_ns": timestamp_ns, "event_src": source, "event_data": event_data}) + b"\n"
+
+
+class EventWriter(RunnableThread):
+    """
+    Thread which drains a queue of events into an `EventSink`.
+
+    Events are flushed every `flush_interval` seconds or as soon as `flush_events` events are pending, whichever
+    comes first, and the sink is fsynced every `fsync_interval` seconds.
+    """
+
+    def on_configure(
+        self,
+        sink: EventSink,
+        *,
+        flush_interval: float = 0.1,
+        flush_events: int = 256,
+        fsync_interval: Optional[float] = 1.0,
+    ):
+        """
+        Args:
+            sink: Destination of the serialized events. It is closed when the writer stops.
+            flush_interval: Maximum time in seconds an event waits in the queue.
+            flush_events: Number of pending events which triggers a flush before `flush_interval` elapses.
+            fsync_interval: Interval in seconds between fsyncs of the sink. If None, the sink is only fsynced on stop.
+        """
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.flush_events = flush_events
+        self.fsync_interval_ns = None if fsync_interval is None else int(fsync_interval * S_TO_NS)
+
+        # `deque.append` and `deque.popleft` are atomic, so producers never take a lock
+        self._queue: deque = deque()
+        self._wake = threading.Event()
+        self.high_water_mark = 0
+        self.num_written = 0
+        self.num_flushes = 0
+        self.num_fsyncs = 0
+        self.max_batch_latency_ns = 0
+
+    def put(self, event, source: str, timestamp_ns: Optional[int] = None):
+        """
+        Enqueue an event. Called from input hook threads; it never blocks on I/O.
+
+        Args:
+            event: Event data, a pydantic model or an orjson-serializable object
+            source: Name of the event source, e.g. "control_publisher"
+            timestamp_ns: UTC timestamp of the event. If None, the current time is used.
+        """
+        self._queue.append((time.time_ns() if timestamp_ns is None else timestamp_ns, source, event))
+        pending = len(self._queue)
+        if pending > self.high_water_mark:
+            self.high_water_mark = pending
+        if pending >= self.flush_events:
+            self._wake.set()
+
+    def stats(self) -> dict:
+        return dict(
+            pending=len(self._queue),
+            written=self.num_written,
+            high_water_mark=self.high_water_mark,
+            flushes=self.num_flushes,
+            fsyncs=self.num_fsyncs,
+            max_batch_latency_ns=self.max_batch_latency_ns,
+        )
+
+    def stop(self):
+        super().stop()
+        self._wake.set()
+
+    def _drain(self) -> int:
+        """Write every queued event. Returns the number of events written."""
+        batch = []
+        while self._queue:
+            batch.append(self._queue.popleft())
+        if not batch:
+            return 0
+
+        self.sink.write_events(batch)
+        self.sink.flush()
+        self.num_written += len(batch)
+        self.num_flushes += 1
+        self.max_batch_latency_ns = max(self.max_batch_latency_ns, time.time_ns() - batch[0][0])
+        return len(batch)
+
+    def loop(self, stop_event: threading.Event):
+        last_fsync_ns = time.monotonic_ns()
+        try:
+            while not stop_event.is_set():
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                written = self._drain()
+                if (
+                    written
+                    and self.fsync_interval_ns is not None
+                    and time.monotonic_ns() - last_fsync_ns >= self.fsync_interval_ns
+                ):
+                    self.sink.fsync()
+                    self.num_fsyncs += 1
+                    last_fsync_ns = time.monotonic_ns()
+        finally:
+            self._drain()
+            self.sink.fsync()
+            self.num_fsyncs += 1
+            self.sink.close()
+            logger.debug(f"Event writer stopped: {self.stats()}")
+
+
+__all__ = ["EventSink", "LineSink", "FileSink", "SegmentedSink", "EventWriter", "serialize_event"]
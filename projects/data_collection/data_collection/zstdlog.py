@@ -0,0 +1,236 @@
+"""
+zstd-compressed `.jsonl` event log with seekable frames, e.g. `recording.jsonl.zst` next to `recording.mkv`.
+
+The file is a valid multi-frame zstd stream, so `zstd -d recording.jsonl.zst` restores the plain `.jsonl` log.
+Events are compressed in independent frames of a few seconds each. Every frame is preceded by a skippable frame
+holding its time range, number of lines and compressed size, and the file ends with a skippable frame indexing
+every frame. Readers locate the frames of a time range from the index and decompress only those. Logs of a
+crashed recording have no index and are read by hopping over the frame headers; a partially written frame at the
+end is ignored.
+
+Example:
+```python
+writer = EventWriter().configure(ZstdLogSink("recording.jsonl.zst"))
+...
+for line in ZstdEventLog("recording.jsonl.zst").iter_lines(start_ns, end_ns):
+    record = orjson.loads(line)
+```
+"""
+
+import os
+import struct
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+from loguru import logger
+
+from .writer import EventSink, serialize_event
+
+ZSTD_SUFFIX = ".jsonl.zst"
+
+S_TO_NS = 1_000_000_000
+
+# zstd skippable frames have a magic number in 0x184D2A50..0x184D2A5F and are ignored by decoders
+FRAME_HEADER_MAGIC = 0x184D2A5B
+INDEX_MAGIC = 0x184D2A5C
+ZSTD_MAGIC = 0xFD2FB528
+# magic, size of the skippable frame content
+_SKIPPABLE = struct.Struct("<II")
+# start_ns, end_ns, number of lines, compressed size of the following frame
+_FRAME_HEADER = struct.Struct("<qqII")
+# number of index entries, tag; the last bytes of an indexed file
+_INDEX_FOOTER = struct.Struct("<I4s")
+INDEX_TAG = b"OWAZ"
+
+INDEX_DTYPE = np.dtype(
+    [("offset", "<u8"), ("start_ns", "<i8"), ("end_ns", "<i8"), ("num_lines", "<u4"), ("size", "<u4")]
+)
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError(
+            "zstd compression of event logs requires `zstandard`, install it with `pip install data-collection[zstd]`"
+        ) from e
+    return zstandard
+
+
+class ZstdLogSink(EventSink):
+    """
+    Writer of a zstd-compressed `.jsonl` event log, to be drained by an `EventWriter`, so that compression runs on
+    the writer thread instead of the input hooks.
+
+    Events are buffered and compressed into a frame once `frame_interval` seconds of events or `frame_bytes` bytes
+    of lines are buffered. A crash loses the events of the frame being buffered.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        *,
+        level: int = 3,
+        frame_interval: float = 5.0,
+        frame_bytes: int = 4 << 20,
+    ):
+        """
+        Args:
+            path: Path of the event log. An existing file is overwritten.
+            level: zstd compression level
+            frame_interval: Time span of the events of a frame in seconds
+            frame_bytes: Maximum size of the uncompressed lines of a frame
+        """
+        self.path = Path(path)
+        self._compressor = _zstd().ZstdCompressor(level=level, write_content_size=True)
+        self.frame_interval_ns = int(frame_interval * S_TO_NS)
+        self.frame_bytes = frame_bytes
+
+        self._lines: list[bytes] = []
+        self._size = 0
+        self._start_ns: Optional[int] = None
+        self._end_ns: Optional[int] = None
+        self._index: list[tuple] = []
+        self._file = open(self.path, "wb")
+
+    def write_events(self, events: list[tuple]):
+        for timestamp_ns, source, event in events:
+            if self._start_ns is not None and timestamp_ns - self._start_ns >= self.frame_interval_ns:
+                self._write_frame()
+            try:
+                line = serialize_event(timestamp_ns, source, event)
+            except Exception as e:
+                logger.error(f"Failed to serialize event from {source}: {event!r} ({e})")
+                continue
+            self._lines.append(line)
+            self._size += len(line)
+            if self._start_ns is None:
+                self._start_ns = self._end_ns = timestamp_ns
+            else:
+                self._start_ns = min(self._start_ns, timestamp_ns)
+                self._end_ns = max(self._end_ns, timestamp_ns)
+            if self._size >= self.frame_bytes:
+                self._write_frame()
+
+    def _write_frame(self):
+        if not self._lines:
+            return
+        frame = self._compressor.compress(b"".join(self._lines))
+        header = _SKIPPABLE.pack(FRAME_HEADER_MAGIC, _FRAME_HEADER.size) + _FRAME_HEADER.pack(
+            self._start_ns, self._end_ns, len(self._lines), len(frame)
+        )
+        offset = self._file.tell() + len(header)
+        self._file.write(header + frame)
+        self._index.append((offset, self._start_ns, self._end_ns, len(self._lines), len(frame)))
+        self._lines, self._size = [], 0
+        self._start_ns = self._end_ns = None
+
+    def flush(self):
+        self._file.flush()
+
+    def fsync(self):
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._write_frame()
+        entries = np.array(self._index, dtype=INDEX_DTYPE).tobytes()
+        content = entries + _INDEX_FOOTER.pack(len(self._index), INDEX_TAG)
+        self._file.write(_SKIPPABLE.pack(INDEX_MAGIC, len(content)) + content)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+
+def _scan_frames(data: memoryview) -> np.ndarray:
+    """Index the complete frames of a log without index, by hopping over the frame headers."""
+    entries, pos = [], 0
+    while pos + _SKIPPABLE.size <= len(data):
+        magic, size = _SKIPPABLE.unpack_from(data, pos)
+        if magic == FRAME_HEADER_MAGIC and size == _FRAME_HEADER.size and pos + _SKIPPABLE.size + size <= len(data):
+            start_ns, end_ns, num_lines, frame_size = _FRAME_HEADER.unpack_from(data, pos + _SKIPPABLE.size)
+            offset = pos + _SKIPPABLE.size + size
+            if offset + frame_size > len(data):
+                break
+            entries.append((offset, start_ns, end_ns, num_lines, frame_size))
+            pos = offset + frame_size
+        elif magic == INDEX_MAGIC:
+            pos += _SKIPPABLE.size + size
+        else:
+            break
+    return np.array(entries, dtype=INDEX_DTYPE)
+
+
+def _read_index(data: memoryview) -> np.ndarray:
+    if len(data) >= _SKIPPABLE.size + _INDEX_FOOTER.size:
+        count, tag = _INDEX_FOOTER.unpack_from(data, len(data) - _INDEX_FOOTER.size)
+        start = len(data) - _INDEX_FOOTER.size - count * INDEX_DTYPE.itemsize - _SKIPPABLE.size
+        if tag == INDEX_TAG and start >= 0 and _SKIPPABLE.unpack_from(data, start)[0] == INDEX_MAGIC:
+            return np.frombuffer(data, dtype=INDEX_DTYPE, count=count, offset=start + _SKIPPABLE.size)
+    return _scan_frames(data)
+
+
+class ZstdEventLog:
+    """
+    Reader of a zstd-compressed `.jsonl` event log. The file is memory-mapped and frames are decompressed on access.
+    """
+
+    def __init__(self, path: str | os.PathLike):
+        """
+        Args:
+            path: Path of the `.jsonl.zst` event log
+        """
+        self.path = Path(path)
+        size = os.path.getsize(self.path)
+        self._data = memoryview(np.memmap(self.path, dtype=np.uint8, mode="r", shape=(size,))) if size else b""
+        # offset, start_ns, end_ns, num_lines and size of every frame, see `INDEX_DTYPE`
+        self.frames = _read_index(memoryview(self._data))
+        # e.g. a `.jsonl` log compressed with the zstd command line tool, which is decompressed as a whole
+        self.seekable = not (
+            size >= 4 and not len(self.frames) and _SKIPPABLE.unpack_from(self._data)[0] == ZSTD_MAGIC
+        )
+        self._decompressor = _zstd().ZstdDecompressor()
+
+    def __len__(self):
+        return int(self.frames["num_lines"].sum())
+
+    def iter_lines(self, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Lines of the frames overlapping `[start_ns, end_ns)`. Lines of these frames outside the range are included,
+        so that callers filter them after parsing.
+        """
+        if not self.seekable:
+            reader = self._decompressor.stream_reader(bytes(self._data), read_across_frames=True)
+            yield from reader.read().splitlines()
+            return
+
+        mask = np.ones(len(self.frames), dtype=bool)
+        if start_ns is not None:
+            mask &= self.frames["end_ns"] >= start_ns
+        if end_ns is not None:
+            mask &= self.frames["start_ns"] < end_ns
+        for offset, size in self.frames[["offset", "size"]][mask].tolist():
+            yield from self._decompressor.decompress(self._data[offset : offset + size]).splitlines()
+
+
+def iter_lines(
+    path: str | os.PathLike, start_ns: Optional[int] = None, end_ns: Optional[int] = None
+) -> Iterator[bytes]:
+    """
+    Iterate the lines of a plain `.jsonl` or zstd-compressed `.jsonl.zst` event log.
+
+    Args:
+        path: Path of the event log
+        start_ns: If given with a compressed log, frames ending before it are skipped.
+        end_ns: If given with a compressed log, frames starting at or after it are skipped.
+    """
+    if os.fspath(path).endswith(".zst"):
+        yield from ZstdEventLog(path).iter_lines(start_ns, end_ns)
+        return
+    with open(path, "rb") as f:
+        yield from f
+
+
+__all__ = ["ZstdLogSink", "ZstdEventLog", "iter_lines", "ZSTD_SUFFIX"]
@@ -0,0 +1,59 @@
+import numpy as np
+
+from data_collection.alignment import align_events, assign_events, window_edges
+from data_collection.events import EventKind, EventTable
+
+KEY, MOVE, CLICK, SCROLL = EventKind.KEY, EventKind.MOUSE_MOVE, EventKind.MOUSE_CLICK, EventKind.MOUSE_SCROLL
+
+# (timestamp_ns, kind, code, pressed, x, y, dx, dy)
+EVENTS = EventTable.from_rows(
+    [
+        (50, MOVE, 0, False, 5, 5, 0, 0),
+        (120, KEY, 81, True, 0, 0, 0, 0),
+        (150, MOVE, 0, False, 10, 20, 0, 0),
+        (200, CLICK, 1, True, 10, 20, 0, 0),
+        (210, KEY, 87, True, 0, 0, 0, 0),
+        (220, KEY, 87, False, 0, 0, 0, 0),
+        (300, KEY, 81, False, 0, 0, 0, 0),
+        (350, SCROLL, 0, False, 30, 40, 0, -1),
+        (390, SCROLL, 0, False, 30, 40, 0, -2),
+    ]
+)
+FRAMES = np.array([100, 200, 300, 400], dtype=np.int64)
+
+
+def test_assign_events():
+    np.testing.assert_array_equal(window_edges(FRAMES, "past"), [0, 100, 200, 300, 400])
+    np.testing.assert_array_equal(window_edges(FRAMES, "future"), [100, 200, 300, 400, 500])
+
+    timestamps = np.array([-1, 0, 100, 150, 200, 400, 500])
+    np.testing.assert_array_equal(
+        assign_events(timestamps, window_edges(FRAMES, "past"), "past"), [-1, -1, 0, 1, 1, 3, 4]
+    )
+    np.testing.assert_array_equal(
+        assign_events(timestamps, window_edges(FRAMES, "future"), "future"), [-1, -1, 0, 0, 1, 3, 4]
+    )
+
+
+def test_align_past():
+    actions = align_events(EVENTS, FRAMES, window="past")
+    assert len(actions) == 4
+    np.testing.assert_array_equal(actions.keys_down[:, 81], [False, True, False, False])
+    # a tap shorter than a frame is only visible as a press
+    np.testing.assert_array_equal(actions.keys_down[:, 87], [False, False, False, False])
+    np.testing.assert_array_equal(actions.keys_pressed[:, 87], [False, False, True, False])
+    np.testing.assert_array_equal(actions.buttons_down[:, 0], [False, True, True, True])
+    np.testing.assert_array_equal(actions.clicks[:, 0], [0, 1, 0, 0])
+    np.testing.assert_array_equal(actions.mouse_xy, [[5, 5], [10, 20], [10, 20], [30, 40]])
+    np.testing.assert_array_equal(actions.mouse_delta, [[0, 0], [5, 15], [0, 0], [20, 20]])
+    np.testing.assert_array_equal(actions.scroll, [[0, 0], [0, 0], [0, 0], [0, -3]])
+    np.testing.assert_array_equal(actions.num_events, [1, 3, 3, 2])
+
+
+def test_align_future():
+    actions = align_events(EVENTS, FRAMES, window="future")
+    np.testing.assert_array_equal(actions.keys_down[:, 81], [True, True, False, False])
+    np.testing.assert_array_equal(actions.clicks[:, 0], [0, 1, 0, 0])
+    # the position before the first window is known, so the first delta is measured from it
+    np.testing.assert_array_equal(actions.mouse_delta, [[5, 15], [0, 0], [20, 20], [0, 0]])
+    np.testing.assert_array_equal(actions.num_events, [2, 3, 3, 0])
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from data_collection.binlog import BinaryLog, BinaryLogSink, convert_jsonl, load_binlog
+from data_collection.events import load_events
+
+S = 1_000_000_000
+
+
+def write_jsonl(path, events):
+    with open(path, "w") as f:
+        for timestamp_ns, source, event_data in events:
+            event_data = event_data.replace('"', '\\"')
+            f.write(f'{{"timestamp_ns":{timestamp_ns},"event_src":"{source}","event_data":"{event_data}"}}\n')
+
+
+EVENTS = [
+    (100, "control_publisher", '["keyboard.press",81]'),
+    (150, "control_publisher", '["mouse.move",10,20]'),
+    (200, "control_publisher", '["mouse.click",10,20,left,true]'),
+    (250, "control_publisher", '["mouse.click",10,20,"x1",true]'),
+    (S + 300, "window_publisher", '{"title":"game","rect":[0,0,800,600],"hWnd":1}'),
+    (S + 400, "control_publisher", '["mouse.scroll",30,40,0,-1]'),
+    (2 * S + 500, "control_publisher", '["keyboard.release",81]'),
+]
+
+
+@pytest.mark.parametrize("compression", [None, "zstd"])
+def test_convert_matches_jsonl(tmp_path, compression):
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    src = tmp_path / "recording.jsonl"
+    write_jsonl(src, EVENTS)
+    dst = convert_jsonl(src, compression=compression)
+
+    assert dst == tmp_path / "recording.evlog"
+    expected, events = load_events(src), load_events(dst)
+    for column in expected._fields:
+        np.testing.assert_array_equal(getattr(events, column), getattr(expected, column))
+
+    log = BinaryLog(dst)
+    assert len(log.chunks) == 3
+    assert len(log) == len(EVENTS)
+    # events without a typed form are kept as JSON records
+    records = list(log.records())
+    assert [record.source for record in records] == ["control_publisher", "window_publisher"]
+    assert records[1].data == b'{"title":"game","rect":[0,0,800,600],"hWnd":1}'
+
+
+def test_time_range(tmp_path):
+    src = tmp_path / "recording.jsonl"
+    write_jsonl(src, EVENTS)
+    dst = convert_jsonl(src)
+
+    events = load_binlog(dst, start_ns=S, end_ns=2 * S + 500)
+    assert events.timestamp_ns.tolist() == [S + 400]
+    assert [record.timestamp_ns for record in BinaryLog(dst).records(start_ns=S)] == [S + 300]
+
+
+def test_read_without_footer(tmp_path):
+    path = tmp_path / "recording.evlog"
+    sink = BinaryLogSink(path, chunk_interval=1.0, index_interval=2)
+    sink.write_events([(i * S, "control_publisher", ("keyboard.press", i)) for i in range(5)])
+    sink.flush()
+    # simulate a crash: chunks 0-3 and an index block are written, and the last chunk is cut in the middle
+    sink._write_chunk()
+    sink.flush()
+    data = path.read_bytes()
+    path.write_bytes(data[:-4])
+
+    events = load_binlog(path)
+    assert events.code.tolist() == [0, 1, 2, 3]
+
+
+def test_untyped_control_events_are_kept_as_records(tmp_path):
+    path = tmp_path / "recording.evlog"
+    sink = BinaryLogSink(path)
+    sink.write_events(
+        [
+            (1, "control_publisher", ("keyboard.press", "a")),
+            (2, "control_publisher", ("mouse.move", 2**40, 0)),
+            (3, "control_publisher", ("mouse.move", 10, 20)),
+        ]
+    )
+    sink.close()
+
+    assert load_binlog(path).timestamp_ns.tolist() == [3]
+    records = list(BinaryLog(path).records())
+    assert [(record.timestamp_ns, record.data) for record in records] == [
+        (1, b'["keyboard.press","a"]'),
+        (2, b'["mouse.move",1099511627776,0]'),
+    ]
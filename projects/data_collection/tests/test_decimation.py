@@ -0,0 +1,66 @@
+from data_collection.decimation import MoveDecimator
+
+MS = 1_000_000
+
+
+def make_decimator(**kwargs):
+    emitted = []
+    return MoveDecimator(lambda event, timestamp_ns: emitted.append((timestamp_ns, event)), **kwargs), emitted
+
+
+def test_max_rate_keeps_the_last_position():
+    decimator, emitted = make_decimator(max_rate=100)
+    for t in range(50):
+        decimator.put(("mouse.move", t, 0), t * MS)
+    decimator.flush(now_ns=200 * MS)
+
+    assert [timestamp_ns // MS for timestamp_ns, _ in emitted] == [0, 9, 19, 29, 39, 49]
+    assert emitted[-1][1] == ("mouse.move", 49, 0)
+    assert decimator.stats() == dict(emitted=6, coalesced=44, dropped=0)
+
+
+def test_other_events_flush_the_held_move():
+    decimator, emitted = make_decimator(interval=1 / 60)
+    decimator.put(("mouse.move", 0, 0), 0)
+    decimator.put(("mouse.move", 5, 5), 1 * MS)
+    decimator.put(("mouse.click", 5, 5, "left", True), 2 * MS)
+
+    assert [event for _, event in emitted] == [
+        ("mouse.move", 0, 0),
+        ("mouse.move", 5, 5),
+        ("mouse.click", 5, 5, "left", True),
+    ]
+    # the held move is not emitted before its interval elapses
+    decimator.put(("mouse.move", 6, 6), 3 * MS)
+    decimator.flush(now_ns=4 * MS)
+    assert len(emitted) == 3
+    decimator.close()
+    assert emitted[-1] == (3 * MS, ("mouse.move", 6, 6))
+
+
+def test_min_distance():
+    decimator, emitted = make_decimator(min_distance=5)
+    for t, x in enumerate([0, 3, 4, 6, 7, 20]):
+        decimator.put(("mouse.move", x, 0), t * MS)
+
+    assert [event[1] for _, event in emitted] == [0, 6, 20]
+    assert decimator.stats() == dict(emitted=3, coalesced=0, dropped=3)
+
+
+def test_min_distance_keeps_the_resting_position():
+    decimator, emitted = make_decimator(min_distance=5)
+    for t, x in enumerate([0, 6, 8, 9]):
+        decimator.put(("mouse.move", x, 0), t * MS)
+    assert [event[1] for _, event in emitted] == [0, 6]
+
+    # the pointer stopped closer than `min_distance` to the last emitted move
+    decimator.flush(10 * MS)
+    decimator.put(("mouse.move", 10, 0), 11 * MS)
+    decimator.put(("keyboard.press", 13), 12 * MS)
+
+    assert emitted[2:] == [
+        (3 * MS, ("mouse.move", 9, 0)),
+        (11 * MS, ("mouse.move", 10, 0)),
+        (12 * MS, ("keyboard.press", 13)),
+    ]
+    assert decimator.stats() == dict(emitted=4, coalesced=0, dropped=1)
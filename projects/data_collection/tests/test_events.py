@@ -0,0 +1,38 @@
+import numpy as np
+
+from data_collection.events import EventKind, load_events, parse_control_event
+
+
+def write_log(path, events):
+    with open(path, "w") as f:
+        for timestamp_ns, event_data in events:
+            event_data = event_data.replace('"', '\\"')
+            f.write(f'{{"timestamp_ns":{timestamp_ns},"event_src":"control_publisher","event_data":"{event_data}"}}\n')
+        f.write('{"timestamp_ns":0,"event_src":"window_publisher","event_data":"{}"}\n')
+
+
+def test_parse_bare_words():
+    assert parse_control_event('["mouse.click",1446,1107,left,true]') == ["mouse.click", 1446, 1107, "left", True]
+
+
+def test_load_events(tmp_path):
+    log = tmp_path / "recording.jsonl"
+    write_log(
+        log,
+        [
+            (300, '["keyboard.release",81]'),
+            (100, '["keyboard.press",81]'),
+            (150, '["mouse.move",10,20]'),
+            (200, '["mouse.click",10,20,left,true]'),
+            (400, '["mouse.scroll",30,40,0,-1]'),
+        ],
+    )
+    events = load_events(log)
+    np.testing.assert_array_equal(events.timestamp_ns, [100, 150, 200, 300, 400])
+    np.testing.assert_array_equal(
+        events.kind,
+        [EventKind.KEY, EventKind.MOUSE_MOVE, EventKind.MOUSE_CLICK, EventKind.KEY, EventKind.MOUSE_SCROLL],
+    )
+    np.testing.assert_array_equal(events.code, [81, 0, 1, 81, 0])
+    np.testing.assert_array_equal(events.pressed, [True, False, True, False, False])
+    np.testing.assert_array_equal(events.dy, [0, 0, 0, 0, -1])
@@ -0,0 +1,16 @@
+import multiprocessing as mp
+import os
+
+import pytest
+
+from data_collection.loader import _get_result
+
+
+def test_loader_raises_if_a_worker_exited():
+    ctx = mp.get_context("spawn")
+    worker = ctx.Process(target=os._exit, args=(3,))
+    worker.start()
+    worker.join()
+
+    with pytest.raises(RuntimeError, match="exited unexpectedly with code 3"):
+        _get_result(ctx.Queue(), [worker])
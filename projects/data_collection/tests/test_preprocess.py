@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from typer.testing import CliRunner
+
+from data_collection.cli import preprocess
+
+
+def test_resolve_stages():
+    assert preprocess.resolve_stages(["export"]) == ["timestamps", "align", "export"]
+    assert preprocess.resolve_stages(["export", "resample"]) == ["timestamps", "resample", "align", "export"]
+
+
+def test_checkpoint(tmp_path, monkeypatch):
+    def fake_timestamps(state, config):
+        state["utc_ns"] = np.arange(10)
+
+    monkeypatch.setitem(preprocess.STAGE_FUNCTIONS, "timestamps", fake_timestamps)
+    recording, output = tmp_path / "recording.mkv", tmp_path / "out" / "recording.npz"
+    recording.write_bytes(b"0" * 16)
+    output.parent.mkdir()
+    config = dict(stages=["timestamps"], fps=20.0, window="past")
+
+    assert not preprocess.is_done(recording, output, config)
+    report = preprocess.process_recording(str(recording), str(output), config)
+    assert report["ok"] and report["frames"] == 10
+    assert preprocess.is_done(recording, output, config)
+    # a different configuration or a modified recording invalidates the checkpoint
+    assert not preprocess.is_done(recording, output, dict(config, fps=10.0))
+    recording.write_bytes(b"0" * 32)
+    assert not preprocess.is_done(recording, output, config)
+
+    # failures are reported instead of raised
+    report = preprocess.process_recording(str(recording), str(output), dict(config, stages=["align"]))
+    assert not report["ok"] and "FileNotFoundError" in report["error"]
+
+
+def test_timestamps_only_over_nested_directory(tmp_path, monkeypatch):
+    def fake_timestamps(state, config):
+        state["utc_ns"] = np.arange(10)
+
+    monkeypatch.setitem(preprocess.STAGE_FUNCTIONS, "timestamps", fake_timestamps)
+    # workers run in this process, so that they see the patched stage
+    monkeypatch.setattr(preprocess, "ProcessPoolExecutor", lambda max_workers, mp_context: ThreadPoolExecutor(1))
+    input_dir, output_dir = tmp_path / "recordings", tmp_path / "preprocessed"
+    recording = input_dir / "2025" / "day1" / "recording.mkv"
+    recording.parent.mkdir(parents=True)
+    recording.write_bytes(b"0" * 16)
+
+    result = CliRunner().invoke(preprocess.app, [str(input_dir), str(output_dir), "--stage", "timestamps"])
+    assert result.exit_code == 0, result.output
+    assert not (output_dir / "errors.jsonl").exists()
+    config = dict(stages=["timestamps"], fps=20.0, window="past")
+    assert preprocess.is_done(recording, output_dir / "2025" / "day1" / "recording.npz", config)
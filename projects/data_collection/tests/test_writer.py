@@ -0,0 +1,96 @@
+import time
+
+import orjson
+import pytest
+from pydantic import BaseModel
+
+from data_collection.events import load_events
+from data_collection.writer import EventSink, EventWriter, FileSink, LineSink, SegmentedSink, serialize_event
+
+
+class Window(BaseModel):
+    title: str
+    rect: list[int]
+
+
+class MemorySink(LineSink):
+    def __init__(self):
+        self.data, self.fsyncs, self.closed = b"", 0, False
+
+    def write(self, data: bytes):
+        self.data += data
+
+    def fsync(self):
+        self.fsyncs += 1
+
+    def close(self):
+        self.closed = True
+
+
+def test_serialize_event():
+    line = serialize_event(1, "control_publisher", ("mouse.click", 10, 20, "left", True))
+    assert (
+        line
+        == b'{"timestamp_ns":1,"event_src":"control_publisher","event_data":"[\\"mouse.click\\",10,20,\\"left\\",true]"}\n'
+    )
+    record = orjson.loads(serialize_event(2, "window_publisher", Window(title="ZType – Game", rect=[0, 0, 5, 5])))
+    assert orjson.loads(record["event_data"]) == {"title": "ZType – Game", "rect": [0, 0, 5, 5]}
+
+
+def test_incomplete_sinks_fail_at_creation():
+    class LinesNowhere(LineSink):
+        pass
+
+    with pytest.raises(TypeError):
+        EventSink()
+    with pytest.raises(TypeError):
+        LinesNowhere()
+
+
+def test_event_writer_drains_on_stop():
+    sink = MemorySink()
+    writer = EventWriter().configure(sink, flush_interval=10, flush_events=1000)
+    writer.start()
+    for i in range(100):
+        writer.put(("keyboard.press", i), source="control_publisher", timestamp_ns=i)
+    writer.stop()
+    writer.join()
+
+    lines = sink.data.splitlines()
+    assert len(lines) == 100 and orjson.loads(lines[-1])["timestamp_ns"] == 99
+    assert sink.closed and sink.fsyncs >= 1
+    assert writer.stats()["high_water_mark"] == 100 and writer.stats()["pending"] == 0
+
+
+def test_event_writer_file(tmp_path):
+    path = tmp_path / "recording.jsonl"
+    writer = EventWriter().configure(FileSink(path), flush_interval=0.01)
+    writer.start()
+    writer.put(("keyboard.press", 81), source="control_publisher", timestamp_ns=1)
+    writer.put(("keyboard.release", 81), source="control_publisher", timestamp_ns=2)
+    writer.stop()
+    writer.join()
+    assert len(load_events(path)) == 2
+
+
+def test_segmented_sink():
+    sinks = []
+
+    def make_sink(index):
+        sinks.append(MemorySink())
+        return sinks[-1]
+
+    start = time.time_ns()
+    boundary = start + 60 * 10**9
+    sink = SegmentedSink(make_sink, segment_duration=60)
+    sink.start_segment(0, start)
+    sink.write_events([(ts, "control_publisher", ("keyboard.press", 1)) for ts in (start - 1, start + 1)])
+    # past the expected end of segment 0, held back until the boundary is announced
+    sink.write_events([(boundary + 5, "control_publisher", ("keyboard.press", 2))])
+    assert len(sinks) == 1 and len(sinks[0].data.splitlines()) == 2
+
+    sink.start_segment(1, boundary + 10)
+    sink.write_events([(boundary + 20, "control_publisher", ("keyboard.press", 3))])
+    sink.close()
+    assert [len(s.data.splitlines()) for s in sinks] == [3, 1]
+    assert all(s.closed for s in sinks)
@@ -0,0 +1,55 @@
+import orjson
+import pytest
+
+from data_collection.events import event_log_path, load_events
+from data_collection.zstdlog import ZstdEventLog, ZstdLogSink, iter_lines
+
+zstandard = pytest.importorskip("zstandard")
+
+S = 1_000_000_000
+
+
+def write_log(path, num_events, **kwargs):
+    sink = ZstdLogSink(path, **kwargs)
+    sink.write_events([(i * S // 10, "control_publisher", ("keyboard.press", i)) for i in range(num_events)])
+    return sink
+
+
+def test_frames_and_index(tmp_path):
+    path = tmp_path / "recording.jsonl.zst"
+    write_log(path, 100, frame_interval=1.0).close()
+
+    log = ZstdEventLog(path)
+    assert len(log.frames) == 10
+    assert len(log) == 100
+    # only the frames overlapping the range are decompressed
+    lines = list(log.iter_lines(start_ns=2 * S, end_ns=3 * S))
+    assert [orjson.loads(line)["timestamp_ns"] for line in lines] == [i * S // 10 for i in range(20, 30)]
+
+    # a valid zstd stream, which decompresses into the plain `.jsonl` log
+    plain = zstandard.ZstdDecompressor().stream_reader(path.read_bytes(), read_across_frames=True).read()
+    assert plain.splitlines() == list(iter_lines(path))
+
+    assert event_log_path(tmp_path / "recording.mkv") == path
+    assert load_events(path).code.tolist() == list(range(100))
+
+
+def test_read_without_index(tmp_path):
+    path = tmp_path / "recording.jsonl.zst"
+    sink = write_log(path, 50, frame_interval=1.0)
+    # simulate a crash: the last frame is cut in the middle and the index is never written
+    sink.flush()
+    path.write_bytes(path.read_bytes()[:-3])
+
+    assert len(ZstdEventLog(path).frames) == 3
+    assert load_events(path).code.tolist() == list(range(30))
+
+
+def test_read_plain_zstd(tmp_path):
+    # e.g. a `.jsonl` log compressed with the zstd command line tool
+    path = tmp_path / "recording.jsonl.zst"
+    line = b'{"timestamp_ns":1,"event_src":"control_publisher","event_data":"[\\"keyboard.press\\",81]"}\n'
+    path.write_bytes(zstandard.ZstdCompressor().compress(line * 3))
+
+    assert not ZstdEventLog(path).seekable
+    assert load_events(path).code.tolist() == [81, 81, 81]
@@ -1,9 +1,15 @@
 import os
 import subprocess
+import sys
 
-# check if GStreamer is properly installed
+# check if GStreamer is properly installed. screen capture requires the Windows-only d3d11 plugin, while other
+# platforms only record with software encoders, see `encoders`.
+if sys.platform == "win32":
+    _gst_inspect_args = ["gst-inspect-1.0.exe", "d3d11"]
+else:
+    _gst_inspect_args = ["gst-inspect-1.0", "coreelements"]
 try:
-    subprocess.run(["gst-inspect-1.0.exe", "d3d11"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    subprocess.run(_gst_inspect_args, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 except Exception as e:  # noqa: F841
     raise ImportError(
         "GStreamer is not properly installed or not in PATH. "
@@ -19,6 +25,7 @@ from .gst_runner import GstPipelineRunner
 
 def activate():
     from . import screen  # noqa
+    from . import audio  # noqa
     from . import omnimodal  # noqa
 
 
@@ -0,0 +1,5 @@
+# Register listeners
+from . import listeners  # noqa
+from .ring_buffer import AudioRingBuffer
+
+__all__ = ["AudioRingBuffer"]
@@ -0,0 +1,89 @@
+# ruff: noqa: E402
+# To suppress the warning for E402, waiting for https://github.com/astral-sh/ruff/issues/3711
+import gi
+
+gi.require_version("Gst", "1.0")
+
+from typing import Optional
+
+import numpy as np
+from gi.repository import Gst
+from loguru import logger
+
+from owa.registry import LISTENERS
+
+from ..gst_factory import audio_capture_pipeline
+from ..gst_runner import GstPipelineRunner
+from .msg import AudioStamped
+from .ring_buffer import AudioRingBuffer
+
+if not Gst.is_initialized():
+    Gst.init(None)
+
+
+@LISTENERS.register("audio")
+class AudioListener(GstPipelineRunner):
+    """
+    GStreamer-based listener of the audio played on the desktop.
+
+    Audio is delivered in chunks of a fixed size to `ring`, an `AudioRingBuffer` of the most recent
+    `buffer_seconds`, from which consumers read the last N milliseconds as views, and optionally to a callback.
+
+    Example:
+    ```python
+    from owa.registry import LISTENERS, activate_module
+
+    activate_module("owa_env_gst")
+    audio = LISTENERS["audio"]().configure(rate=16000, chunk_ms=10)
+
+    with audio.session:
+        while True:
+            window = audio.ring.window_ms(500)  # [8000, 1] float32, no copy
+            agent.hear(window, audio.ring.end_ns)
+    ```
+    """
+
+    def on_configure(
+        self,
+        *,
+        callback=None,
+        backend: Optional[str] = None,
+        rate: int = 16000,
+        channels: int = 1,
+        chunk_ms: int = 10,
+        buffer_seconds: float = 10.0,
+    ) -> bool:
+        """
+        Configure the GStreamer pipeline for audio capture.
+
+        Keyword Arguments:
+            callback: (Optional) called with an `AudioStamped` of every chunk. Its array is only valid during the call.
+            backend (str | None): Audio source, e.g. "pulse", "pipewire" or "test". See `gst_factory.audio_src`.
+            rate (int): Sample rate in Hz.
+            channels (int): Number of channels.
+            chunk_ms (int): Duration of a chunk in milliseconds.
+            buffer_seconds (float): Duration of the audio kept in the ring buffer.
+        """
+        pipeline_description = audio_capture_pipeline(backend=backend, rate=rate, channels=channels, chunk_ms=chunk_ms)
+        logger.debug(f"Constructed pipeline: {pipeline_description}")
+        # the appsink keeps a few chunks instead of only the latest one, since audio must not be dropped
+        super().on_configure(pipeline_description, do_not_modify_appsink_properties=True)
+
+        self.ring = AudioRingBuffer(round(buffer_seconds * rate), channels, dtype=np.float32, rate=rate)
+        self._callback = callback
+        self.register_appsink_callback(self._on_chunk)
+
+    def _on_chunk(self, sample: Gst.Sample, metadata: dict):
+        buf = sample.get_buffer()
+        success, map_info = buf.map(Gst.MapFlags.READ)
+        if not success:
+            logger.error("Failed to map the audio buffer")
+            return
+        try:
+            chunk = np.frombuffer(map_info.data, dtype=np.float32).reshape(-1, self.ring.channels)
+            duration_ns = len(chunk) * 1_000_000_000 // self.ring.rate
+            self.ring.write(chunk, end_ns=metadata["frame_time_ns"] + duration_ns)
+            if self._callback is not None:
+                self._callback(AudioStamped(timestamp_ns=metadata["frame_time_ns"], audio_arr=chunk))
+        finally:
+            buf.unmap(map_info)
@@ -0,0 +1,9 @@
+import numpy as np
+from pydantic import BaseModel
+
+
+class AudioStamped(BaseModel):
+    model_config = {"arbitrary_types_allowed": True}
+
+    timestamp_ns: int
+    audio_arr: np.ndarray  # [frames, channels], F32LE
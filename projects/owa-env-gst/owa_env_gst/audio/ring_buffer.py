@@ -0,0 +1,102 @@
+from typing import Optional
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """
+    Ring buffer of the most recent audio, written by a single capture thread and read by any number of consumers
+    without locks or copies.
+
+    The samples are stored twice, at `i % capacity` and `i % capacity + capacity`, so that every window of up to
+    `capacity` frames is a contiguous slice and is returned as a view. A view is overwritten once the writer has
+    written `capacity - num_frames` more frames, which `is_intact` tells. Consumers which keep a window for longer
+    copy it, e.g. with `np.copyto` into a preallocated array.
+
+    Example:
+    ```python
+    ring = AudioRingBuffer(capacity=16000 * 5, channels=1, rate=16000)
+    ring.write(chunk)  # from the capture thread, [frames, channels]
+
+    end = ring.written
+    window = ring.window(ring.ms_to_frames(500), end=end)  # last 500 ms, a view
+    features = model.encode(window)
+    assert ring.is_intact(len(window), end)
+    ```
+    """
+
+    def __init__(self, capacity: int, channels: int = 1, *, dtype=np.float32, rate: Optional[int] = None):
+        """
+        Args:
+            capacity: Maximum number of frames of a window.
+            channels: Number of interleaved channels of a frame.
+            dtype: Sample type, e.g. np.float32 for `F32LE` or np.int16 for `S16LE`.
+            rate: Sample rate in Hz, required to address windows in milliseconds.
+        """
+        self.capacity = capacity
+        self.channels = channels
+        self.rate = rate
+        self._buffer = np.zeros((2 * capacity, channels), dtype=dtype)
+        # total number of frames written. published after the samples, so readers never see unwritten frames
+        self.written = 0
+        self.end_ns: Optional[int] = None  # UTC of the end of the newest frame, if known
+
+    def write(self, chunk: np.ndarray, end_ns: Optional[int] = None):
+        """
+        Append frames. Must only be called from a single thread.
+
+        Args:
+            chunk: Frames of shape [frames, channels] (or [frames] for mono).
+            end_ns: (Optional) UTC time of the end of the chunk in nanoseconds.
+        """
+        chunk = chunk.reshape(-1, self.channels)
+        written = self.written + len(chunk)
+        # frames older than the capacity would be overwritten by the same chunk
+        chunk = chunk[-self.capacity :]
+        pos = (written - len(chunk)) % self.capacity
+        first = min(len(chunk), self.capacity - pos)
+        self._buffer[pos : pos + first] = chunk[:first]
+        self._buffer[pos + self.capacity : pos + self.capacity + first] = chunk[:first]
+        rest = len(chunk) - first
+        if rest:
+            self._buffer[:rest] = chunk[first:]
+            self._buffer[self.capacity : self.capacity + rest] = chunk[first:]
+        self.written = written
+        self.end_ns = end_ns
+
+    def window(self, num_frames: int, end: Optional[int] = None) -> np.ndarray:
+        """
+        View of the `num_frames` frames before frame `end`. Frames before the first written one are zeros.
+
+        Args:
+            num_frames: Number of frames, at most `capacity`.
+            end: Index of the frame after the window, e.g. a previously read `written`. Defaults to the newest.
+
+        Returns:
+            np.ndarray: Read-only view of shape [num_frames, channels]
+        """
+        end = self.written if end is None else end
+        if not 0 <= num_frames <= self.capacity:
+            raise ValueError(f"Window of {num_frames} frames exceeds the capacity of {self.capacity} frames")
+        if not self.is_intact(num_frames, end):
+            raise ValueError(f"Frames before {end} were overwritten")
+        start = (end - num_frames) % self.capacity
+        view = self._buffer[start : start + num_frames]
+        view.flags.writeable = False
+        return view
+
+    def window_ms(self, duration_ms: float, end: Optional[int] = None) -> np.ndarray:
+        """View of the last `duration_ms` milliseconds before frame `end`, see `window`."""
+        return self.window(self.ms_to_frames(duration_ms), end)
+
+    def ms_to_frames(self, duration_ms: float) -> int:
+        if self.rate is None:
+            raise ValueError("The sample rate is required to address windows in milliseconds")
+        return round(duration_ms * self.rate / 1000)
+
+    def is_intact(self, num_frames: int, end: int) -> bool:
+        """Whether the window of `num_frames` frames before frame `end` has not been overwritten yet."""
+        return end <= self.written and self.written - end <= self.capacity - num_frames
+
+
+__all__ = ["AudioRingBuffer"]
@@ -0,0 +1,171 @@
+# ruff: noqa: E402
+# To suppress the warning for E402, waiting for https://github.com/astral-sh/ruff/issues/3711
+import gi
+
+gi.require_version("Gst", "1.0")
+import time
+from typing import Optional
+
+import numpy as np
+from gi.repository import Gst
+
+# Initialize GStreamer
+if not Gst.is_initialized():
+    Gst.init(None)
+
+
+class ClockCalibrator:
+    """
+    Map pipeline running time (e.g. buffer PTS) to UTC nanoseconds.
+
+    The (running time, wall clock) offset is sampled periodically and its drift is fitted with linear regression
+    over the most recent samples, so converting a timestamp costs one multiply-add instead of querying
+    the pipeline clock and `time.time_ns()` for every frame.
+
+    Example:
+    ```python
+    calibrator = ClockCalibrator()
+    calibrator.sample(pipeline)  # call periodically, e.g. once per second
+    utc_ns = calibrator.to_utc_ns(buffer.pts)  # None until the first sample
+    ```
+    """
+
+    def __init__(self, window: int = 60, attempts: int = 3):
+        """
+        Args:
+            window: Number of most recent samples used for the fit.
+            attempts: Number of clock reads per sample. The read with the tightest wall-clock bracket is kept.
+        """
+        self._window = window
+        self._attempts = attempts
+        self.reset()
+
+    def reset(self):
+        """Drop every sample, e.g. after the pipeline's base time changed."""
+        self._running_ns = np.zeros(self._window, dtype=np.int64)
+        self._offset_ns = np.zeros(self._window, dtype=np.int64)
+        self._count = 0
+        self._base_time = None
+        # (reference running time, offset at reference, drift), swapped atomically on every fit
+        self._fit = None
+        self._residual_ns = 0.0
+
+    @property
+    def is_calibrated(self) -> bool:
+        return self._fit is not None
+
+    @property
+    def num_samples(self) -> int:
+        return min(self._count, self._window)
+
+    @property
+    def offset_ns(self) -> int:
+        """Fitted UTC minus running time offset at the most recent sample, in nanoseconds."""
+        fit = self._fit
+        if fit is None:
+            return 0
+        reference, offset, drift = fit
+        latest = self._running_ns[(self._count - 1) % self._window]
+        return offset + round(drift * (int(latest) - reference))
+
+    @property
+    def drift_ppm(self) -> float:
+        """Drift of the wall clock against the pipeline clock, in parts per million."""
+        fit = self._fit
+        return 0.0 if fit is None else fit[2] * 1e6
+
+    @property
+    def residual_ns(self) -> float:
+        """Root mean square of the fit residuals, in nanoseconds. An estimate of the conversion's noise."""
+        return self._residual_ns
+
+    def metrics(self) -> dict:
+        return dict(
+            offset_ns=self.offset_ns,
+            drift_ppm=self.drift_ppm,
+            residual_ns=self.residual_ns,
+            num_samples=self.num_samples,
+        )
+
+    def add_sample(self, running_time_ns: int, utc_ns: int):
+        """
+        Add a (running time, UTC) pair and refit the mapping.
+
+        Args:
+            running_time_ns: Running time of the pipeline in nanoseconds.
+            utc_ns: UTC time in nanoseconds observed at the same instant.
+        """
+        idx = self._count % self._window
+        self._running_ns[idx] = running_time_ns
+        self._offset_ns[idx] = utc_ns - running_time_ns
+        self._count += 1
+        self._refit()
+
+    def _refit(self):
+        n = self.num_samples
+        running, offset = self._running_ns[:n], self._offset_ns[:n]
+        # center the values before converting to float, since int64 nanoseconds lose precision in float64
+        reference, reference_offset = int(running[0]), int(offset[0])
+        x = (running - reference).astype(np.float64)
+        y = (offset - reference_offset).astype(np.float64)
+
+        x_mean, y_mean = x.mean(), y.mean()
+        var = np.square(x - x_mean).sum()
+        drift = float(((x - x_mean) * (y - y_mean)).sum() / var) if var > 0 else 0.0
+        intercept = y_mean - drift * x_mean
+
+        self._residual_ns = float(np.sqrt(np.square(y - (intercept + drift * x)).mean()))
+        self._fit = (reference, reference_offset + round(intercept), drift)
+
+    def sample(self, pipeline: Gst.Pipeline) -> bool:
+        """
+        Sample the (running time, UTC) offset of a playing pipeline.
+
+        Args:
+            pipeline: GStreamer pipeline object
+
+        Returns:
+            bool: Whether a sample was taken. False if the pipeline has no clock yet.
+        """
+        clock = pipeline.get_clock()
+        if clock is None:
+            return False
+
+        base_time = pipeline.get_base_time()
+        if base_time != self._base_time:
+            # running time restarts when the base time changes, so previous samples are meaningless
+            self.reset()
+            self._base_time = base_time
+
+        best = None
+        for _ in range(self._attempts):
+            before = time.time_ns()
+            clock_time = clock.get_time()
+            after = time.time_ns()
+            if best is None or after - before < best[0]:
+                best = (after - before, clock_time, (before + after) // 2)
+
+        _, clock_time, utc_ns = best
+        self.add_sample(clock_time - base_time, utc_ns)
+        return True
+
+    def to_utc_ns(self, running_time_ns: int) -> Optional[int]:
+        """
+        Convert a running time (e.g. buffer PTS) to UTC nanoseconds. Safe to call from streaming threads while
+        `reset` runs on another thread.
+
+        Args:
+            running_time_ns: Running time in nanoseconds.
+
+        Returns:
+            Optional[int]: UTC time in nanoseconds, or None if not calibrated, e.g. right after the base time changed.
+        """
+        # read once, since `reset` may clear it between a check and the unpacking
+        fit = self._fit
+        if fit is None:
+            return None
+        reference, offset, drift = fit
+        return running_time_ns + offset + round(drift * (running_time_ns - reference))
+
+
+__all__ = ["ClockCalibrator"]
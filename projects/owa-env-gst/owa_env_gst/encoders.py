@@ -0,0 +1,222 @@
+# ruff: noqa: E402
+# To suppress the warning for E402, waiting for https://github.com/astral-sh/ruff/issues/3711
+"""
+Registry of the encoders `gst_factory` builds recording pipelines with.
+
+Encoders differ per machine: NVENC requires an NVIDIA GPU, and distributions ship different subsets of x264, x265,
+OpenH264 and libvpx. Every known encoder is described by an `Encoder`, which translates the common
+`EncoderSettings` into the properties of its element, and `select_encoder` picks the first available encoder in
+the order of a policy.
+
+Example:
+```python
+name = select_encoder("video", policy="fastest")  # e.g. "nvd3d11h264enc", or "x264enc" without an NVIDIA GPU
+pipeline = recorder_pipeline("output.mkv", video_encoder=name, video_encoder_settings=EncoderSettings(bitrate=8000))
+```
+"""
+
+import gi
+
+gi.require_version("Gst", "1.0")
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Literal, Optional
+
+from gi.repository import Gst
+
+if not Gst.is_initialized():
+    Gst.init(None)
+
+PRESETS = ("fast", "medium", "slow")
+POLICIES = ("fastest", "smallest", "quality")
+
+
+@dataclass(frozen=True)
+class EncoderSettings:
+    """Settings common to every encoder. Unset values keep the defaults of the element.
+
+    Args:
+        preset: Speed/efficiency trade-off, one of `PRESETS`.
+        bitrate: Target bitrate in kbit/s.
+        keyframe_interval: Maximum distance between keyframes in frames. Ignored by audio encoders.
+    """
+
+    preset: Optional[str] = None
+    bitrate: Optional[int] = None
+    keyframe_interval: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class Encoder:
+    """An encoder element and the names of its properties.
+
+    Args:
+        name: Name of the element factory.
+        kind: "video" or "audio".
+        memory: Memory the element takes its input from, "system" or "d3d11".
+        input_format: Raw format the input is converted to, for encoders of system memory.
+        parser: Parser which follows the encoder, e.g. "h264parse", if the muxer requires one.
+        properties: Fixed properties, e.g. the realtime deadline of `vp8enc`.
+        presets: Value of `preset_property` for each of `PRESETS`.
+        bitrate_property: Name of the bitrate property.
+        bitrate_scale: Multiplier from kbit/s to the unit of `bitrate_property`.
+        keyframe_property: Name of the property of the maximum keyframe distance in frames.
+    """
+
+    name: str
+    kind: Literal["video", "audio"]
+    memory: Literal["system", "d3d11"] = "system"
+    input_format: Optional[str] = None
+    parser: Optional[str] = None
+    properties: str = ""
+    preset_property: Optional[str] = None
+    presets: dict = field(default_factory=dict)
+    bitrate_property: Optional[str] = None
+    bitrate_scale: int = 1
+    keyframe_property: Optional[str] = None
+
+    def element(self, settings: Optional[EncoderSettings] = None) -> str:
+        """Construct the encoder and its parser, e.g. `x264enc speed-preset=ultrafast ! h264parse ! `."""
+        settings = settings or EncoderSettings()
+        properties = [self.properties] if self.properties else []
+        if settings.preset is not None and self.preset_property is not None:
+            if settings.preset not in PRESETS:
+                raise ValueError(f"Unknown preset {settings.preset}, choose from {', '.join(PRESETS)}")
+            properties.append(f"{self.preset_property}={self.presets[settings.preset]}")
+        if settings.bitrate is not None and self.bitrate_property is not None:
+            properties.append(f"{self.bitrate_property}={settings.bitrate * self.bitrate_scale}")
+        if settings.keyframe_interval is not None and self.keyframe_property is not None:
+            properties.append(f"{self.keyframe_property}={settings.keyframe_interval}")
+
+        element = " ".join([self.name, *properties]) + " ! "
+        if self.parser is not None:
+            element += f"{self.parser} ! "
+        return element
+
+
+def _nvenc(name: str, parser: str) -> Encoder:
+    return Encoder(
+        name,
+        "video",
+        memory="d3d11",
+        parser=parser,
+        preset_property="preset",
+        presets=dict(fast="hp", medium="default", slow="hq"),
+        bitrate_property="bitrate",
+        keyframe_property="gop-size",
+    )
+
+
+def _x26x(name: str, parser: str) -> Encoder:
+    return Encoder(
+        name,
+        "video",
+        input_format="I420",
+        parser=parser,
+        preset_property="speed-preset",
+        presets=dict(fast="ultrafast", medium="medium", slow="slow"),
+        bitrate_property="bitrate",
+        keyframe_property="key-int-max",
+    )
+
+
+ENCODERS: dict[str, Encoder] = {
+    encoder.name: encoder
+    for encoder in (
+        _nvenc("nvd3d11h265enc", "h265parse"),
+        _nvenc("nvd3d11h264enc", "h264parse"),
+        _x26x("x264enc", "h264parse"),
+        _x26x("x265enc", "h265parse"),
+        Encoder(
+            "openh264enc",
+            "video",
+            input_format="I420",
+            parser="h264parse",
+            preset_property="complexity",
+            presets=dict(fast="low", medium="medium", slow="high"),
+            bitrate_property="bitrate",
+            bitrate_scale=1000,
+            keyframe_property="gop-size",
+        ),
+        Encoder(
+            "vp8enc",
+            "video",
+            input_format="I420",
+            # the default deadline is "best", which is far slower than realtime
+            properties="deadline=1",
+            preset_property="cpu-used",
+            presets=dict(fast=16, medium=4, slow=0),
+            bitrate_property="target-bitrate",
+            bitrate_scale=1000,
+            keyframe_property="keyframe-max-dist",
+        ),
+        Encoder(
+            "opusenc",
+            "audio",
+            preset_property="complexity",
+            presets=dict(fast=0, medium=5, slow=10),
+            bitrate_property="bitrate",
+            bitrate_scale=1000,
+        ),
+        Encoder("avenc_aac", "audio", bitrate_property="bitrate", bitrate_scale=1000),
+    )
+}
+
+# order in which `select_encoder` tries the encoders of each policy
+POLICY_ORDER: dict[str, dict[str, tuple[str, ...]]] = {
+    "video": {
+        "fastest": ("nvd3d11h264enc", "nvd3d11h265enc", "openh264enc", "x264enc", "vp8enc", "x265enc"),
+        "smallest": ("nvd3d11h265enc", "x265enc", "nvd3d11h264enc", "x264enc", "vp8enc", "openh264enc"),
+        "quality": ("x265enc", "x264enc", "nvd3d11h265enc", "nvd3d11h264enc", "vp8enc", "openh264enc"),
+    },
+    "audio": {
+        "fastest": ("opusenc", "avenc_aac"),
+        "smallest": ("opusenc", "avenc_aac"),
+        "quality": ("opusenc", "avenc_aac"),
+    },
+}
+
+
+@lru_cache
+def is_available(name: str) -> bool:
+    """Whether the element is installed, e.g. NVENC elements are only registered when an NVIDIA GPU is present."""
+    return Gst.ElementFactory.find(name) is not None
+
+
+def available_encoders(kind: Optional[str] = None) -> list[str]:
+    """Names of the installed encoders of `ENCODERS`, of the given kind if any."""
+    return [
+        name for name, encoder in ENCODERS.items() if (kind is None or encoder.kind == kind) and is_available(name)
+    ]
+
+
+def select_encoder(kind: Literal["video", "audio"], policy: str = "fastest") -> str:
+    """
+    Pick the first installed encoder in the order of a policy.
+
+    Args:
+        kind: "video" or "audio".
+        policy: "fastest", "smallest" (output size at a given quality) or "quality" (quality at a given bitrate).
+
+    Returns:
+        str: Name of the encoder, a key of `ENCODERS`.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy {policy}, choose from {', '.join(POLICIES)}")
+    for name in POLICY_ORDER[kind][policy]:
+        if is_available(name):
+            return name
+    raise RuntimeError(f"None of the {kind} encoders {', '.join(POLICY_ORDER[kind][policy])} is installed.")
+
+
+__all__ = [
+    "Encoder",
+    "EncoderSettings",
+    "ENCODERS",
+    "POLICIES",
+    "PRESETS",
+    "available_encoders",
+    "is_available",
+    "select_encoder",
+]
@@ -0,0 +1,267 @@
+"""
+Per-frame timestamp sidecar of a recording, e.g. `recording.frames.bin` next to `recording.mkv`. Segmented
+recordings have one sidecar per segment, e.g. `recording_00001.frames.bin` next to `recording_00001.mkv`.
+
+The file is a fixed-size header followed by an append-only array of fixed-width records, one per encoded frame:
+(frame_index, pts_ns, utc_ns, flags). Records are written in blocks while recording. A crash loses at most the
+last unflushed block, and a partially written record at the end is ignored by the reader. Readers memory-map the
+file, so that looking up the time of a frame costs O(1) and requires no decoding.
+"""
+
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+FRAMES_SUFFIX = ".frames.bin"
+
+MAGIC = b"OWAFRMTS"
+VERSION = 1
+# magic, version, record size
+_HEADER = struct.Struct("<8sII")
+HEADER_SIZE = _HEADER.size
+
+RECORD_DTYPE = np.dtype(
+    [("frame_index", "<u8"), ("pts_ns", "<i8"), ("utc_ns", "<i8"), ("flags", "<u4"), ("_reserved", "<u4")]
+)
+
+# `utc_ns` was derived from the fitted clock calibration, instead of a direct read of the pipeline clock
+FLAG_CALIBRATED = 1 << 0
+
+
+def frames_path(path: str | os.PathLike) -> Path:
+    """Return the sidecar path of a recording, e.g. `rec.mkv` becomes `rec.frames.bin`."""
+    return Path(path).with_suffix(FRAMES_SUFFIX)
+
+
+class FrameTimestampWriter:
+    """
+    Append-only writer of a per-frame timestamp sidecar. `append` is called from a streaming thread.
+
+    Example:
+    ```python
+    writer = FrameTimestampWriter(frames_path("recording.mkv"))
+    writer.append(pts_ns, utc_ns)  # e.g. from `enable_timestamp_meta(callback=writer.append)`
+    writer.close()
+    ```
+    """
+
+    def __init__(self, path: str | os.PathLike, *, block_size: int = 64, flush_interval: float = 1.0):
+        """
+        Args:
+            path: Path of the sidecar file. An existing file is overwritten.
+            block_size: Number of records buffered in memory before they are written.
+            flush_interval: Maximum time in seconds a record is buffered, so that slow streams are persisted too.
+        """
+        self.path = Path(path)
+        self._block = np.zeros(block_size, dtype=RECORD_DTYPE)
+        self._pending = 0
+        self._count = 0
+        self._flush_interval_ns = int(flush_interval * 1_000_000_000)
+        self._last_flush_ns = time.monotonic_ns()
+        self._lock = threading.Lock()
+
+        self._file = open(self.path, "wb")
+        self._file.write(_HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def append(self, pts_ns: int, utc_ns: int, flags: int = 0):
+        """Append the record of the next frame."""
+        with self._lock:
+            if self._file is None:
+                return
+            self._block[self._pending] = (self._count, pts_ns, utc_ns, flags, 0)
+            self._pending += 1
+            self._count += 1
+            if self._pending == len(self._block) or (
+                time.monotonic_ns() - self._last_flush_ns >= self._flush_interval_ns
+            ):
+                self._flush()
+
+    def _flush(self):
+        # a crash may cut the file in the middle of a record, which readers ignore
+        self._file.write(self._block[: self._pending].tobytes())
+        self._file.flush()
+        self._pending = 0
+        self._last_flush_ns = time.monotonic_ns()
+
+    def flush(self):
+        """Write the buffered records and hand them over to the operating system."""
+        with self._lock:
+            if self._file is not None and self._pending:
+                self._flush()
+
+    def close(self):
+        """Write the buffered records and close the file."""
+        with self._lock:
+            if self._file is None:
+                return
+            if self._pending:
+                self._flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+
+class SegmentedFrameTimestampWriter:
+    """
+    Writer of the per-frame timestamp sidecars of a segmented recording, one next to every segment, whose PTS are
+    relative to the start of the segment. `append` is called from a streaming thread.
+
+    Frames are stamped before they are encoded, so they reach `append` before `splitmuxsink` reports the segment
+    they open. Frames before the expected end of the current segment are written right away, and later ones are held
+    until `start_segment` reports where the next segment starts.
+
+    Example:
+    ```python
+    writer = SegmentedFrameTimestampWriter(segment_duration=60)
+    writer.start_segment("rec_00000.mkv", 0)  # on `splitmuxsink-fragment-opened`
+    writer.append(pts_ns, utc_ns)
+    writer.close()
+    ```
+    """
+
+    def __init__(self, segment_duration: float, **kwargs):
+        """
+        Args:
+            segment_duration: Duration of the segments in seconds, after which `splitmuxsink` starts a new one at the
+                next keyframe.
+            **kwargs: Arguments of the `FrameTimestampWriter` of every segment.
+        """
+        self.segment_duration_ns = int(segment_duration * 1_000_000_000)
+        self._writer_kwargs = kwargs
+        self._writer: FrameTimestampWriter | None = None
+        self._start_ns: int | None = None
+        self._held: list[tuple[int, int, int]] = []
+        self._lock = threading.Lock()
+
+    def _append(self, pts_ns: int, utc_ns: int, flags: int):
+        # a segment never ends before its duration, since it is split at the first keyframe past it
+        if self._start_ns is None or self._held or pts_ns >= self._start_ns + self.segment_duration_ns:
+            self._held.append((pts_ns, utc_ns, flags))
+        else:
+            self._writer.append(pts_ns - self._start_ns, utc_ns, flags)
+
+    def _release_held(self, end_ns: int | None = None):
+        """Write the held frames before `end_ns` to the current segment, or all of them if None."""
+        held = self._held
+        if end_ns is not None:
+            held = [record for record in held if record[0] < end_ns]
+        self._held = self._held[len(held) :]
+        if self._writer is None:
+            # frames captured after a restart, but before the segment they belong to starts
+            return
+        for pts_ns, utc_ns, flags in held:
+            self._writer.append(pts_ns - self._start_ns, utc_ns, flags)
+
+    def append(self, pts_ns: int, utc_ns: int, flags: int = 0):
+        """Append the record of the next frame, with PTS in running time of the pipeline."""
+        with self._lock:
+            self._append(pts_ns, utc_ns, flags)
+
+    def start_segment(self, location: str | os.PathLike, start_running_time_ns: int):
+        """Close the sidecar of the current segment and open the one of the segment at `location`."""
+        with self._lock:
+            self._release_held(start_running_time_ns)
+            if self._writer is not None:
+                self._writer.close()
+            self._writer = FrameTimestampWriter(frames_path(location), **self._writer_kwargs)
+            self._start_ns = start_running_time_ns
+            held, self._held = self._held, []
+            for record in held:
+                self._append(*record)
+
+    def restart(self):
+        """
+        Close the sidecar of the current segment before the pipeline is restarted, since the running time of the
+        frames captured afterwards starts over.
+        """
+        with self._lock:
+            self._release_held()
+            if self._writer is not None:
+                self._writer.close()
+            self._writer = None
+            self._start_ns = None
+
+    def close(self):
+        """Write the held frames to the last segment and close its sidecar."""
+        self.restart()
+
+
+class FrameTimestamps:
+    """
+    Memory-mapped reader of a per-frame timestamp sidecar.
+
+    Example:
+    ```python
+    timestamps = FrameTimestamps(frames_path("recording.mkv"))
+    utc_ns = timestamps.utc_ns[120]  # UTC of the 121st frame, without decoding
+    frame_idx = timestamps.frame_at_utc(utc_ns)
+    ```
+    """
+
+    def __init__(self, path: str | os.PathLike):
+        """
+        Args:
+            path: Path of the sidecar file
+        """
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            raise ValueError(f"{self.path} is not a frame timestamp file: truncated header")
+        magic, version, record_size = _HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a frame timestamp file")
+        if version != VERSION or record_size != RECORD_DTYPE.itemsize:
+            raise ValueError(f"Unsupported frame timestamp file version {version} with record size {record_size}")
+
+        # a crash may leave a partially written record at the end, which is ignored
+        num_records = (os.path.getsize(self.path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        if num_records:
+            self.records = np.memmap(self.path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(num_records,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def pts_ns(self) -> np.ndarray:
+        return self.records["pts_ns"]
+
+    @property
+    def utc_ns(self) -> np.ndarray:
+        return self.records["utc_ns"]
+
+    @property
+    def flags(self) -> np.ndarray:
+        return self.records["flags"]
+
+    def frame_at_utc(self, utc_ns) -> np.ndarray:
+        """Index of the frame displayed at the given UTC time, i.e. the last frame captured at or before it."""
+        idx = np.searchsorted(self.utc_ns, utc_ns, side="right") - 1
+        return np.clip(idx, 0, len(self) - 1)
+
+
+__all__ = [
+    "FrameTimestampWriter",
+    "SegmentedFrameTimestampWriter",
+    "FrameTimestamps",
+    "frames_path",
+    "FRAMES_SUFFIX",
+    "FLAG_CALIBRATED",
+]
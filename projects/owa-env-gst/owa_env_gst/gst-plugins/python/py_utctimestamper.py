@@ -0,0 +1,84 @@
+"""
+Pass-through element which attaches the UTC time of every buffer as a `GstReferenceTimestampMeta`.
+Reference: https://gitlab.freedesktop.org/gstreamer/gstreamer/-/tree/main/subprojects/gst-python/examples/plugins
+
+The meta has `timestamp/x-unix` caps and holds the UTC time, in nanoseconds since the epoch, observed at the
+buffer's PTS. Metas can only be added to writable buffers, but a buffer handed to Python is always shared with the
+reference Python holds to it. The element therefore outputs a shallow copy of every buffer, which shares the memory
+of the input and carries the meta, and flow returns of downstream reach upstream as with any other element.
+
+In-process runners replace the conversion of PTS to UTC with their calibrated one and observe every stamped
+buffer, see `set_utc_handlers` and `TimestampMetaExtension`.
+
+Example pipeline:
+
+gst-launch-1.0 videotestsrc is-live=true ! utctimestamper ! fakesink
+"""
+
+import gi
+
+gi.require_version("Gst", "1.0")
+gi.require_version("GstBase", "1.0")
+
+import time
+
+from gi.repository import Gst, GstBase
+
+# Initialize GObject and Gst
+
+if not Gst.is_initialized():
+    Gst.init(None)
+
+UTC_REFERENCE_CAPS = Gst.Caps.from_string("timestamp/x-unix")
+
+
+class UtcTimestamper(GstBase.BaseTransform):
+    __gstmetadata__ = (
+        "UtcTimestamper",
+        "Filter",
+        "Attach the UTC time of every buffer as a timestamp/x-unix reference timestamp meta",
+        "MilkClouds",
+    )
+
+    __gsttemplates__ = (
+        Gst.PadTemplate.new("src", Gst.PadDirection.SRC, Gst.PadPresence.ALWAYS, Gst.Caps.new_any()),
+        Gst.PadTemplate.new("sink", Gst.PadDirection.SINK, Gst.PadPresence.ALWAYS, Gst.Caps.new_any()),
+    )
+
+    def __init__(self):
+        super(UtcTimestamper, self).__init__()
+        self.set_in_place(True)
+        self.to_utc_ns = self._clock_to_utc_ns
+        self.callback = None
+
+    def set_utc_handlers(self, to_utc_ns=None, callback=None):
+        """
+        Args:
+            to_utc_ns: (Optional) called as `to_utc_ns(pts_ns)` to convert the PTS of a buffer to UTC. If None, the
+                pipeline clock is read for every buffer.
+            callback: (Optional) called as `callback(pts_ns, utc_ns)` for every stamped buffer.
+        """
+        self.to_utc_ns = self._clock_to_utc_ns if to_utc_ns is None else to_utc_ns
+        self.callback = callback
+
+    def _clock_to_utc_ns(self, pts_ns: int) -> int:
+        elapsed = self.get_clock().get_time() - self.get_base_time()
+        return time.time_ns() - (elapsed - pts_ns)
+
+    def do_prepare_output_buffer(self, inbuf):
+        if inbuf.pts == Gst.CLOCK_TIME_NONE:
+            return (Gst.FlowReturn.OK, inbuf)
+
+        utc_ns = self.to_utc_ns(inbuf.pts)
+        # the copy is only referenced here, so it is writable
+        outbuf = inbuf.copy()
+        outbuf.add_reference_timestamp_meta(UTC_REFERENCE_CAPS, utc_ns, Gst.CLOCK_TIME_NONE)
+        if self.callback is not None:
+            self.callback(inbuf.pts, utc_ns)
+        return (Gst.FlowReturn.OK, outbuf)
+
+    def do_transform_ip(self, buf):
+        return Gst.FlowReturn.OK
+
+
+__gstelementfactory__ = ("utctimestamper", Gst.Rank.NONE, UtcTimestamper)
@@ -1,13 +1,23 @@
 """
-Element that generates UTC timestamps in SRT format.
+Element that generates UTC timestamps, paced by the pipeline clock.
 Reference: https://github.com/GStreamer/gst-python/blob/master/examples/plugins/python/py_audiotestsrc.py
 
+Each buffer carries the UTC time, in nanoseconds since the epoch, observed at its PTS. Payload formats:
+- `srt` (default): SRT subtitle entries, to be parsed by `subparse`
+- `text`: the bare timestamp as UTF-8 text, which `matroskamux` accepts without `subparse`
+- `binary`: the timestamp as an 8-byte big-endian unsigned integer, for in-process consumers such as appsink
+
 Example pipeline:
 
 gst-launch-1.0 utctimestampsrc ! fakesink dump=1
 gst-launch-1.0 -e -v videotestsrc is-live=true ! x264enc ! h264parse ! queue ! mux. `
     utctimestampsrc interval=1 ! subparse ! queue ! mux. `
     matroskamux name=mux ! filesink location=output_with_subtitles.mkv
+gst-launch-1.0 utctimestampsrc interval=0.01 format=binary ! fakesink dump=1
+
+With `post-messages=true`, every timestamp is also posted on the bus as an element message
+`utc-reference, running-time=(guint64)..., utc=(guint64)...`, e.g. for `gst-launch-1.0 -m` to print it, so that
+another process can convert running times reported by the pipeline into UTC.
 """
 
 import gi
@@ -15,9 +25,8 @@ import gi
 gi.require_version("Gst", "1.0")
 gi.require_version("GstBase", "1.0")
 
-import datetime
 import struct
-import sys
+import threading
 import time
 
 from gi.repository import GObject, Gst, GstBase
@@ -28,20 +37,39 @@ from loguru import logger
 if not Gst.is_initialized():
     Gst.init(None)
 
-OCAPS = Gst.Caps.from_string("application/x-subtitle")
+FORMAT_CAPS = {
+    "srt": Gst.Caps.from_string("application/x-subtitle"),
+    "text": Gst.Caps.from_string("text/x-raw,format=utf8"),
+    "binary": Gst.Caps.from_string("application/x-utc-timestamp"),
+}
+OCAPS = Gst.Caps.new_empty()
+for _caps in FORMAT_CAPS.values():
+    OCAPS.append(_caps.copy())
 
 DEFAULT_INTERVAL = 1  # in seconds
+DEFAULT_FORMAT = "srt"
+DEFAULT_POST_MESSAGES = False
+
+_PACK_UTC = struct.Struct(">Q").pack
 
 # logger.remove()
 # logger.add(sys.stderr, level="TRACE")
 
 
+def _format_srt_time(ns: int) -> str:
+    ms, _ = divmod(ns, 1_000_000)
+    seconds, ms = divmod(ms, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02},{ms:03}"
+
+
 # This can't be changed to PushSrc because of basic issue: https://gitlab.freedesktop.org/gstreamer/gst-python/-/issues/1
 class UtcTimestampSrc(GstBase.BaseSrc):
     __gstmetadata__ = (
         "UtcTimestampSrc",
         "Source",
-        "Source element that outputs UTC timestamps in SRT format",
+        "Source element that outputs UTC timestamps in SRT, text or binary format",
         "MilkClouds",
     )
 
@@ -56,122 +84,150 @@ class UtcTimestampSrc(GstBase.BaseSrc):
             3600,
             DEFAULT_INTERVAL,
             GObject.ParamFlags.READWRITE,
-        )
+        ),
+        "format": (
+            str,
+            "Format",
+            "Payload format of the timestamps: srt, text or binary",
+            DEFAULT_FORMAT,
+            GObject.ParamFlags.READWRITE,
+        ),
+        "post-messages": (
+            bool,
+            "Post messages",
+            "Post a utc-reference element message with the running time and UTC of every timestamp",
+            DEFAULT_POST_MESSAGES,
+            GObject.ParamFlags.READWRITE,
+        ),
     }
 
     def __init__(self):
         super(UtcTimestampSrc, self).__init__()
         self.interval = DEFAULT_INTERVAL
+        self.interval_ns = DEFAULT_INTERVAL * Gst.SECOND
+        self.format = DEFAULT_FORMAT
+        self.post_messages = DEFAULT_POST_MESSAGES
         self.set_live(True)
         self.set_format(Gst.Format.TIME)
-        self.past_time = None
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.next_time = None
         self.subtitle_number = 1
+        self.clock_id = None
+        self.flushing = False
 
     def do_get_property(self, prop):
         if prop.name == "interval":
             return self.interval
+        elif prop.name == "format":
+            return self.format
+        elif prop.name == "post-messages":
+            return self.post_messages
         else:
             raise AttributeError("Unknown property %s" % prop.name)
 
     def do_set_property(self, prop, value):
         if prop.name == "interval":
             self.interval = value
+            self.interval_ns = round(value * Gst.SECOND)
+        elif prop.name == "format":
+            if value not in FORMAT_CAPS:
+                raise ValueError(f"Unknown format {value}, choose from {', '.join(FORMAT_CAPS)}")
+            self.format = value
+        elif prop.name == "post-messages":
+            self.post_messages = value
         else:
             raise AttributeError("Unknown property %s" % prop.name)
 
+    def do_get_caps(self, filter):
+        caps = FORMAT_CAPS[self.format]
+        return caps.intersect(filter) if filter else caps
+
     def do_start(self):
-        self.past_time = None
-        self.subtitle_number = 1
+        self._reset()
         return True
 
-    # deprecated
-    def wait_next(self, buf):
+    def do_unlock(self):
+        # called from another thread on flush or shutdown, to interrupt a pending wait in `do_fill`
+        with self.lock:
+            self.flushing = True
+            if self.clock_id is not None:
+                Gst.Clock.id_unschedule(self.clock_id)
+        return True
+
+    def do_unlock_stop(self):
+        with self.lock:
+            self.flushing = False
+        return True
+
+    def wait_next(self) -> Gst.FlowReturn:
+        """Wait on the pipeline clock until the running time of the next timestamp."""
         clock = self.get_clock()
         if not clock:
             Gst.error("Clock is not available.")
             return Gst.FlowReturn.ERROR
 
+        base_time = self.get_base_time()
+        now = clock.get_time() - base_time
+        interval = self.interval_ns
         if self.next_time is None:
-            self.next_time = clock.get_time() - self.get_base_time() + buf.duration
-
-        abs_time = self.next_time + self.get_base_time()
-        clock_id = clock.new_single_shot_id(abs_time)
-        # https://gstreamer.freedesktop.org/documentation/gstreamer/gstclock.html?gi-language=python#gst_clock_id_wait
-        ret, jitter = clock.id_wait(clock_id)
+            self.next_time = now
+        elif self.next_time < now - interval:
+            # skip the timestamps missed while the pipeline stalled, instead of emitting them in a burst
+            self.next_time = now
+
+        with self.lock:
+            if self.flushing:
+                return Gst.FlowReturn.FLUSHING
+            self.clock_id = clock_id = clock.new_single_shot_id(self.next_time + base_time)
+        # the wait releases the GIL, so other Python threads run while this streaming thread sleeps
+        ret, jitter = Gst.Clock.id_wait(clock_id)
+        with self.lock:
+            self.clock_id = None
+        self.next_time += interval
 
         if ret == Gst.ClockReturn.UNSCHEDULED:
-            clock.id_unref(clock_id)
             return Gst.FlowReturn.FLUSHING
-        elif ret != Gst.ClockReturn.OK:
-            clock.id_unref(clock_id)
+        elif ret not in (Gst.ClockReturn.OK, Gst.ClockReturn.EARLY):
             Gst.error("Clock wait error: %s" % ret)
             return Gst.FlowReturn.ERROR
-
-        clock.id_unref(clock_id)
+        return Gst.FlowReturn.OK
 
     def do_fill(self, offset, length, buf):
-        if self.past_time is None:
-            self.past_time = time.time_ns()
+        ret = self.wait_next()
+        if ret != Gst.FlowReturn.OK:
+            return (ret, buf)
 
-        to_sleep = max(0, self.interval - (time.time_ns() - self.past_time) / 1e9)
-        time.sleep(to_sleep)
-        self.past_time = self.past_time + self.interval * 1e9
-
-        # Set buffer duration
-        buf.duration = self.interval * Gst.SECOND
-        # Get the current UTC time in nanoseconds
-        current_time = time.time_ns()
-        utc_time = datetime.datetime.fromtimestamp(current_time / 1e9).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        # Set buffer PTS
+        # read both clocks back to back, so that the (PTS, UTC) pair describes the same instant
         pts_time = self.get_clock().get_time() - self.get_base_time()
+        current_time = time.time_ns()
         buf.pts = pts_time
+        buf.duration = self.interval_ns
 
-        logger.trace(
-            (
-                (self.get_clock().get_time() - self.get_base_time()) / Gst.SECOND,
-                buf.pts / Gst.SECOND,
-                buf.duration / Gst.SECOND,
-            )
-        )
-
-        # Format start and end times in SRT format
-        start_time_sec = pts_time / Gst.SECOND
-        end_time_sec = (pts_time + buf.duration) / Gst.SECOND
-
-        start_time = self._format_time(start_time_sec)
-        end_time = self._format_time(end_time_sec)
-
-        # Construct SRT subtitle entry
-        data = (f"{self.subtitle_number}\n{start_time} --> {end_time}\n{current_time}\n\n").encode("utf-8")
-        # data = (
-        #     f"{self.subtitle_number}\n{start_time} --> {end_time}\n".encode("utf-8")
-        #     + struct.pack(">Q", current_time)
-        #     + b"\n\n"
-        # )
+        # lazy, so that nothing is formatted unless tracing is enabled
+        logger.opt(lazy=True).trace("pts={} utc={}", lambda: pts_time / Gst.SECOND, lambda: current_time)
 
-        buf.set_size(len(data))
+        if self.post_messages:
+            structure = Gst.Structure.from_string(
+                f"utc-reference, running-time=(guint64){pts_time}, utc=(guint64){current_time}"
+            )[0]
+            self.post_message(Gst.Message.new_element(self, structure))
 
-        # Map the buffer to write data
-        try:
-            with buf.map(Gst.MapFlags.WRITE) as map_info:
-                # Fill the buffer with the subtitle data
-                map_info.data[: len(data)] = data
-        except Exception as e:
-            Gst.error("Mapping error: %s" % e)
-            return Gst.FlowReturn.ERROR
+        if self.format == "binary":
+            data = _PACK_UTC(current_time)
+        elif self.format == "text":
+            data = b"%d" % current_time
+        else:
+            start_time = _format_srt_time(pts_time)
+            end_time = _format_srt_time(pts_time + buf.duration)
+            data = f"{self.subtitle_number}\n{start_time} --> {end_time}\n{current_time}\n\n".encode("utf-8")
+            self.subtitle_number += 1
 
-        # Increment the subtitle number
-        self.subtitle_number += 1
+        buf.set_size(len(data))
+        buf.fill(0, data)
         return (Gst.FlowReturn.OK, buf)
 
-    def _format_time(self, total_seconds):
-        hours = int(total_seconds // 3600)
-        minutes = int((total_seconds % 3600) // 60)
-        seconds = int(total_seconds % 60)
-        milliseconds = int((total_seconds - int(total_seconds)) * 1000)
-
-        formatted_time = f"{hours:02}:{minutes:02}:{seconds:02},{milliseconds:03}"
-        return formatted_time
-
 
 __gstelementfactory__ = ("utctimestampsrc", Gst.Rank.NONE, UtcTimestampSrc)
@@ -5,22 +5,79 @@ for screen capturing and recording.
 TODO: implement macOS and Linux support, as https://github.com/open-world-agents/desktop-env/blob/31b44e759a22dee20f08a5c61a345e6d76b383a2/src/desktop_env/windows_capture/gst_pipeline.py
 """
 
+import os
+import sys
+import tempfile
+from dataclasses import dataclass
 from fractions import Fraction
 from typing import Optional
 
 from owa.registry import CALLABLES, activate_module
 
+from .encoders import ENCODERS, EncoderSettings
+
 
 def matroskamux(srcs: list[str]):
     muxer_name = "mux"  # be aware that the name of the muxer is hardcoded
     return " ".join((src + "queue ! mux.") for src in srcs) + f" matroskamux name={muxer_name} ! "
 
 
+def splitmuxsink(srcs: list[tuple[str, str]], location: str, segment_duration: float):
+    """
+    Mux the sources into Matroska segments of `segment_duration` seconds.
+
+    Args:
+        srcs: (pad, src) pairs, where pad is the request pad of splitmuxsink, e.g. "video", "audio_0" or "subtitle_0"
+        location: Location pattern of the segments, see `segment_location`
+        segment_duration: Duration of a segment in seconds. Keyframes are requested from the encoder at the
+            boundaries, so that segments split at multiples of the duration in running time.
+    """
+    muxer_name = "mux"  # be aware that the name of the muxer is hardcoded
+    return " ".join((f"{src}queue ! {muxer_name}.{pad}") for pad, src in srcs) + (
+        f" splitmuxsink name={muxer_name} muxer-factory=matroskamux location={location} "
+        f"max-size-time={round(segment_duration * 1_000_000_000)} send-keyframe-requests=true"
+    )
+
+
+def segment_location(filesink_location: str) -> str:
+    """Location pattern of the segments of a recording, e.g. `rec.mkv` becomes `rec_%05d.mkv`."""
+    assert filesink_location.endswith(".mkv"), "Only Matroska (.mkv) files are supported now."
+    return filesink_location[: -len(".mkv")] + "_%05d.mkv"
+
+
 def tee(src: str, sinks: list[str]):
     tee_name = "t"  # be aware that the name of the tee is hardcoded
     return f"{src}tee name={tee_name} " + " ".join((f"t. ! {sink}" for sink in sinks))
 
 
+@dataclass(frozen=True)
+class ScreenOutput:
+    """A named appsink output of a fan-out screen pipeline.
+
+    Args:
+        name: Name of the appsink. Used to route samples to the matching callback.
+        fps: Maximum frame rate of this output. If None, the frame rate of the source is used.
+        width: Width of the output frame. If None, the width of the source is used.
+        height: Height of the output frame. If None, the height of the source is used.
+        format: Raw video format delivered to the appsink, e.g. "BGRA", "RGB" or "GRAY8".
+    """
+
+    name: str
+    fps: Optional[float] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    format: str = "BGRA"
+
+
+def _max_framerate(fps: float) -> str:
+    frac = Fraction(fps).limit_denominator()
+    return f"framerate=0/1,max-framerate={frac.numerator}/{frac.denominator}"
+
+
+# name of the `utctimestamper` element which attaches the UTC time to every captured frame
+TIMESTAMP_IDENTITY_NAME = "ts"
+
+
 def screen_src(
     *,
     show_cursor: bool = True,
@@ -28,6 +85,7 @@ def screen_src(
     window_name: Optional[str] = None,
     monitor_idx: Optional[int] = None,
     additional_args: Optional[str] = None,
+    timestamp_identity: bool = False,
 ):
     src_parameter = [f"show-cursor={str(show_cursor).lower()}", "do-timestamp=true"]
     if window_name is not None:
@@ -42,46 +100,226 @@ def screen_src(
     if additional_args is not None:
         src_parameter += " " + additional_args
 
-    frac = Fraction(fps).limit_denominator()
-    framerate = f"framerate=0/1,max-framerate={frac.numerator}/{frac.denominator}"
-
-    return (
+    src = (
         f"d3d11screencapturesrc {src_parameter} ! "
-        f"videorate drop-only=true ! video/x-raw(memory:D3D11Memory),{framerate} ! "
+        f"videorate drop-only=true ! video/x-raw(memory:D3D11Memory),{_max_framerate(fps)} ! "
     )
+    if timestamp_identity:
+        # stamps every captured frame before it is teed, see `gst-plugins/python/py_utctimestamper.py`
+        src += f"utctimestamper name={TIMESTAMP_IDENTITY_NAME} ! "
+    return src
 
 
-def screen_enc():
-    # TODO: supports various encoder depending on the platform and hardware
+def screen_enc(
+    encoder: str = "nvd3d11h265enc",
+    settings: Optional[EncoderSettings] = None,
+    *,
+    source_memory: str = "d3d11",
+):
+    """
+    Construct the conversion of the captured screen into the input of a video encoder, the encoder and its parser.
 
+    Args:
+        encoder: Name of the encoder, a key of `encoders.ENCODERS`. `encoders.select_encoder` picks one by policy.
+        settings: Preset, bitrate and keyframe interval of the encoder.
+        source_memory: Memory of the frames to encode, "d3d11" for the screen capture or "system", e.g. for
+            `videotestsrc`.
+    """
     # BUG: mfh264enc only takes even-sized input, which causes d3d11convert to resize, which causes a char to be vague
     # return "d3d11convert ! mfh264enc ! h264parse ! "
 
     # CAUTION: If your desktop suffer with resource consumption, you may try h264 instead of h265.
-    return "d3d11convert ! video/x-raw(memory:D3D11Memory),format=NV12 ! nvd3d11h265enc ! h265parse ! "
+    _encoder = ENCODERS[encoder]
+    if _encoder.kind != "video":
+        raise ValueError(f"{encoder} is not a video encoder")
+    if _encoder.memory == "d3d11":
+        branch = "d3d11upload ! " if source_memory == "system" else ""
+        branch += "d3d11convert ! video/x-raw(memory:D3D11Memory),format=NV12 ! "
+    else:
+        branch = "d3d11download ! " if source_memory == "d3d11" else ""
+        branch += f"videoconvert ! video/x-raw,format={_encoder.input_format} ! "
+    return branch + _encoder.element(settings)
 
 
 def screen_to_fpsdisplaysink():
     return "d3d11download ! videoconvert ! fpsdisplaysink video-sink=fakesink"
 
 
-def screen_to_appsink():
-    return "d3d11download ! videoconvert ! video/x-raw,format=BGRA ! appsink name=appsink sync=false max-buffers=1 drop=true emit-signals=true wait-on-eos=false"
+def screen_to_appsink(name: str = "appsink", format: str = "BGRA"):
+    return (
+        f"d3d11download ! videoconvert ! video/x-raw,format={format} ! "
+        f"appsink name={name} sync=false max-buffers=1 drop=true emit-signals=true wait-on-eos=false"
+    )
+
+
+def screen_to_output(output: ScreenOutput):
+    """Construct a branch which converts the captured screen into the rate, size and format of `output`."""
+    branch = ""
+    # drop frames before scaling, so that the scaler only processes frames which are delivered.
+    if output.fps is not None:
+        branch += f"videorate drop-only=true ! video/x-raw(memory:D3D11Memory),{_max_framerate(output.fps)} ! "
+    if output.width is not None or output.height is not None:
+        branch += f"d3d11scale ! video/x-raw(memory:D3D11Memory){_size_caps(output)} ! "
+    return branch + screen_to_appsink(name=output.name, format=output.format)
+
+
+def _size_caps(output: ScreenOutput) -> str:
+    return "".join(f",{key}={value}" for key, value in (("width", output.width), ("height", output.height)) if value)
+
+
+def shm_address(name: str) -> str:
+    """
+    Address of the shared-memory output `name`, at which readers attach.
+    A named pipe of `d3d11ipcsink` on Windows, and the control socket of `shmsink` elsewhere.
+    """
+    if sys.platform == "win32":
+        return rf"\\.\pipe\owa-{name}"
+    return os.path.join(tempfile.gettempdir(), f"owa-{name}")
+
+
+def _escape(value: str) -> str:
+    # the pipeline parser drops single backslashes, e.g. of Windows pipe names
+    return value.replace("\\", "\\\\")
+
+
+def screen_to_shm(output: ScreenOutput):
+    """
+    Construct a branch which publishes the captured screen to shared memory, at `shm_address(output.name)`.
+
+    Any number of local processes attach and detach at any time without affecting the pipeline, see
+    `shm_reader_pipeline`. Frames are not re-encoded: on Windows, `d3d11ipcsink` shares the D3D11 textures, so that
+    readers convert the frames themselves. Elsewhere, `shmsink` shares raw frames in the rate, size and format of
+    `output`, which readers must know in advance.
+    """
+    address = _escape(shm_address(output.name))
+    if sys.platform == "win32":
+        branch = ""
+        if output.fps is not None:
+            branch += f"videorate drop-only=true ! video/x-raw(memory:D3D11Memory),{_max_framerate(output.fps)} ! "
+        if output.width is not None or output.height is not None:
+            branch += f"d3d11scale ! video/x-raw(memory:D3D11Memory){_size_caps(output)} ! "
+        return branch + f"d3d11ipcsink pipe-name={address} sync=false"
+
+    branch = ""
+    if output.fps is not None:
+        branch += f"videorate drop-only=true ! video/x-raw,{_max_framerate(output.fps)} ! "
+    return branch + (
+        f"videoscale ! videoconvert ! video/x-raw,format={output.format}{_size_caps(output)} ! "
+        f"shmsink socket-path={address} wait-for-connection=false sync=false"
+    )
+
+
+def shm_reader_pipeline(output: ScreenOutput) -> str:
+    """
+    Construct a pipeline which reads the frames of a shared-memory output into an appsink named `output.name`.
+
+    On Windows, the rate, size and format of `output` are applied by the reader, independently of the publisher.
+    Elsewhere, `shmsink` does not share the caps, so `output` must be the one the frames were published with,
+    including its width and height.
+    """
+    address = _escape(shm_address(output.name))
+    if sys.platform == "win32":
+        return f"d3d11ipcsrc pipe-name={address} ! " + screen_to_output(output)
+
+    assert output.width is not None and output.height is not None, "Width and height are required to read shmsink."
+    return (
+        f"shmsrc socket-path={address} is-live=true do-timestamp=true ! "
+        f"video/x-raw,format={output.format}{_size_caps(output)},framerate=0/1 ! "
+        f"appsink name={output.name} sync=false max-buffers=1 drop=true emit-signals=true wait-on-eos=false"
+    )
+
+
+# sources of the audio played on the desktop, i.e. loopback of the default output device
+AUDIO_BACKENDS = {
+    "wasapi2": "wasapi2src do-timestamp=true loopback=true low-latency=true",
+    # the monitor of the default sink, with PulseAudio or the PulseAudio interface of PipeWire
+    "pulse": "pulsesrc device=@DEFAULT_MONITOR@ do-timestamp=true",
+    "pipewire": 'pipewiresrc stream-properties="props,stream.capture.sink=true" do-timestamp=true',
+    # a sine wave, for tests on machines without audio devices
+    "test": "audiotestsrc is-live=true",
+}
+
+
+def default_audio_backend() -> str:
+    return "wasapi2" if sys.platform == "win32" else "pulse"
 
 
-def audio_src():
-    return "wasapi2src do-timestamp=true loopback=true low-latency=true ! audioconvert ! "
+def audio_src(backend: Optional[str] = None):
+    """
+    Source of the audio played on the desktop.
+
+    Args:
+        backend: One of `AUDIO_BACKENDS`, "wasapi2" on Windows and "pulse" elsewhere by default.
+    """
+    backend = backend or default_audio_backend()
+    if backend not in AUDIO_BACKENDS:
+        raise ValueError(f"Unknown audio backend {backend}, choose from {', '.join(AUDIO_BACKENDS)}")
+    return f"{AUDIO_BACKENDS[backend]} ! audioconvert ! "
 
 
-def audio_enc():
+def audio_capture_pipeline(
+    *,
+    backend: Optional[str] = None,
+    rate: int = 16000,
+    channels: int = 1,
+    chunk_ms: int = 10,
+    appsink_name: str = "audio",
+) -> str:
+    """
+    Construct a GStreamer pipeline which delivers the desktop audio to an appsink in chunks of a fixed size.
+
+    Args:
+        backend: Audio source, see `audio_src`.
+        rate: Sample rate in Hz.
+        channels: Number of channels.
+        chunk_ms: Duration of a chunk in milliseconds. Every chunk has `rate * chunk_ms / 1000` frames of `F32LE`.
+        appsink_name: Name of the appsink.
+    """
+    duration = Fraction(chunk_ms, 1000)
+    return (
+        f"{audio_src(backend)}audioresample ! "
+        f"audio/x-raw,format=F32LE,layout=interleaved,rate={rate},channels={channels} ! "
+        f"audiobuffersplit output-buffer-duration={duration.numerator}/{duration.denominator} ! "
+        f"appsink name={appsink_name} sync=false max-buffers=64 drop=true emit-signals=true wait-on-eos=false"
+    )
+
+
+def audio_enc(encoder: str = "avenc_aac", settings: Optional[EncoderSettings] = None):
+    """
+    Construct an audio encoder, following `audio_src`.
+
+    Args:
+        encoder: Name of the encoder, a key of `encoders.ENCODERS`.
+        settings: Preset and bitrate of the encoder.
+    """
     # BUG: using mfaacenc along with nvd3d11h265enc causes a crash
     # return "mfaacenc ! "
 
-    return "avenc_aac ! "
+    _encoder = ENCODERS[encoder]
+    if _encoder.kind != "audio":
+        raise ValueError(f"{encoder} is not an audio encoder")
+    # e.g. opus only takes 48 kHz and a few lower rates
+    branch = "audioresample ! " if encoder == "opusenc" else ""
+    return branch + _encoder.element(settings)
+
 
+def utctimestampsrc(interval: float = 1, format: str = "srt", post_messages: bool = False):
+    """
+    Source of UTC timestamps to be muxed as a subtitle track.
 
-def utctimestampsrc():
-    return "utctimestampsrc interval=1 ! subparse ! "
+    Args:
+        interval: Interval between timestamps in seconds.
+        format: Payload format, "srt" (parsed by subparse) or "text" (muxed as is, without subparse).
+        post_messages: Whether to post every timestamp as a `utc-reference` element message on the bus.
+    """
+    src = f"utctimestampsrc interval={interval}"
+    if post_messages:
+        src += " post-messages=true"
+    if format == "srt":
+        return f"{src} ! subparse ! "
+    if format == "text":
+        return f"{src} format=text ! "
+    raise ValueError(f"Unsupported format for muxing: {format}")
 
 
 def recorder_pipeline(
@@ -97,6 +335,15 @@ def recorder_pipeline(
     window_name: Optional[str] = None,
     monitor_idx: Optional[int] = None,
     additional_args: Optional[str] = None,
+    appsink_outputs: Optional[list[ScreenOutput]] = None,
+    shm_outputs: Optional[list[ScreenOutput]] = None,
+    timestamp_identity: bool = False,
+    segment_duration: Optional[float] = None,
+    video_encoder: str = "nvd3d11h265enc",
+    video_encoder_settings: Optional[EncoderSettings] = None,
+    audio_encoder: str = "avenc_aac",
+    audio_encoder_settings: Optional[EncoderSettings] = None,
+    audio_backend: Optional[str] = None,
 ) -> str:
     """Construct a GStreamer pipeline for screen capturing.
     Args:
@@ -109,8 +356,23 @@ def recorder_pipeline(
         fps: The frame rate of the video.
         window_name: The name of the window to capture. If None, the entire screen will be captured.
         monitor_idx: The index of the monitor to capture. If None, the primary monitor will be captured.
+        appsink_outputs: Additional named appsink outputs which share the capture with the encoder.
+        shm_outputs: Shared-memory outputs of the capture, to which other processes attach while recording.
+            See `screen_to_shm`.
+        timestamp_identity: Whether to insert a `utctimestamper` named `TIMESTAMP_IDENTITY_NAME` after the
+            capture, which attaches per-frame UTC timestamps. See `TimestampMetaExtension`.
+        segment_duration: If given, the recording is split into segments of this duration in seconds, written to
+            `segment_location(filesink_location)`, e.g. `rec_00000.mkv`, `rec_00001.mkv`, ... The timestamp source
+            posts `utc-reference` messages, so that the UTC of the segment boundaries can be determined.
+        video_encoder: Name of the video encoder, see `encoders.select_encoder` to pick an installed one by policy.
+        video_encoder_settings: Preset, bitrate and keyframe interval of the video encoder.
+        audio_encoder: Name of the audio encoder.
+        audio_encoder_settings: Preset and bitrate of the audio encoder.
+        audio_backend: Source of the recorded audio, see `audio_src`.
     """
     assert filesink_location.endswith(".mkv"), "Only Matroska (.mkv) files are supported now."
+    _check_output_names(appsink_outputs or [])
+    _check_output_names(shm_outputs or [])
 
     srcs = []
     if record_video:
@@ -120,20 +382,29 @@ def recorder_pipeline(
             window_name=window_name,
             monitor_idx=monitor_idx,
             additional_args=additional_args,
+            timestamp_identity=timestamp_identity,
         )
         sinks = []
         if enable_appsink:
             sinks.append("queue leaky=downstream ! " + screen_to_appsink())
         if enable_fpsdisplaysink:
             sinks.append("queue leaky=downstream ! " + screen_to_fpsdisplaysink())
-        sinks.append("queue ! " + screen_enc())
+        for output in appsink_outputs or []:
+            sinks.append("queue leaky=downstream ! " + screen_to_output(output))
+        for output in shm_outputs or []:
+            sinks.append("queue leaky=downstream ! " + screen_to_shm(output))
+        sinks.append("queue ! " + screen_enc(video_encoder, video_encoder_settings))
         srcs.append(tee(_screen_src, sinks))
 
     if record_audio:
-        srcs.append(audio_src() + audio_enc())
+        srcs.append(audio_src(audio_backend) + audio_enc(audio_encoder, audio_encoder_settings))
     if record_timestamp:
-        srcs.append(utctimestampsrc())
+        srcs.append(utctimestampsrc(post_messages=segment_duration is not None))
 
+    if segment_duration is not None:
+        pads = [pad for pad, enabled in (("video", record_video), ("audio_0", record_audio)) if enabled]
+        pads += ["subtitle_0"] if record_timestamp else []
+        return splitmuxsink(list(zip(pads, srcs)), segment_location(filesink_location), segment_duration)
     return matroskamux(srcs) + f"filesink location={filesink_location}"
 
 
@@ -162,3 +433,53 @@ def screen_capture_pipeline(
     sinks = ["queue leaky=downstream ! " + screen_to_appsink()]
     # return tee(src, sinks)
     return src + sinks[0]
+
+
+def screen_fanout_pipeline(
+    outputs: list[ScreenOutput],
+    *,
+    shm_outputs: Optional[list[ScreenOutput]] = None,
+    show_cursor: bool = True,
+    fps: Optional[float] = None,
+    window_name: Optional[str] = None,
+    monitor_idx: Optional[int] = None,
+    additional_args: Optional[str] = None,
+) -> str:
+    """
+    Construct a GStreamer pipeline which captures the screen once and delivers it to several named appsinks.
+    Each output has its own frame rate, size and format, e.g. 10 fps full-resolution frames for a VLM and
+    30 fps downscaled frames for a policy, while the screen is captured only once.
+
+    Args:
+        outputs: Outputs to deliver. Names must be unique.
+        shm_outputs: Shared-memory outputs, to which other processes attach, see `screen_to_shm`.
+        fps: The frame rate of the capture. If None, the highest frame rate among the outputs is used.
+        window_name: The name of the window to capture. If None, the entire screen will be captured.
+        monitor_idx: The index of the monitor to capture. If None, the primary monitor will be captured.
+    """
+    shm_outputs = shm_outputs or []
+    assert outputs or shm_outputs, "At least one output is required."
+    _check_output_names(outputs)
+    _check_output_names(shm_outputs)
+
+    if fps is None:
+        output_fps = [output.fps for output in outputs + shm_outputs]
+        fps = 60 if None in output_fps else max(output_fps)
+
+    src = screen_src(
+        show_cursor=show_cursor,
+        fps=fps,
+        window_name=window_name,
+        monitor_idx=monitor_idx,
+        additional_args=additional_args,
+    )
+    sinks = ["queue leaky=downstream ! " + screen_to_output(output) for output in outputs]
+    sinks += ["queue leaky=downstream ! " + screen_to_shm(output) for output in shm_outputs]
+    if len(sinks) == 1:
+        return src + sinks[0]
+    return tee(src, sinks)
+
+
+def _check_output_names(outputs: list[ScreenOutput]):
+    names = [output.name for output in outputs]
+    assert len(names) == len(set(names)), f"Output names must be unique, got {names}"
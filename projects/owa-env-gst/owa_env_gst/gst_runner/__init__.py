@@ -1,8 +1,23 @@
 from owa.registry import RUNNABLES
 
-from .extensions import AppsinkExtension, FPSDisplayExtension, SeekExtension
+from .extensions import (
+    AppsinkExtension,
+    DropStatsExtension,
+    FPSDisplayExtension,
+    SeekExtension,
+    TimestampMetaExtension,
+    WatchdogExtension,
+)
 from .gst_runner import BaseGstPipelineRunner
 
 
 @RUNNABLES.register("gst_pipeline_runner")
-class GstPipelineRunner(BaseGstPipelineRunner, AppsinkExtension, FPSDisplayExtension, SeekExtension): ...
+class GstPipelineRunner(
+    BaseGstPipelineRunner,
+    AppsinkExtension,
+    DropStatsExtension,
+    FPSDisplayExtension,
+    SeekExtension,
+    TimestampMetaExtension,
+    WatchdogExtension,
+): ...
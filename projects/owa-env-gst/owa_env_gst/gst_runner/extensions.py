@@ -5,11 +5,13 @@ import gi
 gi.require_version("Gst", "1.0")
 
 import inspect
+import time
+from typing import Callable, Optional
 
-from gi.repository import Gst
+from gi.repository import GLib, Gst
 from loguru import logger
 
-from ..utils import get_frame_time_ns, try_set_state, wait_for_message
+from ..utils import get_frame_time_ns, running_time_to_utc_ns, try_set_state, wait_for_message
 
 # Initialize GStreamer
 if not Gst.is_initialized():
@@ -17,27 +19,38 @@ if not Gst.is_initialized():
 
 
 class AppsinkExtension:
-    def register_appsink_callback(self, callback):
+    def register_appsink_callback(self, callback, *, appsink_name: str | None = None):
         """
         Register a callback function to be called when a new sample is available from an appsink.
 
         Args:
             callback: Callback function to be called
+            appsink_name: Name of the appsink to attach the callback to. If None, the callback is attached to every
+                appsink in the pipeline.
         """
-        self.appsink_callback = callback
-        self.appsinks: list[Gst.Element] = self.find_elements_by_factoryname("appsink")
-        for appsink in self.appsinks:
+        appsinks: list[Gst.Element] = self.find_elements_by_factoryname("appsink")
+        if appsink_name is not None:
+            appsinks = [appsink for appsink in appsinks if appsink.get_name() == appsink_name]
+            if not appsinks:
+                raise ValueError(f"No appsink named '{appsink_name}' found in the pipeline.")
+
+        # inspecting the signature on every sample is costly, so it is done once here.
+        parameters = inspect.signature(callback).parameters
+        for appsink in appsinks:
             if not self._do_not_modify_appsink_properties:
                 appsink.set_properties(sync=False, emit_signals=True, wait_on_eos=False, max_buffers=1, drop=True)
 
-            appsink.connect("new-sample", self._on_new_sample)
+            appsink.connect("new-sample", self._on_new_sample, callback, parameters)
+        self.appsinks.extend(appsinks)
 
-    def _on_new_sample(self, appsink: Gst.Element) -> Gst.FlowReturn:
+    def _on_new_sample(self, appsink: Gst.Element, callback, parameters) -> Gst.FlowReturn:
         """
         Handle new samples from appsinks.
 
         Args:
             appsink: Source appsink element
+            callback: Callback registered for this appsink
+            parameters: Parameters of the callback's signature
 
         Returns:
             Gst.FlowReturn: Status of sample processing
@@ -48,7 +61,6 @@ class AppsinkExtension:
             return Gst.FlowReturn.ERROR
 
         kwargs = {}
-        parameters = inspect.signature(self.appsink_callback).parameters
         if "sample" in parameters:
             kwargs["sample"] = sample
         if "pipeline" in parameters:
@@ -56,9 +68,11 @@ class AppsinkExtension:
         if "appsink" in parameters:
             kwargs["appsink"] = appsink
         if "metadata" in parameters:
-            kwargs["metadata"] = get_frame_time_ns(sample, self.pipeline)
+            kwargs["metadata"] = get_frame_time_ns(sample, self.pipeline, self.clock_calibrator)
 
-        self.appsink_callback(**kwargs)
+        callback(**kwargs)
+        name = appsink.get_name()
+        self.appsink_delivered[name] = self.appsink_delivered.get(name, 0) + 1
         return Gst.FlowReturn.OK
 
 
@@ -126,4 +140,427 @@ class FPSDisplayExtension:
         fpsdisplaysink.set_property("signal-fps-measurements", True)
 
 
-__all__ = ["AppsinkExtension", "SeekExtension", "FPSDisplayExtension"]
+class _StageCounter:
+    """Buffer counters of a single pipeline stage. Updated from streaming threads."""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.in_buffers = 0
+        self.out_buffers = 0
+        self.overruns = 0
+        self.last_drop_ns = None
+
+
+def _count_buffers(info: Gst.PadProbeInfo) -> int:
+    if info.type & Gst.PadProbeType.BUFFER_LIST:
+        return info.get_buffer_list().length()
+    return 1
+
+
+def _iterate_sources(pipeline: Gst.Pipeline) -> list[Gst.Element]:
+    """Return the source elements of a pipeline."""
+    sources = []
+    iterator = pipeline.iterate_sources()
+    while True:
+        res, elem = iterator.next()
+        if res == Gst.IteratorResult.OK:
+            sources.append(elem)
+        elif res == Gst.IteratorResult.RESYNC:
+            iterator.resync()
+            sources = []
+        else:
+            return sources
+
+
+class DropStatsExtension:
+    """
+    Account for frames dropped at every stage of the pipeline.
+
+    Frames disappear silently in several places: `videorate drop-only=true` drops frames above the maximum rate,
+    `queue leaky=downstream` drops the oldest frame when a downstream consumer is slow and appsinks with
+    `drop=true` drop samples which were not pulled in time. This extension installs pad probes and signal handlers
+    on those elements, so a low delivered frame rate can be attributed to capture, encoding or a slow consumer.
+    """
+
+    _BUFFER_PROBE = Gst.PadProbeType.BUFFER | Gst.PadProbeType.BUFFER_LIST
+
+    def enable_drop_stats(self):
+        """
+        Install probes and signal handlers on sources, videorates, queues and appsinks of the pipeline.
+        Must be called after the pipeline is constructed and before it starts.
+        """
+        self._stage_counters: dict[str, _StageCounter] = {}
+
+        for elem in _iterate_sources(self.pipeline):
+            src_pad = elem.get_static_pad("src")
+            if src_pad is not None:
+                counter = self._add_stage_counter(elem, "source")
+                src_pad.add_probe(self._BUFFER_PROBE, self._on_buffer_out, counter)
+
+        for videorate in self.find_elements_by_factoryname("videorate"):
+            counter = self._add_stage_counter(videorate, "videorate")
+            # `silent=false` makes videorate notify whenever it drops or duplicates a frame
+            videorate.set_property("silent", False)
+            videorate.connect("notify::drop", self._on_videorate_drop, counter)
+
+        for queue in self.find_elements_by_factoryname("queue"):
+            counter = self._add_stage_counter(queue, "queue")
+            queue.get_static_pad("sink").add_probe(self._BUFFER_PROBE, self._on_buffer_in, counter)
+            queue.get_static_pad("src").add_probe(self._BUFFER_PROBE, self._on_buffer_out, counter)
+            queue.connect("overrun", self._on_queue_overrun, counter)
+
+        for appsink in self.find_elements_by_factoryname("appsink"):
+            counter = self._add_stage_counter(appsink, "appsink")
+            appsink.get_static_pad("sink").add_probe(self._BUFFER_PROBE, self._on_buffer_in, counter)
+
+    def _add_stage_counter(self, element: Gst.Element, kind: str) -> _StageCounter:
+        counter = _StageCounter(kind)
+        self._stage_counters[element.get_name()] = counter
+        return counter
+
+    @staticmethod
+    def _on_buffer_in(pad: Gst.Pad, info: Gst.PadProbeInfo, counter: _StageCounter):
+        counter.in_buffers += _count_buffers(info)
+        return Gst.PadProbeReturn.OK
+
+    @staticmethod
+    def _on_buffer_out(pad: Gst.Pad, info: Gst.PadProbeInfo, counter: _StageCounter):
+        counter.out_buffers += _count_buffers(info)
+        return Gst.PadProbeReturn.OK
+
+    @staticmethod
+    def _on_videorate_drop(videorate: Gst.Element, pspec, counter: _StageCounter):
+        counter.last_drop_ns = time.time_ns()
+
+    @staticmethod
+    def _on_queue_overrun(queue: Gst.Element, counter: _StageCounter):
+        # a leaky queue drops a buffer whenever it overruns. a non-leaky queue blocks upstream instead.
+        counter.overruns += 1
+        if queue.get_property("leaky") != 0:
+            counter.last_drop_ns = time.time_ns()
+
+    def get_drop_stats(self) -> dict[str, dict]:
+        """
+        Get per-stage buffer counters of the pipeline.
+
+        Returns:
+            dict[str, dict]: Mapping from element name to its counters. Each entry contains
+                `kind`, `in`, `out`, `dropped`, `duplicated`, `overruns` and `last_drop_ns`
+                (UTC nanoseconds of the most recent drop, None if unknown or never dropped). `out` and `dropped`
+                of appsinks without a callback registered by `register_appsink_callback` are None, since they are
+                pulled outside of the runner.
+        """
+        stats = {}
+        pulled_appsinks = {appsink.get_name() for appsink in self.appsinks}
+        for name, counter in self._stage_counters.items():
+            element = self.pipeline.get_by_name(name)
+            stat = dict(
+                kind=counter.kind,
+                dropped=0,
+                duplicated=0,
+                overruns=counter.overruns,
+                last_drop_ns=counter.last_drop_ns,
+            )
+            stat["in"], stat["out"] = counter.in_buffers, counter.out_buffers
+
+            if counter.kind == "source":
+                stat["in"] = counter.out_buffers
+            elif counter.kind == "videorate":
+                stat["in"], stat["out"] = element.get_property("in"), element.get_property("out")
+                stat["dropped"], stat["duplicated"] = element.get_property("drop"), element.get_property("duplicate")
+            elif counter.kind == "queue":
+                queued = element.get_property("current-level-buffers")
+                stat["dropped"] = max(0, counter.in_buffers - counter.out_buffers - queued)
+            elif counter.kind == "appsink":
+                if name in pulled_appsinks and element.get_property("emit-signals"):
+                    # the callback pulls every sample inside `new-sample`, on the streaming thread which queued it,
+                    # so the appsink never holds more than the sample being delivered and drops none
+                    stat["out"] = self.appsink_delivered.get(name, 0)
+                else:
+                    # samples are pulled elsewhere, if at all, so neither deliveries nor drops are known
+                    stat["out"] = stat["dropped"] = None
+            stats[name] = stat
+        return stats
+
+
+class TimestampMetaExtension:
+    """
+    Attach the UTC capture time to every frame as a `GstReferenceTimestampMeta` with `timestamp/x-unix` caps.
+
+    The meta travels with the buffer through converters and tees, so appsinks and probes downstream read the exact
+    wall-clock time of each frame instead of interpolating it from the 1 Hz timestamp subtitle track.
+    Requires a `utctimestamper` element in the pipeline, e.g. `recorder_pipeline(..., timestamp_identity=True)`,
+    which attaches the meta to a copy of every buffer. A pad probe can not, since buffers handed to Python are
+    never writable.
+    """
+
+    def enable_timestamp_meta(self, callback=None, *, element_name: str = "ts"):
+        """
+        Convert the frame times with the clock calibration of this runner. Must be called after the pipeline is
+        constructed.
+
+        Args:
+            callback: (Optional) called as `callback(pts_ns, utc_ns)` for every frame from the streaming thread,
+                e.g. to export the timestamps into a sidecar file.
+            element_name: Name of the `utctimestamper` element.
+        """
+        stamper = self.pipeline.get_by_name(element_name)
+        if stamper is None or stamper.get_factory().get_name() != "utctimestamper":
+            raise ValueError(f"No utctimestamper named '{element_name}' found in the pipeline.")
+        stamper.set_utc_handlers(self._pts_to_utc_ns, callback)
+
+    def _pts_to_utc_ns(self, pts_ns: int) -> int:
+        return running_time_to_utc_ns(pts_ns, self.pipeline, self.clock_calibrator)
+
+
+class _PadWatch:
+    """Buffer flow of a watched pad. Updated from streaming threads, in `time.monotonic_ns`."""
+
+    def __init__(self, element_name: str):
+        self.element_name = element_name
+        self.last_buffer_ns = 0
+        self.first_buffer_ns = None  # first buffer since the last restart
+
+
+class _Watchdog:
+    """Configuration and state of `WatchdogExtension`. Only accessed from the main loop, except for the watches."""
+
+    def __init__(self, watches, stall_timeout, restart, backoff_initial, backoff_max, max_restarts, callback):
+        self.watches: list[_PadWatch] = watches
+        self.stall_timeout_ns = int(stall_timeout * 1_000_000_000)
+        self.restart = restart
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.max_restarts = max_restarts
+        self.callback = callback
+
+        # "running" while buffers flow, "waiting" for the backoff before a restart, "recovering" until they flow
+        self.state = "running"
+        self.playing_since_ns = None
+        self.stall: Optional[dict] = None  # the ongoing stall
+        self.stall_last_buffer_ns = 0
+        self.stall_detected_ns = 0
+        self.attempts = 0  # restarts of the ongoing stall
+        self.restart_at_ns = 0
+        self.restarted_ns = None
+        self.restarts = 0
+        self.stalls: list[dict] = []
+
+
+def _monotonic_to_utc_ns(monotonic_ns: int) -> int:
+    return monotonic_ns + time.time_ns() - time.monotonic_ns()
+
+
+class WatchdogExtension:
+    """
+    Detect stalled buffer flow and restart the pipeline to recover from it.
+
+    A capture source may hang without posting an error, e.g. after the captured window closes or the display is
+    reconfigured, and the pipeline then silently stops delivering. The watchdog probes the source pads of chosen
+    elements and declares a stall once none of their buffers arrived for `stall_timeout`. The pipeline is then
+    restarted, i.e. set to NULL and back to PLAYING with every probe and callback kept, right away and again with
+    exponential backoff while buffers do not flow within `stall_timeout` after a restart. Errors posted while
+    recovering count as failed restarts instead of stopping the runner.
+
+    Example:
+    ```python
+    runner = GstPipelineRunner().configure(pipeline_description)
+    runner.enable_watchdog(stall_timeout=2.0, callback=lambda stall: print(f"Recovered in {stall['recovery_time']} s"))
+    ```
+    """
+
+    _BUFFER_PROBE = Gst.PadProbeType.BUFFER | Gst.PadProbeType.BUFFER_LIST
+
+    def enable_watchdog(
+        self,
+        *,
+        element_names: Optional[list[str]] = None,
+        stall_timeout: float = 5.0,
+        restart: bool = True,
+        backoff_initial: float = 1.0,
+        backoff_max: float = 30.0,
+        max_restarts: Optional[int] = None,
+        callback: Optional[Callable[[dict], None]] = None,
+    ):
+        """
+        Install probes on the watched pads and schedule the checks. Must be called before the pipeline starts.
+
+        Args:
+            element_names: Names of the elements whose source pads are watched. Defaults to the sources of the
+                pipeline. Choose elements which deliver continuously, since a stall is any gap of `stall_timeout`.
+            stall_timeout: Gap in seconds without buffers on any watched pad after which the pipeline is stalled.
+            restart: Whether to restart the pipeline on stalls. If False, stalls are only reported.
+            backoff_initial: Delay in seconds before the second restart of a stall, doubled for every further one.
+            backoff_max: Maximum delay in seconds between restarts.
+            max_restarts: (Optional) maximum number of restarts of a stall, after which the runner stops.
+            callback: (Optional) called with the stall from the main loop once buffers flow again, see
+                `get_watchdog_stats`.
+        """
+        if element_names is None:
+            elements = [elem for elem in _iterate_sources(self.pipeline) if elem.get_static_pad("src") is not None]
+        else:
+            elements = []
+            for name in element_names:
+                elem = self.pipeline.get_by_name(name)
+                if elem is None or elem.get_static_pad("src") is None:
+                    raise ValueError(f"No element named '{name}' with a source pad found in the pipeline.")
+                elements.append(elem)
+
+        watches = []
+        for elem in elements:
+            watch = _PadWatch(elem.get_name())
+            elem.get_static_pad("src").add_probe(self._BUFFER_PROBE, self._on_watched_buffer, watch)
+            watches.append(watch)
+        self._watchdog = _Watchdog(
+            watches, stall_timeout, restart, backoff_initial, backoff_max, max_restarts, callback
+        )
+
+        self.pipeline.get_bus().connect("message", self._on_watchdog_message)
+        # checked a few times per timeout, which bounds the detection delay to a quarter of it
+        GLib.timeout_add(max(10, int(stall_timeout * 250)), self._watchdog_tick)
+
+    @staticmethod
+    def _on_watched_buffer(pad: Gst.Pad, info: Gst.PadProbeInfo, watch: _PadWatch):
+        now = time.monotonic_ns()
+        watch.last_buffer_ns = now
+        if watch.first_buffer_ns is None:
+            watch.first_buffer_ns = now
+        return Gst.PadProbeReturn.OK
+
+    def _watchdog_tick(self) -> bool:
+        if self.pipeline is None:
+            return False  # returning False removes the timeout source
+        watchdog, now = self._watchdog, time.monotonic_ns()
+
+        if watchdog.state != "running" and self._stop_requested:
+            # nothing flows to drain, so the loop is quit instead of waiting for EOS
+            self.main_loop.quit()
+            return False
+
+        if watchdog.state == "running":
+            if watchdog.playing_since_ns is None:
+                # the timeout may fire on a shared main context before this pipeline starts
+                if self.pipeline.get_state(0)[1] == Gst.State.PLAYING:
+                    watchdog.playing_since_ns = now
+                return True
+            stalled = [
+                watch
+                for watch in watchdog.watches
+                if now - max(watch.last_buffer_ns, watchdog.playing_since_ns) > watchdog.stall_timeout_ns
+            ]
+            if stalled:
+                self._on_stall(stalled, now)
+        elif watchdog.state == "waiting":
+            if now >= watchdog.restart_at_ns:
+                self._restart_pipeline(now)
+        elif all(watch.first_buffer_ns is not None for watch in watchdog.watches):
+            self._on_recovered()
+        elif watchdog.restarted_ns is not None and now - watchdog.restarted_ns > watchdog.stall_timeout_ns:
+            self._on_restart_failed(f"no buffer within {watchdog.stall_timeout_ns / 1e9} seconds", now)
+        return True
+
+    def _on_stall(self, stalled: list[_PadWatch], now: int):
+        watchdog = self._watchdog
+        watchdog.stall_last_buffer_ns = max(max(watch.last_buffer_ns for watch in stalled), watchdog.playing_since_ns)
+        watchdog.stall_detected_ns = now
+        watchdog.stall = dict(
+            elements=[watch.element_name for watch in stalled],
+            start_ns=_monotonic_to_utc_ns(watchdog.stall_last_buffer_ns),
+            detected_ns=_monotonic_to_utc_ns(now),
+        )
+        logger.warning(
+            f"Buffer flow of {', '.join(watchdog.stall['elements'])} stalled for "
+            f"{(now - watchdog.stall_last_buffer_ns) / 1e9:.1f} seconds"
+        )
+        for watch in watchdog.watches:
+            watch.first_buffer_ns = None
+        watchdog.attempts = 0
+        watchdog.restarted_ns = None
+        watchdog.state = "recovering"
+        if watchdog.restart:
+            # while recovering, errors and EOS are handled by `_on_watchdog_message` instead of quitting the loop
+            self.pipeline.get_bus().handler_block(self._bus_message_handler)
+            self._restart_pipeline(now)
+
+    def _restart_pipeline(self, now: int):
+        watchdog = self._watchdog
+        watchdog.attempts += 1
+        watchdog.restarts += 1
+        logger.info(f"Restarting the pipeline (attempt {watchdog.attempts})")
+        self._prepare_restart()
+        for watch in watchdog.watches:
+            watch.first_buffer_ns = None
+        self.pipeline.set_state(Gst.State.NULL)
+        watchdog.restarted_ns = now
+        watchdog.state = "recovering"
+        if self.pipeline.set_state(Gst.State.PLAYING) == Gst.StateChangeReturn.FAILURE:
+            self._on_restart_failed("the pipeline failed to start", now)
+
+    def _prepare_restart(self):
+        """Called before every restart, e.g. for sinks to continue where they stopped instead of overwriting."""
+
+    def _on_restart_failed(self, reason: str, now: int):
+        watchdog = self._watchdog
+        if watchdog.max_restarts is not None and watchdog.attempts >= watchdog.max_restarts:
+            logger.error(f"Failed to recover the pipeline after {watchdog.attempts} restarts: {reason}")
+            self.main_loop.quit()
+            return
+        delay = min(watchdog.backoff_initial * 2 ** (watchdog.attempts - 1), watchdog.backoff_max)
+        logger.warning(f"Restart failed: {reason}. Retrying in {delay:.1f} seconds")
+        watchdog.restart_at_ns = now + int(delay * 1_000_000_000)
+        watchdog.state = "waiting"
+
+    def _on_recovered(self):
+        watchdog = self._watchdog
+        recovered_ns = max(watch.first_buffer_ns for watch in watchdog.watches)
+        stall = watchdog.stall | dict(
+            recovered_ns=_monotonic_to_utc_ns(recovered_ns),
+            duration=(recovered_ns - watchdog.stall_last_buffer_ns) / 1e9,
+            recovery_time=(recovered_ns - watchdog.stall_detected_ns) / 1e9,
+            restarts=watchdog.attempts,
+        )
+        logger.info(f"Buffer flow recovered after {stall['duration']:.1f} seconds and {stall['restarts']} restarts")
+        watchdog.stalls.append(stall)
+        watchdog.stall = None
+        watchdog.state = "running"
+        if watchdog.restart:
+            self.pipeline.get_bus().handler_unblock(self._bus_message_handler)
+        if watchdog.callback is not None:
+            watchdog.callback(stall)
+
+    def _on_watchdog_message(self, bus: Gst.Bus, message: Gst.Message):
+        watchdog = self._watchdog
+        if watchdog.state == "running" or not watchdog.restart:
+            return
+        if message.type == Gst.MessageType.EOS:
+            self.main_loop.quit()
+        elif message.type == Gst.MessageType.ERROR and watchdog.state == "recovering":
+            err, debug = message.parse_error()
+            self.pipeline.set_state(Gst.State.NULL)
+            self._on_restart_failed(f"{err} ({debug})", time.monotonic_ns())
+
+    def get_watchdog_stats(self) -> dict:
+        """
+        Get the stalls detected by the watchdog.
+
+        Returns:
+            dict: `state` ("running", "waiting" or "recovering"), the total number of `restarts`, the recovered
+                `stalls` and the ongoing `stall`, if any. A stall contains the stalled `elements`, `start_ns` (UTC
+                of the last buffer before it), `detected_ns` and, once recovered, `recovered_ns` (UTC of the first
+                buffer after it), `duration` (gap of buffer flow), `recovery_time` (from detection to recovery)
+                in seconds and the number of `restarts` it took.
+        """
+        watchdog = self._watchdog
+        return dict(
+            state=watchdog.state, restarts=watchdog.restarts, stalls=list(watchdog.stalls), stall=watchdog.stall
+        )
+
+
+__all__ = [
+    "AppsinkExtension",
+    "DropStatsExtension",
+    "SeekExtension",
+    "FPSDisplayExtension",
+    "TimestampMetaExtension",
+    "WatchdogExtension",
+]
@@ -4,11 +4,14 @@ import gi
 
 gi.require_version("Gst", "1.0")
 
+from typing import Optional
+
 from gi.repository import GLib, Gst
 from loguru import logger
 
 from owa import Runnable
 
+from ..clock_sync import ClockCalibrator
 from ..utils import try_set_state
 
 # Initialize GStreamer
@@ -40,23 +43,38 @@ class BaseGstPipelineRunner(Runnable):
     A generalized GStreamer pipeline runner that manages pipeline lifecycle and callbacks.
     """
 
-    def on_configure(self, pipeline_description: str, *, do_not_modify_appsink_properties: bool = False) -> bool:
+    def on_configure(
+        self,
+        pipeline_description: str,
+        *,
+        do_not_modify_appsink_properties: bool = False,
+        clock_calibration_interval: float = 1.0,
+        stop_timeout: Optional[float] = None,
+    ) -> bool:
         """
         Configure the GStreamer pipeline.
 
         Args:
             pipeline_description: GStreamer pipeline description string
-            start_time: Starting time position in seconds (optional)
+            do_not_modify_appsink_properties: Whether to keep the appsink properties given in the description
+            clock_calibration_interval: Interval in seconds between samples of the pipeline clock to UTC offset
+            stop_timeout: Maximum time in seconds to wait for EOS after `stop`, after which the pipeline is stopped
+                without draining. If None, `stop` waits until EOS reaches every sink.
 
         Returns:
             bool: Configuration success status
         """
         self.pipeline_description = pipeline_description
         self._do_not_modify_appsink_properties = do_not_modify_appsink_properties
+        self._clock_calibration_interval = clock_calibration_interval
+        self._stop_timeout = stop_timeout
+        self.clock_calibrator = ClockCalibrator()
 
         self.pipeline = None
         self.main_loop = None
         self.appsinks = []
+        self.appsink_delivered: dict[str, int] = {}
+        self._stop_requested = False
 
         try:
             self.pipeline: Gst.Pipeline = Gst.parse_launch(self.pipeline_description)
@@ -73,7 +91,7 @@ class BaseGstPipelineRunner(Runnable):
         # Setup bus message handling
         bus = self.pipeline.get_bus()
         bus.add_signal_watch()
-        bus.connect("message", on_message, self.main_loop)
+        self._bus_message_handler = bus.connect("message", on_message, self.main_loop)
 
         return True
 
@@ -86,8 +104,17 @@ class BaseGstPipelineRunner(Runnable):
     def _loop(self):
         """Run the main GLib loop."""
         try_set_state(self.pipeline, Gst.State.PLAYING)
+        self._calibrate_clock()
+        GLib.timeout_add(int(self._clock_calibration_interval * 1000), self._calibrate_clock)
         self.main_loop.run()
 
+    def _calibrate_clock(self) -> bool:
+        """Sample the pipeline clock to UTC offset. Scheduled periodically on the main loop."""
+        if self.pipeline is None:
+            return False  # returning False removes the timeout source
+        self.clock_calibrator.sample(self.pipeline)
+        return True
+
     def cleanup(self):
         """Clean up pipeline resources."""
         if self.main_loop:
@@ -101,9 +128,19 @@ class BaseGstPipelineRunner(Runnable):
 
     def stop(self):
         """Stop the pipeline gracefully."""
+        self._stop_requested = True
         if self.pipeline:
             self.pipeline.send_event(Gst.Event.new_eos())
             # After sending EOS, `on_message` will handle the EOS signal and quit the loop
+            if self._stop_timeout is not None:
+                GLib.timeout_add(int(self._stop_timeout * 1000), self._on_stop_timeout)
+
+    def _on_stop_timeout(self) -> bool:
+        """Quit the loop if EOS did not arrive in time, e.g. as a sink is stuck. `cleanup` then stops the pipeline."""
+        if self.main_loop is not None and self.main_loop.is_running():
+            logger.warning(f"EOS was not received within {self._stop_timeout} seconds, stopping the pipeline")
+            self.main_loop.quit()
+        return False
 
     def find_elements_by_factoryname(self, name: str) -> list[Gst.Element]:
         """
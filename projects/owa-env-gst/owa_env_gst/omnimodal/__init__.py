@@ -1,4 +1,5 @@
 from .appsink_recorder import AppsinkRecorder
+from .inprocess_recorder import InProcessRecorder
 from .subprocess_recorder import SubprocessRecorder
 
-__all__ = ["AppsinkRecorder", "SubprocessRecorder"]
+__all__ = ["AppsinkRecorder", "InProcessRecorder", "SubprocessRecorder"]
@@ -0,0 +1,209 @@
+# ruff: noqa: E402
+# To suppress the warning for E402, waiting for https://github.com/astral-sh/ruff/issues/3711
+
+import gi
+
+gi.require_version("Gst", "1.0")
+
+
+from pathlib import Path
+from typing import Callable, Optional
+
+from gi.repository import Gst
+from loguru import logger
+
+from owa.registry import RUNNABLES
+
+from ..encoders import EncoderSettings
+from ..frame_timestamps import FLAG_CALIBRATED, FrameTimestampWriter, SegmentedFrameTimestampWriter, frames_path
+from ..gst_factory import TIMESTAMP_IDENTITY_NAME, ScreenOutput, recorder_pipeline
+from ..gst_runner import GstPipelineRunner
+from ..segments import Segment, SegmentTracker, manifest_path, parse_structure
+from ..utils import running_time_to_utc_ns
+
+if not Gst.is_initialized():
+    Gst.init(None)
+
+# element messages of `splitmuxsink`, which report the boundaries of the segments
+_FRAGMENT_MESSAGES = ("splitmuxsink-fragment-opened", "splitmuxsink-fragment-closed")
+
+
+@RUNNABLES.register("owa_env_gst/omnimodal/inprocess_recorder")
+class InProcessRecorder(GstPipelineRunner):
+    """
+    Recorder which runs `recorder_pipeline` in this process, instead of in a `gst-launch-1.0` subprocess.
+
+    Since the pipeline is in-process, the recording can be tapped: named appsink outputs share the capture with the
+    encoder, e.g. to feed an agent with the frames being recorded, and every captured frame is reported with its
+    exact UTC time. The per-frame timestamps are written to `<name>.frames.bin`, or next to every segment of a
+    segmented recording, e.g. `<name>_00000.frames.bin`, see `FrameTimestamps`.
+
+    Example:
+    ```python
+    recorder = InProcessRecorder().configure(
+        filesink_location="rec.mkv",
+        appsink_outputs=[ScreenOutput(name="agent", fps=5, width=640, height=360, format="RGB")],
+        output_callbacks={"agent": lambda sample, metadata: agent.observe(sample_to_ndarray(sample), metadata)},
+        stop_timeout=5.0,
+    )
+    with recorder.session:
+        time.sleep(60)
+    print(recorder.get_drop_stats())
+    ```
+    """
+
+    def on_configure(
+        self,
+        filesink_location: str,
+        *,
+        record_audio: bool = True,
+        record_video: bool = True,
+        record_timestamp: bool = True,
+        enable_fpsdisplaysink: bool = False,
+        show_cursor: bool = True,
+        fps: float = 60,
+        window_name: Optional[str] = None,
+        monitor_idx: Optional[int] = None,
+        additional_args: Optional[str] = None,
+        appsink_outputs: Optional[list[ScreenOutput]] = None,
+        output_callbacks: Optional[dict[str, Callable]] = None,
+        shm_outputs: Optional[list[ScreenOutput]] = None,
+        frame_callback: Optional[Callable[[int, int], None]] = None,
+        write_frame_timestamps: bool = True,
+        enable_drop_stats: bool = True,
+        segment_duration: Optional[float] = None,
+        segment_callback: Optional[Callable[[Segment], None]] = None,
+        stop_timeout: Optional[float] = 10.0,
+        video_encoder: str = "nvd3d11h265enc",
+        video_encoder_settings: Optional[EncoderSettings] = None,
+        audio_encoder: str = "avenc_aac",
+        audio_encoder_settings: Optional[EncoderSettings] = None,
+        audio_backend: Optional[str] = None,
+        watchdog_timeout: Optional[float] = None,
+        watchdog_callback: Optional[Callable[[dict], None]] = None,
+    ) -> bool:
+        """
+        Args:
+            filesink_location: Location of the `.mkv` recording.
+            appsink_outputs: Additional named appsink outputs which share the capture with the encoder.
+            output_callbacks: Callback of each appsink output by name, called with the arguments it declares, see
+                `AppsinkExtension.register_appsink_callback`.
+            shm_outputs: Shared-memory outputs of the capture, to which other processes attach while recording.
+            frame_callback: (Optional) called as `callback(pts_ns, utc_ns)` for every captured frame from the
+                streaming thread. It must return quickly, since it delays the frame.
+            write_frame_timestamps: Whether to write the per-frame timestamps next to the recording.
+            enable_drop_stats: Whether to count the frames dropped at every stage, see `get_drop_stats`.
+            segment_duration: If given, the recording is split into segments of this duration in seconds, e.g.
+                `rec_00000.mkv`, `rec_00001.mkv`, ..., and their UTC ranges are written to `rec.segments.json`.
+            segment_callback: (Optional) called with a `Segment` when its start UTC is known and when it closes.
+            stop_timeout: Maximum time in seconds to wait for the recording to be finalized after `stop`. If None,
+                `stop` waits until every buffered frame is encoded and written.
+            video_encoder: Name of the video encoder, see `encoders.select_encoder` to pick an installed one.
+            video_encoder_settings: Preset, bitrate and keyframe interval of the video encoder.
+            audio_encoder: Name of the audio encoder.
+            audio_encoder_settings: Preset and bitrate of the audio encoder.
+            audio_backend: Source of the recorded audio, e.g. "wasapi2" or "pulse", see `gst_factory.audio_src`.
+            watchdog_timeout: If given, the pipeline is restarted once no frame was captured for this many seconds,
+                e.g. as the captured window closed, see `WatchdogExtension`. Requires `segment_duration`, since
+                the recording continues in the next segment instead of overwriting the first one.
+            watchdog_callback: (Optional) called with every stall once the capture recovered from it.
+        """
+        if watchdog_timeout is not None and segment_duration is None:
+            raise ValueError("The watchdog requires `segment_duration`, since a restart reopens the recording")
+        if not Path(filesink_location).parent.exists():
+            Path(filesink_location).parent.mkdir(parents=True, exist_ok=True)
+            logger.warning(f"Output directory {filesink_location} does not exist. Creating it.")
+        filesink_location = Path(filesink_location).as_posix()
+
+        pipeline_description = recorder_pipeline(
+            filesink_location=filesink_location,
+            record_audio=record_audio,
+            record_video=record_video,
+            record_timestamp=record_timestamp,
+            enable_fpsdisplaysink=enable_fpsdisplaysink,
+            show_cursor=show_cursor,
+            fps=fps,
+            window_name=window_name,
+            monitor_idx=monitor_idx,
+            additional_args=additional_args,
+            appsink_outputs=appsink_outputs,
+            shm_outputs=shm_outputs,
+            timestamp_identity=record_video,
+            segment_duration=segment_duration,
+            video_encoder=video_encoder,
+            video_encoder_settings=video_encoder_settings,
+            audio_encoder=audio_encoder,
+            audio_encoder_settings=audio_encoder_settings,
+            audio_backend=audio_backend,
+        )
+        logger.debug(f"Constructed pipeline: {pipeline_description}")
+        if not super().on_configure(pipeline_description, stop_timeout=stop_timeout):
+            return False
+
+        self.frame_timestamp_writer = None
+        if record_video:
+            if write_frame_timestamps and segment_duration is not None:
+                # every segment restarts its PTS from zero, so its frames get their own sidecar
+                self.frame_timestamp_writer = SegmentedFrameTimestampWriter(segment_duration)
+            elif write_frame_timestamps:
+                self.frame_timestamp_writer = FrameTimestampWriter(frames_path(filesink_location))
+
+            def on_frame(pts_ns: int, utc_ns: int):
+                if self.frame_timestamp_writer is not None:
+                    flags = FLAG_CALIBRATED if self.clock_calibrator.is_calibrated else 0
+                    self.frame_timestamp_writer.append(pts_ns, utc_ns, flags)
+                if frame_callback is not None:
+                    frame_callback(pts_ns, utc_ns)
+
+            self.enable_timestamp_meta(on_frame, element_name=TIMESTAMP_IDENTITY_NAME)
+
+        for name, callback in (output_callbacks or {}).items():
+            self.register_appsink_callback(callback, appsink_name=name)
+        if enable_drop_stats:
+            self.enable_drop_stats()
+
+        self.segment_tracker = None
+        if segment_duration is not None:
+            self.segment_tracker = SegmentTracker(
+                manifest_path=manifest_path(filesink_location),
+                callback=segment_callback,
+                segment_duration=segment_duration,
+            )
+            self.pipeline.get_bus().connect("message::element", self._on_element_message)
+
+        if watchdog_timeout is not None:
+            self.enable_watchdog(
+                # frames are captured continuously, unlike audio, which may pause while nothing plays
+                element_names=[TIMESTAMP_IDENTITY_NAME] if record_video else None,
+                stall_timeout=watchdog_timeout,
+                callback=watchdog_callback,
+            )
+        return True
+
+    def _on_element_message(self, bus: Gst.Bus, message: Gst.Message):
+        structure = message.get_structure()
+        if structure is None or structure.get_name() not in _FRAGMENT_MESSAGES:
+            return
+        name, fields = parse_structure(structure.to_string())
+        # unlike `gst-launch-1.0`, the pipeline clock is at hand, so boundaries are converted to UTC exactly
+        # instead of relying on the `utc-reference` messages of the timestamp track.
+        running_time = fields["running-time"]
+        utc_ns = running_time_to_utc_ns(running_time, self.pipeline, self.clock_calibrator)
+        self.segment_tracker.handle_message("utc-reference", {"running-time": running_time, "utc": utc_ns})
+        self.segment_tracker.handle_message(name, fields)
+        if name == "splitmuxsink-fragment-opened" and self.frame_timestamp_writer is not None:
+            self.frame_timestamp_writer.start_segment(fields["location"], running_time)
+
+    def _prepare_restart(self):
+        # splitmuxsink restarts counting its fragments from `start-index` when it is started again
+        mux = self.pipeline.get_by_name("mux")
+        mux.set_property("start-index", len(self.segment_tracker.segments))
+        # the running time of the frames starts over with the restarted pipeline
+        if self.frame_timestamp_writer is not None:
+            self.frame_timestamp_writer.restart()
+
+    def cleanup(self):
+        super().cleanup()
+        # the pipeline is stopped, so no probe writes anymore
+        if self.frame_timestamp_writer is not None:
+            self.frame_timestamp_writer.close()
@@ -1,12 +1,17 @@
+import sys
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
 from loguru import logger
 
 from owa.registry import RUNNABLES
 from owa.runner import SubprocessRunner
 
-from ..gst_factory import recorder_pipeline
+from ..encoders import EncoderSettings
+from ..gst_factory import ScreenOutput, recorder_pipeline
+from ..segments import Segment, SegmentTracker, manifest_path
+
+GST_LAUNCH = "gst-launch-1.0.exe" if sys.platform == "win32" else "gst-launch-1.0"
 
 
 @RUNNABLES.register("owa_env_gst/omnimodal/subprocess_recorder")
@@ -26,8 +31,30 @@ class SubprocessRecorder(SubprocessRunner):
         window_name: Optional[str] = None,
         monitor_idx: Optional[int] = None,
         additional_args: Optional[str] = None,
+        segment_duration: Optional[float] = None,
+        segment_callback: Optional[Callable[[Segment], None]] = None,
+        shm_outputs: Optional[list[ScreenOutput]] = None,
+        video_encoder: str = "nvd3d11h265enc",
+        video_encoder_settings: Optional[EncoderSettings] = None,
+        audio_encoder: str = "avenc_aac",
+        audio_encoder_settings: Optional[EncoderSettings] = None,
+        audio_backend: Optional[str] = None,
     ):
-        """Prepare the GStreamer pipeline command."""
+        """
+        Prepare the GStreamer pipeline command.
+
+        Args:
+            segment_duration: If given, the recording is split into segments of this duration in seconds, e.g.
+                `rec_00000.mkv`, `rec_00001.mkv`, ..., and their UTC ranges are written to `rec.segments.json`.
+            segment_callback: (Optional) called with a `Segment` when its start UTC is known and when it closes,
+                e.g. to rotate the event log at the same boundaries.
+            shm_outputs: Shared-memory outputs of the capture, to which other processes attach while recording.
+            video_encoder: Name of the video encoder, see `encoders.select_encoder` to pick an installed one.
+            video_encoder_settings: Preset, bitrate and keyframe interval of the video encoder.
+            audio_encoder: Name of the audio encoder.
+            audio_encoder_settings: Preset and bitrate of the audio encoder.
+            audio_backend: Source of the recorded audio, e.g. "wasapi2" or "pulse", see `gst_factory.audio_src`.
+        """
 
         # if filesink_location does not exist, create it and warn the user
         if not Path(filesink_location).parent.exists():
@@ -49,6 +76,33 @@ class SubprocessRecorder(SubprocessRunner):
             window_name=window_name,
             monitor_idx=monitor_idx,
             additional_args=additional_args,
+            segment_duration=segment_duration,
+            shm_outputs=shm_outputs,
+            video_encoder=video_encoder,
+            video_encoder_settings=video_encoder_settings,
+            audio_encoder=audio_encoder,
+            audio_encoder_settings=audio_encoder_settings,
+            audio_backend=audio_backend,
+        )
+
+        if segment_duration is None:
+            self.segment_tracker = None
+            super().on_configure(f"{GST_LAUNCH} -e -v {pipeline_description}".split())
+            return
+
+        # `-m` prints the bus messages, from which the segment boundaries are tracked
+        self.segment_tracker = SegmentTracker(
+            manifest_path=manifest_path(filesink_location),
+            callback=segment_callback,
+            segment_duration=segment_duration,
+            use_utc_reference=record_timestamp,
+        )
+        super().on_configure(
+            f"{GST_LAUNCH} -e -v -m {pipeline_description}".split(),
+            output_callback=self._on_output,
         )
 
-        super().on_configure(f"gst-launch-1.0.exe -e -v {pipeline_description}".split())
+    def _on_output(self, line: str):
+        # with `-v -m`, every caps negotiation and message is printed, so the output is only logged for debugging
+        logger.debug(line)
+        self.segment_tracker.feed_line(line)
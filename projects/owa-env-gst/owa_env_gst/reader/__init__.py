@@ -0,0 +1,16 @@
+from .probe import VideoProbe, probe_video, summarize_corpus, summarize_probe
+from .timestamps import TimestampTrack, read_timestamp_track, read_timestamp_tracks
+from .video_reader import OwaVideoReader, VideoIndex, build_video_index
+
+__all__ = [
+    "OwaVideoReader",
+    "VideoIndex",
+    "build_video_index",
+    "VideoProbe",
+    "probe_video",
+    "summarize_probe",
+    "summarize_corpus",
+    "TimestampTrack",
+    "read_timestamp_track",
+    "read_timestamp_tracks",
+]
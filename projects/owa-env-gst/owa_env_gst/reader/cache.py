@@ -0,0 +1,67 @@
+"""
+Sidecar caches of per-recording results, stored next to the recording and keyed by its size and mtime.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+
+def sidecar_path(path: str | os.PathLike, suffix: str) -> Path:
+    """Return the sidecar path of a recording, e.g. `rec.mkv` with suffix `.index.npz` becomes `rec.index.npz`."""
+    return Path(path).with_suffix(suffix)
+
+
+def load_sidecar(path: str | os.PathLike, suffix: str) -> dict[str, np.ndarray] | None:
+    """
+    Load a sidecar cache of a recording.
+
+    Args:
+        path: Path of the recording
+        suffix: Suffix of the sidecar file
+
+    Returns:
+        dict[str, np.ndarray] | None: Cached arrays, or None if the cache is missing or the recording changed.
+    """
+    cache_path = sidecar_path(path, suffix)
+    if not cache_path.exists():
+        return None
+
+    stat = os.stat(path)
+    try:
+        with np.load(cache_path) as data:
+            arrays = {key: data[key] for key in data.files}
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable cache {cache_path}: {e}")
+        return None
+
+    if arrays.pop("_source_size", None) != stat.st_size or arrays.pop("_source_mtime_ns", None) != stat.st_mtime_ns:
+        return None
+    return arrays
+
+
+def save_sidecar(path: str | os.PathLike, suffix: str, **arrays: np.ndarray):
+    """
+    Save arrays as a sidecar cache of a recording. Failures, e.g. a read-only directory, are logged and ignored.
+
+    Args:
+        path: Path of the recording
+        suffix: Suffix of the sidecar file
+        **arrays: Arrays to cache
+    """
+    cache_path = sidecar_path(path, suffix)
+    stat = os.stat(path)
+    tmp_path = cache_path.with_name(cache_path.name + f".{os.getpid()}.tmp")
+    try:
+        # write to a temporary file first, so that readers never observe a partially written cache
+        with open(tmp_path, "wb") as f:
+            np.savez(f, _source_size=stat.st_size, _source_mtime_ns=stat.st_mtime_ns, **arrays)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Failed to write cache {cache_path}: {e}")
+        tmp_path.unlink(missing_ok=True)
+
+
+__all__ = ["sidecar_path", "load_sidecar", "save_sidecar"]
@@ -0,0 +1,216 @@
+# ruff: noqa: E402
+# To suppress the warning for E402, waiting for https://github.com/astral-sh/ruff/issues/3711
+import gi
+
+gi.require_version("Gst", "1.0")
+
+import os
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+from gi.repository import Gst
+
+from ..utils import try_set_state
+from .cache import load_sidecar, save_sidecar
+from .video_reader import _pull_samples
+
+# Initialize GStreamer
+if not Gst.is_initialized():
+    Gst.init(None)
+
+PROBE_SUFFIX = ".probe.npz"
+
+
+class VideoProbe(NamedTuple):
+    """Metadata of every frame of the video stream of a recording, in decoding order."""
+
+    codec: str  # media type of the parsed stream, e.g. "video/x-h265"
+    width: int
+    height: int
+    framerate: float  # nominal frame rate of the caps, 0 for variable frame rate
+    pts_ns: np.ndarray  # int64, -1 if unknown
+    dts_ns: np.ndarray  # int64, -1 if unknown
+    size: np.ndarray  # int64, bytes of the encoded frame
+    frame_type: np.ndarray  # "I", "P" or "B"
+
+    def gop_lengths(self) -> np.ndarray:
+        """Number of frames from each I-frame up to the next one, or to the end of the stream."""
+        starts = np.flatnonzero(self.frame_type == "I")
+        return np.diff(np.append(starts, len(self.frame_type)))
+
+
+def classify_frames(pts_ns: np.ndarray, keyframe: np.ndarray) -> np.ndarray:
+    """
+    Classify frames in decoding order into I-, P- and B-frames from their flags and PTS alone.
+
+    Parsers do not tell P- from B-frames, so a delta frame is taken as a B-frame if it is presented before a frame
+    decoded earlier, i.e. if the encoder reordered it. Reference B-frames of hierarchical GOPs are also B-frames.
+    """
+    pts_ns = np.asarray(pts_ns, dtype=np.int64)
+    max_before = np.maximum.accumulate(np.concatenate(([np.iinfo(np.int64).min], pts_ns[:-1])))
+    frame_type = np.where(pts_ns < max_before, "B", "P")
+    frame_type[np.asarray(keyframe, dtype=bool)] = "I"
+    return frame_type
+
+
+def _caps_info(caps: Gst.Caps) -> tuple[str, int, int, float]:
+    structure = caps.get_structure(0)
+    width = structure.get_value("width") if structure.has_field("width") else 0
+    height = structure.get_value("height") if structure.has_field("height") else 0
+    success, num, den = structure.get_fraction("framerate")
+    framerate = num / den if success and den else 0.0
+    return structure.get_name(), width, height, framerate
+
+
+def probe_video(path: str | os.PathLike, *, use_cache: bool = True) -> VideoProbe:
+    """
+    Read the metadata of every frame of the video stream of a Matroska recording, without decoding.
+
+    Frames are demuxed and parsed in this process, which is far faster than `ffprobe -show_frames` since nothing is
+    decoded. The result is cached next to the recording and rebuilt when the recording changes.
+
+    Args:
+        path: Path of the `.mkv` recording
+        use_cache: Whether to read and write the cached result
+
+    Returns:
+        VideoProbe: Metadata of the video stream
+    """
+    if use_cache and (cached := load_sidecar(path, PROBE_SUFFIX)) is not None:
+        return VideoProbe(
+            codec=str(cached["codec"]),
+            width=int(cached["width"]),
+            height=int(cached["height"]),
+            framerate=float(cached["framerate"]),
+            pts_ns=cached["pts_ns"],
+            dts_ns=cached["dts_ns"],
+            size=cached["size"],
+            frame_type=cached["frame_type"],
+        )
+
+    location = Path(path).as_posix()
+    pipeline: Gst.Pipeline = Gst.parse_launch(
+        f"filesrc location={location} ! matroskademux name=demux "
+        "demux.video_0 ! parsebin ! appsink name=sink sync=false emit-signals=false"
+    )
+    appsink = pipeline.get_by_name("sink")
+
+    caps, pts, dts, size, keyframe = None, [], [], [], []
+    try_set_state(pipeline, Gst.State.PLAYING)
+    try:
+        for sample in _pull_samples(pipeline, appsink):
+            buf = sample.get_buffer()
+            caps = caps or sample.get_caps()
+            pts.append(-1 if buf.pts == Gst.CLOCK_TIME_NONE else buf.pts)
+            dts.append(-1 if buf.dts == Gst.CLOCK_TIME_NONE else buf.dts)
+            size.append(buf.get_size())
+            keyframe.append(not buf.has_flags(Gst.BufferFlags.DELTA_UNIT))
+    finally:
+        pipeline.set_state(Gst.State.NULL)
+
+    if caps is None:
+        raise ValueError(f"No video frame found in {path}")
+
+    codec, width, height, framerate = _caps_info(caps)
+    pts = np.asarray(pts, dtype=np.int64)
+    probe = VideoProbe(
+        codec=codec,
+        width=width,
+        height=height,
+        framerate=framerate,
+        pts_ns=pts,
+        dts_ns=np.asarray(dts, dtype=np.int64),
+        size=np.asarray(size, dtype=np.int64),
+        frame_type=classify_frames(pts, keyframe),
+    )
+    if use_cache:
+        save_sidecar(path, PROBE_SUFFIX, **probe._asdict())
+    return probe
+
+
+def _stats(values: np.ndarray) -> dict:
+    if not len(values):
+        return dict(count=0)
+    return dict(
+        count=len(values),
+        min=float(values.min()),
+        mean=float(values.mean()),
+        median=float(np.median(values)),
+        max=float(values.max()),
+    )
+
+
+def summarize_probe(probe: VideoProbe, *, gap_factor: float = 2.0) -> dict:
+    """
+    Summarize the GOPs, frame types and timestamp gaps of a probed recording.
+
+    Args:
+        probe: Probed video stream
+        gap_factor: Intervals between presented frames longer than this multiple of the median interval are gaps.
+
+    Returns:
+        dict: JSON-serializable summary. Durations are in seconds.
+    """
+    pts = np.sort(probe.pts_ns[probe.pts_ns >= 0])
+    intervals = np.diff(pts) / 1e9
+    median_interval = float(np.median(intervals)) if len(intervals) else 0.0
+    gaps = intervals[intervals > gap_factor * median_interval] if median_interval > 0 else intervals[:0]
+
+    types, counts = np.unique(probe.frame_type, return_counts=True)
+    keyframe_pts = probe.pts_ns[(probe.frame_type == "I") & (probe.pts_ns >= 0)]
+    return dict(
+        codec=probe.codec,
+        resolution=f"{probe.width}x{probe.height}",
+        framerate=probe.framerate,
+        frames=len(probe.frame_type),
+        duration=float(pts[-1] - pts[0]) / 1e9 if len(pts) else 0.0,
+        bytes=int(probe.size.sum()),
+        frame_types={str(t): int(c) for t, c in zip(types, counts)},
+        frame_size={str(t): _stats(probe.size[probe.frame_type == t]) for t in types},
+        gop_frames=_stats(probe.gop_lengths()),
+        gop_seconds=_stats(np.diff(np.sort(keyframe_pts)) / 1e9),
+        interval=dict(median=median_interval, max=float(intervals.max()) if len(intervals) else 0.0),
+        gaps=dict(count=len(gaps), total=float(gaps.sum()), max=float(gaps.max()) if len(gaps) else 0.0),
+    )
+
+
+def summarize_corpus(summaries: dict[str, dict]) -> dict:
+    """
+    Aggregate the summaries of `summarize_probe` over many recordings.
+
+    Args:
+        summaries: Summary of each recording by path
+
+    Returns:
+        dict: Totals, the frame type distribution, GOP statistics weighted by recording and the worst timestamp gaps.
+    """
+    frames = sum(summary["frames"] for summary in summaries.values())
+    frame_types: dict[str, int] = {}
+    for summary in summaries.values():
+        for frame_type, count in summary["frame_types"].items():
+            frame_types[frame_type] = frame_types.get(frame_type, 0) + count
+
+    gop_means = np.array([s["gop_frames"]["mean"] for s in summaries.values() if s["gop_frames"]["count"]])
+    with_gaps = {path: s["gaps"] for path, s in summaries.items() if s["gaps"]["count"]}
+    return dict(
+        recordings=len(summaries),
+        frames=frames,
+        duration=sum(summary["duration"] for summary in summaries.values()),
+        bytes=sum(summary["bytes"] for summary in summaries.values()),
+        codecs=sorted({summary["codec"] for summary in summaries.values()}),
+        frame_types={t: dict(count=c, fraction=c / frames) for t, c in sorted(frame_types.items())},
+        gop_frames=dict(
+            mean_of_recordings=_stats(gop_means),
+            min=min((s["gop_frames"]["min"] for s in summaries.values() if s["gop_frames"]["count"]), default=0),
+            max=max((s["gop_frames"]["max"] for s in summaries.values() if s["gop_frames"]["count"]), default=0),
+        ),
+        gaps=dict(
+            count=sum(gaps["count"] for gaps in with_gaps.values()),
+            recordings=len(with_gaps),
+            worst=sorted(((gaps["max"], path) for path, gaps in with_gaps.items()), reverse=True)[:10],
+        ),
+    )
+
+
+__all__ = ["VideoProbe", "classify_frames", "probe_video", "summarize_corpus", "summarize_probe"]
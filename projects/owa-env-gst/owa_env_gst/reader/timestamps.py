@@ -0,0 +1,143 @@
+# ruff: noqa: E402
+# To suppress the warning for E402, waiting for https://github.com/astral-sh/ruff/issues/3711
+import gi
+
+gi.require_version("Gst", "1.0")
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple, Sequence
+
+import numpy as np
+from gi.repository import Gst
+
+from ..frame_timestamps import FrameTimestamps, frames_path
+from ..utils import try_set_state
+from .cache import load_sidecar, save_sidecar
+from .video_reader import _pull_samples
+
+# Initialize GStreamer
+if not Gst.is_initialized():
+    Gst.init(None)
+
+TIMESTAMPS_SUFFIX = ".timestamps.npz"
+
+
+def _interpolate(x: np.ndarray, xp: np.ndarray, fp: np.ndarray) -> np.ndarray:
+    """
+    Piecewise-linear int64 interpolation of `fp(xp)` at `x`, extrapolated with the first and last segments.
+    Values are centered before converting to float, since nanosecond epochs lose precision in float64.
+    """
+    x = np.asarray(x, dtype=np.int64)
+    if len(xp) == 1:
+        return x - xp[0] + fp[0]
+
+    seg = np.clip(np.searchsorted(xp, x, side="right") - 1, 0, len(xp) - 2)
+    x0, f0 = xp[seg], fp[seg]
+    slope = (fp[seg + 1] - f0) / (xp[seg + 1] - x0)
+    return f0 + np.round((x - x0) * slope).astype(np.int64)
+
+
+class TimestampTrack(NamedTuple):
+    """
+    (PTS, UTC) pairs of the timestamp subtitle track of a recording, sorted by PTS.
+
+    Conversions interpolate linearly between the pairs and extrapolate beyond them, so that frames before
+    the first or after the last timestamp are converted as well.
+    """
+
+    pts_ns: np.ndarray  # int64
+    utc_ns: np.ndarray  # int64
+
+    def __len__(self):
+        return len(self.pts_ns)
+
+    def pts_to_utc(self, pts_ns) -> np.ndarray:
+        """Convert presentation timestamps to UTC nanoseconds."""
+        return _interpolate(pts_ns, self.pts_ns, self.utc_ns)
+
+    def utc_to_pts(self, utc_ns) -> np.ndarray:
+        """Convert UTC nanoseconds to presentation timestamps."""
+        return _interpolate(utc_ns, self.utc_ns, self.pts_ns)
+
+
+def _parse_timestamp(payload: bytes) -> int:
+    # `utctimestampsrc format=binary` writes 8-byte big-endian integers, other formats write decimal text
+    if len(payload) == 8 and not payload.isdigit():
+        return int.from_bytes(payload, "big")
+    return int(payload.strip(b"\x00 \r\n"))
+
+
+def read_timestamp_track(
+    path: str | os.PathLike, *, use_cache: bool = True, use_frame_timestamps: bool = True
+) -> TimestampTrack:
+    """
+    Read the timestamp subtitle track of a Matroska recording, without decoding the video.
+    The track is cached next to the recording and read again when the recording changes.
+
+    Args:
+        path: Path of the `.mkv` recording
+        use_cache: Whether to read and write the cached track
+        use_frame_timestamps: Whether to use the per-frame timestamps of `<name>.frames.bin` if it exists,
+            which are exact for every frame instead of one per subtitle.
+
+    Returns:
+        TimestampTrack: Timestamps of the recording
+    """
+    if use_frame_timestamps and frames_path(path).exists():
+        frames = FrameTimestamps(frames_path(path))
+        if len(frames):
+            return TimestampTrack(pts_ns=np.array(frames.pts_ns), utc_ns=np.array(frames.utc_ns))
+
+    if use_cache and (cached := load_sidecar(path, TIMESTAMPS_SUFFIX)) is not None:
+        return TimestampTrack(pts_ns=cached["pts_ns"], utc_ns=cached["utc_ns"])
+
+    location = Path(path).as_posix()
+    pipeline: Gst.Pipeline = Gst.parse_launch(
+        f"filesrc location={location} ! matroskademux name=demux "
+        "demux.subtitle_0 ! appsink name=sink sync=false emit-signals=false"
+    )
+    appsink = pipeline.get_by_name("sink")
+
+    pts, utc = [], []
+    try_set_state(pipeline, Gst.State.PLAYING)
+    try:
+        for sample in _pull_samples(pipeline, appsink):
+            buf = sample.get_buffer()
+            pts.append(buf.pts)
+            utc.append(_parse_timestamp(buf.extract_dup(0, buf.get_size())))
+    finally:
+        pipeline.set_state(Gst.State.NULL)
+
+    if not pts:
+        raise ValueError(f"No timestamp found in the subtitle track of {path}")
+    pts = np.asarray(pts, dtype=np.int64)
+    order = np.argsort(pts, kind="stable")
+    track = TimestampTrack(pts_ns=pts[order], utc_ns=np.asarray(utc, dtype=np.int64)[order])
+
+    if use_cache:
+        save_sidecar(path, TIMESTAMPS_SUFFIX, pts_ns=track.pts_ns, utc_ns=track.utc_ns)
+    return track
+
+
+def read_timestamp_tracks(
+    paths: Sequence[str | os.PathLike], *, use_cache: bool = True, num_workers: int = 8
+) -> list[TimestampTrack]:
+    """
+    Read the timestamp tracks of many recordings in parallel. Demuxing runs in GStreamer's streaming threads,
+    so a thread pool scales without the start-up cost of processes.
+
+    Args:
+        paths: Paths of the `.mkv` recordings
+        use_cache: Whether to read and write the cached tracks
+        num_workers: Number of recordings read concurrently
+
+    Returns:
+        list[TimestampTrack]: Timestamps of each recording, in the order of `paths`
+    """
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        return list(executor.map(lambda path: read_timestamp_track(path, use_cache=use_cache), paths))
+
+
+__all__ = ["TimestampTrack", "read_timestamp_track", "read_timestamp_tracks"]
@@ -0,0 +1,250 @@
+# ruff: noqa: E402
+# To suppress the warning for E402, waiting for https://github.com/astral-sh/ruff/issues/3711
+import gi
+
+gi.require_version("Gst", "1.0")
+
+import os
+from pathlib import Path
+from typing import NamedTuple, Optional, Sequence
+
+import numpy as np
+from gi.repository import Gst
+from loguru import logger
+
+from ..utils import sample_to_ndarray, try_set_state
+from .cache import load_sidecar, save_sidecar
+
+# Initialize GStreamer
+if not Gst.is_initialized():
+    Gst.init(None)
+
+INDEX_SUFFIX = ".index.npz"
+PULL_TIMEOUT = 5 * Gst.SECOND
+
+
+class VideoIndex(NamedTuple):
+    """PTS of every video frame of a recording, sorted in presentation order, and whether each one is a keyframe."""
+
+    pts_ns: np.ndarray  # int64
+    keyframe: np.ndarray  # bool
+
+    def frame_at(self, pts_ns) -> np.ndarray:
+        """Index of the frame displayed at the given PTS, i.e. the last frame whose PTS is not after it."""
+        idx = np.searchsorted(self.pts_ns, pts_ns, side="right") - 1
+        return np.clip(idx, 0, len(self.pts_ns) - 1)
+
+    def keyframe_before(self, frame_idx) -> np.ndarray:
+        """Index of the last keyframe at or before the given frame."""
+        keyframe_indices = np.flatnonzero(self.keyframe)
+        pos = np.searchsorted(keyframe_indices, frame_idx, side="right") - 1
+        return keyframe_indices[np.maximum(pos, 0)]
+
+
+def _pull_samples(pipeline: Gst.Pipeline, appsink: Gst.Element):
+    """Yield samples of an appsink until EOS. Raises if the pipeline posts an error."""
+    bus = pipeline.get_bus()
+    while True:
+        sample = appsink.emit("try-pull-sample", PULL_TIMEOUT)
+        if sample is not None:
+            yield sample
+            continue
+
+        msg = bus.pop_filtered(Gst.MessageType.ERROR)
+        if msg is not None:
+            err, debug = msg.parse_error()
+            raise Exception(f"Error while reading {pipeline.get_name()}: {err} ({debug})")
+        if appsink.get_property("eos"):
+            return
+        raise TimeoutError(f"No sample received within {PULL_TIMEOUT / Gst.SECOND} seconds")
+
+
+def build_video_index(path: str | os.PathLike, *, use_cache: bool = True) -> VideoIndex:
+    """
+    Build the keyframe/PTS index of the video stream of a Matroska recording, without decoding.
+    The index is cached next to the recording and rebuilt when the recording changes.
+
+    Args:
+        path: Path of the `.mkv` recording
+        use_cache: Whether to read and write the cached index
+
+    Returns:
+        VideoIndex: Index of the video stream
+    """
+    if use_cache and (cached := load_sidecar(path, INDEX_SUFFIX)) is not None:
+        return VideoIndex(pts_ns=cached["pts_ns"], keyframe=cached["keyframe"])
+
+    location = Path(path).as_posix()
+    pipeline: Gst.Pipeline = Gst.parse_launch(
+        f"filesrc location={location} ! matroskademux name=demux "
+        "demux.video_0 ! appsink name=sink sync=false emit-signals=false"
+    )
+    appsink = pipeline.get_by_name("sink")
+
+    pts, keyframe = [], []
+    try_set_state(pipeline, Gst.State.PLAYING)
+    try:
+        for sample in _pull_samples(pipeline, appsink):
+            buf = sample.get_buffer()
+            pts.append(buf.pts)
+            keyframe.append(not buf.has_flags(Gst.BufferFlags.DELTA_UNIT))
+    finally:
+        pipeline.set_state(Gst.State.NULL)
+
+    # demuxers output frames in decoding order, which differs from presentation order if B-frames are present
+    pts = np.asarray(pts, dtype=np.int64)
+    order = np.argsort(pts, kind="stable")
+    index = VideoIndex(pts_ns=pts[order], keyframe=np.asarray(keyframe, dtype=bool)[order])
+    if not len(index.pts_ns):
+        raise ValueError(f"No video frame found in {path}")
+
+    if use_cache:
+        save_sidecar(path, INDEX_SUFFIX, pts_ns=index.pts_ns, keyframe=index.keyframe)
+    return index
+
+
+class OwaVideoReader:
+    """
+    Random-access frame reader for OWA `.mkv` recordings.
+
+    Requested timestamps are served by seeking to the nearest keyframe and decoding forward. The decoder is reused
+    across requests, so nearby timestamps are decoded without seeking again. `get_frames` sorts its requests
+    to make the most of this.
+
+    Example:
+    ```python
+    with OwaVideoReader("recording.mkv") as reader:
+        frame = reader.get_frame(1_500_000_000)  # frame displayed at 1.5 s
+        frames = reader.get_frames([0, 2_000_000_000, 100_000_000])  # [3, H, W, 4]
+    ```
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        *,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        format: str = "BGRA",
+        use_cache: bool = True,
+        max_forward_frames: int = 30,
+    ):
+        """
+        Args:
+            path: Path of the `.mkv` recording
+            width: Width of the returned frames. If None, the width of the recording is used.
+            height: Height of the returned frames. If None, the height of the recording is used.
+            format: Raw video format of the returned frames, e.g. "BGRA" or "RGB".
+            use_cache: Whether to read and write the cached keyframe/PTS index.
+            max_forward_frames: Maximum number of frames to decode forward instead of seeking
+                to the keyframe of a later GOP.
+        """
+        self.path = Path(path)
+        self.index = build_video_index(self.path, use_cache=use_cache)
+        self.max_forward_frames = max_forward_frames
+
+        size = "".join(f",{key}={value}" for key, value in (("width", width), ("height", height)) if value)
+        self.pipeline_description = (
+            f"filesrc location={self.path.as_posix()} ! matroskademux name=demux "
+            "demux.video_0 ! queue ! decodebin ! videoconvert ! videoscale ! "
+            f"video/x-raw,format={format}{size} ! "
+            "appsink name=sink sync=false max-buffers=4 drop=false emit-signals=false"
+        )
+        self.pipeline: Gst.Pipeline | None = None
+        self._samples = None
+        # index and content of the most recently decoded frame
+        self._position: int | None = None
+        self._frame: np.ndarray | None = None
+
+    def __len__(self):
+        return len(self.index.pts_ns)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _start(self):
+        self.pipeline = Gst.parse_launch(self.pipeline_description)
+        try_set_state(self.pipeline, Gst.State.PLAYING)
+        self._samples = _pull_samples(self.pipeline, self.pipeline.get_by_name("sink"))
+        self._position = None
+
+    def close(self):
+        """Release the decoding pipeline."""
+        if self.pipeline is not None:
+            self.pipeline.set_state(Gst.State.NULL)
+        self.pipeline = None
+        self._samples = None
+        self._position = None
+        self._frame = None
+
+    def _seek(self, frame_idx: int):
+        """Seek to the keyframe at or before the given frame."""
+        keyframe_idx = int(self.index.keyframe_before(frame_idx))
+        self.pipeline.seek_simple(
+            Gst.Format.TIME,
+            Gst.SeekFlags.FLUSH | Gst.SeekFlags.KEY_UNIT | Gst.SeekFlags.SNAP_BEFORE,
+            int(self.index.pts_ns[keyframe_idx]),
+        )
+        self._position = keyframe_idx - 1
+
+    def _decode(self, frame_idx: int) -> np.ndarray:
+        """Decode the given frame, reusing the decoder state if the frame is close ahead."""
+        if self.pipeline is None:
+            self._start()
+        if frame_idx == self._position:
+            return self._frame
+
+        keyframe_idx = int(self.index.keyframe_before(frame_idx))
+        decode_forward = self._position is not None and (
+            keyframe_idx <= self._position < frame_idx or 0 < frame_idx - self._position <= self.max_forward_frames
+        )
+        if not decode_forward:
+            self._seek(frame_idx)
+
+        target_pts = self.index.pts_ns[frame_idx]
+        for sample in self._samples:
+            pts = sample.get_buffer().pts
+            if pts < target_pts:
+                continue
+            if pts > target_pts:
+                logger.warning(f"Frame at {target_pts} ns is missing in {self.path}, returning frame at {pts} ns")
+            self._position, self._frame = frame_idx, sample_to_ndarray(sample)
+            return self._frame
+
+        # the iterator is exhausted at EOS and cannot be reused
+        self.close()
+        raise EOFError(f"Reached the end of {self.path} before the frame at {target_pts} ns")
+
+    def get_frame(self, pts_ns: int) -> np.ndarray:
+        """
+        Get the frame displayed at the given timestamp.
+
+        Args:
+            pts_ns: Presentation timestamp in nanoseconds
+
+        Returns:
+            np.ndarray: Frame in [H, W, C] layout
+        """
+        return self._decode(int(self.index.frame_at(pts_ns)))
+
+    def get_frames(self, pts_ns: Sequence[int]) -> np.ndarray:
+        """
+        Get the frames displayed at the given timestamps. Requests are decoded in sorted order,
+        so that every GOP is decoded at most once.
+
+        Args:
+            pts_ns: Presentation timestamps in nanoseconds, in any order
+
+        Returns:
+            np.ndarray: Frames in [N, H, W, C] layout, in the order of the requests
+        """
+        frame_indices = self.index.frame_at(np.asarray(pts_ns, dtype=np.int64))
+        unique_indices, inverse = np.unique(frame_indices, return_inverse=True)
+        frames = [self._decode(int(frame_idx)) for frame_idx in unique_indices]
+        return np.stack(frames)[inverse]
+
+
+__all__ = ["VideoIndex", "build_video_index", "OwaVideoReader"]
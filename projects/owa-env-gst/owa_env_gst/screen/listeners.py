@@ -10,9 +10,10 @@ gi.require_version("Gst", "1.0")
 from gi.repository import Gst
 from loguru import logger
 
+from owa.metrics import MetricManager
 from owa.registry import LISTENERS
 
-from ..gst_factory import screen_capture_pipeline
+from ..gst_factory import ScreenOutput, screen_capture_pipeline, screen_fanout_pipeline, shm_reader_pipeline
 from ..gst_runner import GstPipelineRunner
 from ..utils import sample_to_ndarray
 from .msg import FrameStamped
@@ -21,66 +22,11 @@ if not Gst.is_initialized():
     Gst.init(None)
 
 
-class MetricManager:
-    def __init__(self):
-        """Initialize the metric manager with empty history."""
-        self._timestamps = []
-        self._latencies = []
-        # Keep a reasonable history length to avoid memory issues
-        self._max_history = 100
-
-    def append(self, timestamp_ns: int, latency: float):
-        """
-        Add a new frame timestamp and latency measurement.
-
-        Args:
-            timestamp_ns: Frame timestamp in nanoseconds
-            latency: Processing latency in milliseconds
-        """
-        self._timestamps.append(timestamp_ns)
-        self._latencies.append(latency)
-
-        # Maintain history size limit
-        if len(self._timestamps) > self._max_history:
-            self._timestamps.pop(0)
-            self._latencies.pop(0)
-
-    @property
-    def latency(self):
-        """
-        Returns the average latency in seconds.
-
-        Returns:
-            float: Average latency or 0.0 if no data
-        """
-        if not self._latencies:
-            return 0.0
-        return sum(self._latencies) / len(self._latencies) / Gst.SECOND
-
-    @property
-    def fps(self):
-        """
-        Calculate frames per second based on recorded timestamps.
-
-        Returns:
-            float: Calculated FPS or 0.0 if insufficient data
-        """
-        if len(self._timestamps) < 2:
-            return 0.0
-
-        # Calculate time difference between first and last frame in seconds
-        # Convert from nanoseconds to seconds
-        time_diff_sec = (self._timestamps[-1] - self._timestamps[0]) / 1e9
-
-        if time_diff_sec <= 0:
-            return 0.0
-
-        # Calculate frames per second
-        return (len(self._timestamps) - 1) / time_diff_sec
-
-
-def build_screen_callback(callback):
+def build_screen_callback(callback, get_drop_stats=None):
     metric_manager = MetricManager()
+    num_params = len(inspect.signature(callback).parameters)
+    if num_params >= 3 and get_drop_stats is None:
+        raise ValueError("Callbacks accepting drop statistics require `enable_drop_stats=True`")
 
     def screen_callback(sample: Gst.Sample, metadata: dict):
         frame_arr = sample_to_ndarray(sample)
@@ -89,11 +35,12 @@ def build_screen_callback(callback):
         metric_manager.append(timestamp_ns, latency)
 
         message = FrameStamped(timestamp_ns=timestamp_ns, frame_arr=frame_arr)
-        params = inspect.signature(callback).parameters
-        if len(params) == 1:
+        if num_params == 1:
             callback(message)
-        else:
+        elif num_params == 2:
             callback(message, metric_manager)
+        else:
+            callback(message, metric_manager, get_drop_stats())
 
     return screen_callback
 
@@ -136,12 +83,22 @@ class ScreenListener(GstPipelineRunner):
     For performance metrics:
     ```python
     def process_with_metrics(frame, metrics):
-        print(f"FPS: {metrics.fps:.2f}, Latency: {metrics.latency*1000:.2f} ms")
+        print(f"FPS: {metrics.fps:.2f}, Latency: {metrics.latency*1000:.2f} ms, p99: {metrics.latency_p99*1000:.2f} ms")
         cv2.imshow("Screen", frame.frame_arr)
         cv2.waitKey(1)
 
     screen.configure(callback=process_with_metrics)
     ```
+
+    To find out where frames are dropped, enable the per-stage drop counters and accept them as a third argument.
+    They are off by default, since their probes run Python on every buffer of several pads:
+    ```python
+    def process_with_drops(frame, metrics, drop_stats):
+        for name, stat in drop_stats.items():
+            print(f"{name} ({stat['kind']}): in={stat['in']}, out={stat['out']}, dropped={stat['dropped']}")
+
+    screen.configure(callback=process_with_drops, enable_drop_stats=True)
+    ```
     """
 
     def on_configure(
@@ -153,6 +110,7 @@ class ScreenListener(GstPipelineRunner):
         window_name: str | None = None,
         monitor_idx: int | None = None,
         additional_args: str | None = None,
+        enable_drop_stats: bool = False,
     ) -> bool:
         """
         Configure the GStreamer pipeline for screen capture.
@@ -164,6 +122,7 @@ class ScreenListener(GstPipelineRunner):
             window_name (str | None): (Optional) specific window to capture.
             monitor_idx (int | None): (Optional) specific monitor index.
             additional_args (str | None): (Optional) additional arguments to pass to the pipeline.
+            enable_drop_stats (bool): Whether to count the frames dropped at every stage, see `get_drop_stats`.
         """
         # Construct the pipeline description
         pipeline_description = screen_capture_pipeline(
@@ -175,6 +134,133 @@ class ScreenListener(GstPipelineRunner):
         )
         logger.debug(f"Constructed pipeline: {pipeline_description}")
         super().on_configure(pipeline_description)
+        if enable_drop_stats:
+            self.enable_drop_stats()
+        get_drop_stats = self.get_drop_stats if enable_drop_stats else None
 
-        wrapped_callback = build_screen_callback(callback)
+        wrapped_callback = build_screen_callback(callback, get_drop_stats)
         self.register_appsink_callback(wrapped_callback)
+
+
+@LISTENERS.register("screen/fanout")
+class ScreenFanoutListener(GstPipelineRunner):
+    """
+    GStreamer-based screen capture listener which delivers a single capture to several outputs.
+
+    Each output has its own frame rate, size, format and callback. The screen is captured only once,
+    which saves GPU and CPU compared to running one `ScreenListener` per consumer.
+
+    Example:
+    ```python
+    from owa.registry import LISTENERS, activate_module
+    from owa_env_gst.gst_factory import ScreenOutput
+
+    activate_module("owa_env_gst")
+
+    screen = LISTENERS["screen/fanout"]().configure(
+        outputs=[
+            ScreenOutput(name="vlm", fps=10),
+            ScreenOutput(name="policy", fps=30, width=640, height=360, format="RGB"),
+        ],
+        callbacks={
+            "vlm": lambda frame: print("vlm", frame.frame_arr.shape),
+            "policy": lambda frame, metrics: print("policy", metrics.fps),
+        },
+    )
+
+    with screen.session:
+        input("Press Enter to stop")
+    ```
+    """
+
+    def on_configure(
+        self,
+        *,
+        outputs: list[ScreenOutput],
+        callbacks: dict,
+        shm_outputs: list[ScreenOutput] | None = None,
+        show_cursor: bool = True,
+        fps: float | None = None,
+        window_name: str | None = None,
+        monitor_idx: int | None = None,
+        additional_args: str | None = None,
+        enable_drop_stats: bool = False,
+    ) -> bool:
+        """
+        Configure the GStreamer pipeline for fan-out screen capture.
+
+        Keyword Arguments:
+            outputs (list[ScreenOutput]): Outputs to deliver frames to.
+            callbacks (dict): Mapping from output name to the function called with each frame of that output.
+            shm_outputs (list[ScreenOutput] | None): (Optional) outputs published to shared memory for other
+                processes, see `SharedMemoryListener`.
+            show_cursor (bool): Whether to show the cursor in the capture.
+            fps (float | None): Frames per second of the capture. Defaults to the highest rate among the outputs.
+            window_name (str | None): (Optional) specific window to capture.
+            monitor_idx (int | None): (Optional) specific monitor index.
+            additional_args (str | None): (Optional) additional arguments to pass to the pipeline.
+            enable_drop_stats (bool): Whether to count the frames dropped at every stage, see `get_drop_stats`.
+        """
+        output_names = {output.name for output in outputs}
+        if output_names != set(callbacks):
+            raise ValueError(f"Callbacks {sorted(callbacks)} do not match outputs {sorted(output_names)}")
+
+        pipeline_description = screen_fanout_pipeline(
+            outputs,
+            shm_outputs=shm_outputs,
+            show_cursor=show_cursor,
+            fps=fps,
+            window_name=window_name,
+            monitor_idx=monitor_idx,
+            additional_args=additional_args,
+        )
+        logger.debug(f"Constructed pipeline: {pipeline_description}")
+        super().on_configure(pipeline_description)
+        if enable_drop_stats:
+            self.enable_drop_stats()
+        get_drop_stats = self.get_drop_stats if enable_drop_stats else None
+
+        for name, callback in callbacks.items():
+            self.register_appsink_callback(build_screen_callback(callback, get_drop_stats), appsink_name=name)
+
+
+@LISTENERS.register("screen/shm")
+class SharedMemoryListener(GstPipelineRunner):
+    """
+    Listener of the frames a capture or recording publishes to shared memory, from another process.
+
+    Readers attach and detach at any time without affecting the publishing pipeline, and the frames are neither
+    captured again nor re-encoded. The publisher must be running when the listener starts. Frame timestamps are the
+    arrival times in this process.
+
+    Example:
+    ```python
+    # in the recording process, e.g. `recorder output.mkv --preview preview`
+    recorder.configure(filesink_location="output.mkv", shm_outputs=[ScreenOutput(name="preview")])
+
+    # in a dashboard process
+    preview = LISTENERS["screen/shm"]().configure(
+        output=ScreenOutput(name="preview", fps=5, width=960, height=540, format="RGB"),
+        callback=lambda frame: dashboard.show(frame.frame_arr),
+    )
+    with preview.session:
+        input("Press Enter to detach")
+    ```
+    """
+
+    def on_configure(self, *, output: ScreenOutput, callback, enable_drop_stats: bool = False) -> bool:
+        """
+        Configure the GStreamer pipeline which reads the shared memory.
+
+        Keyword Arguments:
+            output (ScreenOutput): Output to read, by name. See `shm_reader_pipeline` for which of its fields apply.
+            callback: Function to call with each frame, as with `ScreenListener`.
+            enable_drop_stats (bool): Whether to count the frames dropped at every stage, see `get_drop_stats`.
+        """
+        pipeline_description = shm_reader_pipeline(output)
+        logger.debug(f"Constructed pipeline: {pipeline_description}")
+        super().on_configure(pipeline_description)
+        if enable_drop_stats:
+            self.enable_drop_stats()
+        get_drop_stats = self.get_drop_stats if enable_drop_stats else None
+        self.register_appsink_callback(build_screen_callback(callback, get_drop_stats), appsink_name=output.name)
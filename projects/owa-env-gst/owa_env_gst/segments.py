@@ -0,0 +1,193 @@
+"""
+Tracking of the segments of a recording split by `splitmuxsink`, see `recorder_pipeline(segment_duration=...)`.
+
+`gst-launch-1.0 -m` prints the messages of the pipeline, e.g.
+`Got message #42 from element "mux" (element): splitmuxsink-fragment-opened, location=(string)rec_00001.mkv, running-time=(guint64)60000000000;`
+Fragment messages report the running time of each boundary, and the `utc-reference` messages of `utctimestampsrc`
+relate running times to UTC. `SegmentTracker` combines both into the UTC range of every segment, and writes them
+to a manifest next to the recording, e.g. `rec.segments.json`:
+
+```json
+{"segment_duration": 60.0, "segments": [
+    {"index": 0, "video": "rec_00000.mkv", "start_utc_ns": 1741608540328534500, "end_utc_ns": 1741608600345229300},
+    ...
+]}
+```
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+MANIFEST_SUFFIX = ".segments.json"
+
+_MESSAGE = re.compile(r'^Got message #\d+ from element "(?P<element>[^"]*)" \((?P<type>[^)]*)\): (?P<structure>.*)$')
+_FIELD = re.compile(r'(?P<key>[\w-]+)=\((?P<type>[^)]+)\)(?P<value>"(?:[^"\\]|\\.)*"|[^,;]*)')
+_ESCAPE = re.compile(r"\\(.)")
+
+
+def parse_structure(text: str) -> tuple[str, dict]:
+    """
+    Parse the string form of a `GstStructure`, e.g. `utc-reference, running-time=(guint64)0, utc=(guint64)1;`.
+    Integer fields are converted to int, other fields are returned as strings.
+    """
+    name, _, rest = text.partition(",")
+    fields = {}
+    for match in _FIELD.finditer(rest):
+        value = match["value"]
+        if value.startswith('"'):
+            value = _ESCAPE.sub(r"\1", value[1:-1])
+        elif re.fullmatch(r"g?u?int(64)?|g?u?long", match["type"]):
+            value = int(value)
+        fields[match["key"]] = value
+    return name.strip().rstrip(";"), fields
+
+
+def parse_gst_launch_message(line: str) -> Optional[tuple[str, dict]]:
+    """Parse an element message printed by `gst-launch-1.0 -m` into (structure name, fields), or None."""
+    match = _MESSAGE.match(line.strip())
+    if match is None or match["type"] != "element":
+        return None
+    return parse_structure(match["structure"])
+
+
+@dataclass
+class Segment:
+    index: int
+    video: str
+    start_running_time_ns: int
+    start_utc_ns: Optional[int] = None
+    end_running_time_ns: Optional[int] = None
+    end_utc_ns: Optional[int] = None
+
+
+class SegmentTracker:
+    """
+    Tracker of the segments of a recording, fed with the output lines of `gst-launch-1.0 -m`.
+
+    Example:
+    ```python
+    tracker = SegmentTracker(manifest_path="rec.segments.json", callback=lambda segment: print(segment))
+    runner.configure(["gst-launch-1.0", "-e", "-m", ...], output_callback=tracker.feed_line)
+    ```
+    """
+
+    def __init__(
+        self,
+        *,
+        manifest_path: Optional[str | os.PathLike] = None,
+        callback: Optional[Callable[[Segment], None]] = None,
+        segment_duration: Optional[float] = None,
+        use_utc_reference: bool = True,
+    ):
+        """
+        Args:
+            manifest_path: Path of the manifest, rewritten whenever a segment opens or closes.
+            callback: Called with a segment when its start UTC is known and when it closes.
+            segment_duration: Duration of a segment in seconds, written to the manifest.
+            use_utc_reference: Whether `utc-reference` messages are expected. If False, e.g. without a timestamp
+                track, the UTC of a boundary is the time its message was received, which lags by a few frames.
+        """
+        self.manifest_path = None if manifest_path is None else Path(manifest_path)
+        self.callback = callback
+        self.segment_duration = segment_duration
+        self.use_utc_reference = use_utc_reference
+        self.segments: list[Segment] = []
+        self._reference: Optional[tuple[int, int]] = None  # (running time, UTC) of the latest utc-reference
+        self._lock = threading.Lock()
+
+    def feed_line(self, line: str):
+        if (message := parse_gst_launch_message(line)) is not None:
+            self.handle_message(*message, received_ns=time.time_ns())
+
+    def running_time_to_utc(self, running_time_ns: int) -> Optional[int]:
+        if self._reference is None:
+            return None
+        reference_running_time, reference_utc = self._reference
+        return reference_utc + running_time_ns - reference_running_time
+
+    def handle_message(self, name: str, fields: dict, received_ns: Optional[int] = None):
+        received_ns = time.time_ns() if received_ns is None else received_ns
+        with self._lock:
+            updated = []
+            if name == "utc-reference":
+                first = self._reference is None
+                self._reference = (fields["running-time"], fields["utc"])
+                if first:
+                    # boundaries reported before the first reference
+                    for segment in self.segments:
+                        if segment.start_utc_ns is None:
+                            segment.start_utc_ns = self.running_time_to_utc(segment.start_running_time_ns)
+                            updated.append(segment)
+                        if segment.end_running_time_ns is not None and segment.end_utc_ns is None:
+                            segment.end_utc_ns = self.running_time_to_utc(segment.end_running_time_ns)
+            elif name == "splitmuxsink-fragment-opened":
+                running_time = fields["running-time"]
+                segment = Segment(len(self.segments), fields["location"], running_time)
+                segment.start_utc_ns = self._utc(running_time, received_ns)
+                self.segments.append(segment)
+                if segment.start_utc_ns is not None:
+                    updated.append(segment)
+            elif name == "splitmuxsink-fragment-closed":
+                running_time = fields["running-time"]
+                for segment in reversed(self.segments):
+                    if segment.video == fields["location"] and segment.end_running_time_ns is None:
+                        segment.end_running_time_ns = running_time
+                        segment.end_utc_ns = self._utc(running_time, received_ns)
+                        updated.append(segment)
+                        break
+            else:
+                return
+
+            if updated or name != "utc-reference":
+                self.write_manifest()
+        # outside of the lock, so that callbacks may query the tracker
+        for segment in updated:
+            if self.callback is not None:
+                self.callback(segment)
+
+    def _utc(self, running_time_ns: int, received_ns: int) -> Optional[int]:
+        if not self.use_utc_reference:
+            return received_ns
+        return self.running_time_to_utc(running_time_ns)
+
+    def write_manifest(self):
+        if self.manifest_path is None:
+            return
+        # videos are written relative to the manifest, which is next to them
+        segments = [asdict(segment) | dict(video=Path(segment.video).name) for segment in self.segments]
+        manifest = dict(segment_duration=self.segment_duration, segments=segments)
+        # atomic, so that readers never see a partially written manifest
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        tmp_path.write_text(json.dumps(manifest, indent=2))
+        os.replace(tmp_path, self.manifest_path)
+
+
+def manifest_path(filesink_location: str | os.PathLike) -> Path:
+    """Return the manifest path of a segmented recording, e.g. `rec.mkv` becomes `rec.segments.json`."""
+    return Path(filesink_location).with_suffix(MANIFEST_SUFFIX)
+
+
+def read_manifest(path: str | os.PathLike) -> list[Segment]:
+    """Read the segments of a manifest, with the video paths resolved relative to the manifest."""
+    path = Path(path)
+    segments = [Segment(**segment) for segment in json.loads(path.read_text())["segments"]]
+    for segment in segments:
+        segment.video = (path.parent / segment.video).as_posix()
+    return segments
+
+
+__all__ = [
+    "Segment",
+    "SegmentTracker",
+    "manifest_path",
+    "read_manifest",
+    "parse_gst_launch_message",
+    "parse_structure",
+    "MANIFEST_SUFFIX",
+]
@@ -9,31 +9,75 @@ import numpy as np
 from gi.repository import Gst
 from loguru import logger
 
+from .clock_sync import ClockCalibrator
+
 # Initialize GStreamer
 if not Gst.is_initialized():
     Gst.init(None)
 
 
-def get_frame_time_ns(sample: Gst.Sample, pipeline: Gst.Pipeline) -> dict:
+# GStreamer's caps for reference timestamps relative to the UNIX epoch, i.e. UTC nanoseconds
+UTC_REFERENCE_CAPS = Gst.Caps.from_string("timestamp/x-unix")
+
+
+def running_time_to_utc_ns(
+    running_time_ns: int, pipeline: Gst.Pipeline, calibrator: ClockCalibrator | None = None
+) -> int:
+    """
+    Convert a running time (e.g. buffer PTS) of a playing pipeline to UTC nanoseconds.
+
+    Args:
+        running_time_ns: Running time in nanoseconds
+        pipeline: GStreamer pipeline object
+        calibrator: (Optional) calibrated mapping from running time to UTC. If it is calibrated, it is used instead
+            of querying the pipeline clock.
+
+    Returns:
+        int: UTC time in nanoseconds
+    """
+    # a single call, since the calibration may be reset between a separate `is_calibrated` check and the conversion
+    if calibrator is not None and (utc_ns := calibrator.to_utc_ns(running_time_ns)) is not None:
+        return utc_ns
+    elapsed = pipeline.get_clock().get_time() - pipeline.get_base_time()
+    return time.time_ns() - (elapsed - running_time_ns)
+
+
+def get_reference_utc_ns(buf: Gst.Buffer) -> int | None:
+    """Return the UTC nanoseconds of the buffer's `timestamp/x-unix` reference timestamp meta, if any."""
+    meta = buf.get_reference_timestamp_meta(UTC_REFERENCE_CAPS)
+    return None if meta is None else meta.timestamp
+
+
+def get_frame_time_ns(sample: Gst.Sample, pipeline: Gst.Pipeline, calibrator: ClockCalibrator | None = None) -> dict:
     """
     Calculate frame timestamp in ns adjusted by pipeline latency.
 
     Args:
         sample: GStreamer sample object
         pipeline: GStreamer pipeline object
+        calibrator: (Optional) calibrated mapping from running time to UTC. If it is calibrated, the frame
+            timestamp is derived from it instead of querying the pipeline clock.
 
     Returns:
         Dictionary containing frame_time_ns and latency
     """
-    pts = sample.get_buffer().pts
+    buf = sample.get_buffer()
+
+    # the UTC attached at capture time is exact, so it takes precedence over any estimate made here
+    frame_time_ns = get_reference_utc_ns(buf)
+    if frame_time_ns is not None:
+        return dict(frame_time_ns=frame_time_ns, latency=time.time_ns() - frame_time_ns)
 
+    pts = buf.pts
     if pts == Gst.CLOCK_TIME_NONE:
         return dict(frame_time_ns=time.time_ns(), latency=0)
 
-    clock = pipeline.get_clock()
-    elapsed = clock.get_time() - pipeline.get_base_time()
-    latency = elapsed - pts
-    return dict(frame_time_ns=time.time_ns() - latency, latency=latency)
+    frame_time_ns = running_time_to_utc_ns(pts, pipeline, calibrator)
+    return dict(frame_time_ns=frame_time_ns, latency=time.time_ns() - frame_time_ns)
+
+
+# number of channels of the raw video formats supported by `sample_to_ndarray`
+VIDEO_FORMAT_CHANNELS = {"BGRA": 4, "RGBA": 4, "BGRx": 4, "RGBx": 4, "BGR": 3, "RGB": 3, "GRAY8": 1}
 
 
 def sample_to_ndarray(sample: Gst.Sample) -> np.ndarray:
@@ -44,18 +88,21 @@ def sample_to_ndarray(sample: Gst.Sample) -> np.ndarray:
         sample: GStreamer sample object
 
     Returns:
-        Numpy array containing the frame data
+        Numpy array containing the frame data, in [H, W, C] layout
     """
     buf = sample.get_buffer()
     caps = sample.get_caps()
     structure = caps.get_structure(0)
     width, height = structure.get_value("width"), structure.get_value("height")
     format_ = structure.get_value("format")
-    assert format_ == "BGRA", f"Unsupported format: {format_}"
+    assert format_ in VIDEO_FORMAT_CHANNELS, f"Unsupported format: {format_}"
+    channels = VIDEO_FORMAT_CHANNELS[format_]
+    # rows of raw video are padded to a multiple of 4 bytes, which matters for 3- and 1-channel formats
+    stride = (width * channels + 3) & ~3
 
     frame_data = buf.extract_dup(0, buf.get_size())
     # baseline: np.frombuffer(frame_data, dtype=np.uint8).reshape((height, width, 4))
-    return np.ndarray((height, width, 4), buffer=frame_data, dtype=np.uint8)
+    return np.ndarray((height, width, channels), buffer=frame_data, dtype=np.uint8, strides=(stride, channels, 1))
 
 
 # by default, common gstreamer element uses 1 second value. so timoeut must be > 1 seconds.
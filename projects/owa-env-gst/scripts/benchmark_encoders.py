@@ -0,0 +1,92 @@
+# ruff: noqa: E402
+# To suppress the warning for E402, waiting for https://github.com/astral-sh/ruff/issues/3711
+"""
+Benchmark the installed video encoders of `owa_env_gst.encoders` on `videotestsrc` content.
+
+Every encoder encodes the same frames as fast as it can, and the encode rate, the CPU time of this process (which
+includes the streaming threads of GStreamer, 100% being one core) and the size of the output are reported.
+
+Usage:
+    python benchmark_encoders.py --num-frames 600 --width 1920 --height 1080 --preset fast --bitrate 8000
+"""
+
+import gi
+
+gi.require_version("Gst", "1.0")
+
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import typer
+from gi.repository import Gst
+
+from owa_env_gst.encoders import EncoderSettings, available_encoders
+from owa_env_gst.gst_factory import screen_enc
+
+if not Gst.is_initialized():
+    Gst.init(None)
+
+app = typer.Typer()
+
+
+def encode(
+    encoder: str, settings: EncoderSettings, location: Path, *, num_frames: int, caps: str, pattern: str
+) -> tuple[float, float]:
+    """Encode `num_frames` test frames into `location`. Returns the wall-clock and CPU time in seconds."""
+    pipeline = Gst.parse_launch(
+        f"videotestsrc num-buffers={num_frames} pattern={pattern} ! {caps} ! "
+        f"{screen_enc(encoder, settings, source_memory='system')}"
+        f"matroskamux ! filesink location={location.as_posix()}"
+    )
+    bus = pipeline.get_bus()
+    start, start_cpu = time.perf_counter(), time.process_time()
+    pipeline.set_state(Gst.State.PLAYING)
+    try:
+        message = bus.timed_pop_filtered(Gst.CLOCK_TIME_NONE, Gst.MessageType.EOS | Gst.MessageType.ERROR)
+        if message.type == Gst.MessageType.ERROR:
+            err, debug = message.parse_error()
+            raise RuntimeError(f"{err} ({debug})")
+        return time.perf_counter() - start, time.process_time() - start_cpu
+    finally:
+        pipeline.set_state(Gst.State.NULL)
+
+
+@app.command()
+def main(
+    encoders: Optional[list[str]] = typer.Option(None, "--encoder", help="Encoders to compare, defaults to all"),
+    num_frames: int = typer.Option(600, "--num-frames", "-n", help="Number of frames to encode"),
+    width: int = typer.Option(1920, help="Width of the frames"),
+    height: int = typer.Option(1080, help="Height of the frames"),
+    fps: int = typer.Option(60, help="Frame rate of the content, which sets the duration of the output"),
+    pattern: str = typer.Option("ball", help="`videotestsrc` pattern, e.g. `ball`, `smpte` or `snow`"),
+    preset: Optional[str] = typer.Option(None, help="Preset of the encoders: `fast`, `medium` or `slow`"),
+    bitrate: Optional[int] = typer.Option(None, help="Bitrate of the encoders in kbit/s"),
+    keyframe_interval: Optional[int] = typer.Option(None, help="Maximum distance between keyframes in frames"),
+):
+    """Compare the encode rate, CPU usage and output size of the installed video encoders."""
+    encoders = encoders or available_encoders("video")
+    settings = EncoderSettings(preset=preset, bitrate=bitrate, keyframe_interval=keyframe_interval)
+    caps = f"video/x-raw,format=BGRA,width={width},height={height},framerate={fps}/1"
+    duration = num_frames / fps
+
+    typer.echo(f"{'encoder':<16}{'fps':>10}{'realtime':>10}{'cpu':>8}{'size (MiB)':>12}{'kbit/s':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for encoder in encoders:
+            location = Path(tmp_dir) / f"{encoder}.mkv"
+            try:
+                elapsed, cpu = encode(encoder, settings, location, num_frames=num_frames, caps=caps, pattern=pattern)
+            except Exception as e:
+                typer.echo(f"{encoder:<16}failed: {e}")
+                continue
+            size = os.path.getsize(location)
+            typer.echo(
+                f"{encoder:<16}{num_frames / elapsed:>10.1f}{duration / elapsed:>9.1f}x{cpu / elapsed:>7.0%}"
+                f"{size / 2**20:>12.2f}{size * 8 / 1000 / duration:>10.0f}"
+            )
+
+
+if __name__ == "__main__":
+    app()
@@ -1,49 +1,39 @@
 #!/usr/bin/env python3
+"""
+Benchmark screen capture backends and compare the results of two runs.
 
+Every backend captures frames for a fixed duration after a warm-up, and the per-frame latency distribution, the
+frame intervals (rate, jitter and longest gap) and the CPU, RSS and GPU timelines of this process are written to
+a JSON file. `compare` flags the metrics which regressed between two such files.
+
+Backends are either pulled, i.e. `grab()` is called in a loop paced to `--fps`, with the duration of the call as
+latency, or push frames from a GStreamer pipeline, with the time from capture to delivery as latency. `ximagesrc`
+and `videotestsrc` run on Linux without a physical display, e.g. under Xvfb:
+
+Usage:
+    xvfb-run -s "-screen 0 1920x1080x24" python benchmark_screen_captures.py run -b ximagesrc -b mss -o base.json
+    python benchmark_screen_captures.py run -b videotestsrc --width 1280 --height 720 --fps 240 -o new.json
+    python benchmark_screen_captures.py compare base.json new.json --threshold 10
+"""
+
+import json
 import os
-import queue
+import platform
 import sys
 import threading
 import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, ContextManager, Optional
 
-# Attempt optional imports for each capturing method
-try:
-    from PIL import ImageGrab
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
-
-try:
-    from mss import mss
-    MSS_AVAILABLE = True
-except ImportError:
-    MSS_AVAILABLE = False
-
-try:
-        import pyscreenshot as ImageGrab2
-        PYSCREENSHOT_AVAILABLE = True
-except ImportError:
-        PYSCREENSHOT_AVAILABLE = False
-        ImageGrab2 = None
-
-try:
-    from PyQt5.QtCore import QRect
-    from PyQt5.QtGui import QGuiApplication
-    from PyQt5.QtWidgets import QApplication
-    PYQT5_AVAILABLE = True
-except ImportError:
-    PYQT5_AVAILABLE = False
-
-# Attempt OWA-based import
-try:
-    from owa.registry import RUNNABLES, LISTENERS, activate_module
-    OWA_AVAILABLE = True
-except ImportError:
-    OWA_AVAILABLE = False
+import numpy as np
+import typer
 
 # For CPU & memory usage
 try:
     import psutil
+
     PSUTIL_AVAILABLE = True
 except ImportError:
     PSUTIL_AVAILABLE = False
@@ -51,350 +41,435 @@ except ImportError:
 # For GPU usage (NVIDIA only)
 try:
     import pynvml
+
     PYNVML_AVAILABLE = True
 except ImportError:
     PYNVML_AVAILABLE = False
 
+app = typer.Typer()
 
-###############################################################################
-# Helper: Resource Measurement
-###############################################################################
+NS_TO_MS = 1e-6
 
-class ResourceUsageMonitor:
+
+@dataclass(frozen=True)
+class CaptureConfig:
     """
-    Periodically samples CPU%, memory usage, and GPU usage (if available),
-    storing them in a queue. On stop(), aggregates average usage.
+    Args:
+        width: Width of the captured region, from the top-left corner of the screen, or of the synthetic frames.
+        height: Height of the captured region or of the synthetic frames.
+        fps: Target frame rate. Pulled backends are paced to it, 0 grabs as fast as possible.
+        duration: Duration of the measurement in seconds.
+        warmup: Duration in seconds before the measurement, during which frames are captured but not recorded.
     """
-    def __init__(self, interval=0.1):
-        """interval: sampling interval in seconds."""
-        self.interval = interval
-        self.stop_event = threading.Event()
-        self.samples = queue.Queue()
-        self.thread = threading.Thread(target=self._run, daemon=True)
-        self.process = psutil.Process(os.getpid()) if PSUTIL_AVAILABLE else None
 
-        self.gpu_handle = None
-        if PYNVML_AVAILABLE:
-            try:
-                pynvml.nvmlInit()
-                # By default, only look at GPU 0
-                self.gpu_handle = pynvml.nvmlDeviceGetHandleByIndex(0)
-            except:
-                self.gpu_handle = None
+    width: int = 1920
+    height: int = 1080
+    fps: float = 60
+    duration: float = 5.0
+    warmup: float = 1.0
 
-    def start(self):
-        if not PSUTIL_AVAILABLE:
-            print("WARNING: psutil not available; no CPU/memory usage will be measured.")
-        if not PYNVML_AVAILABLE:
-            print("WARNING: pynvml not available; GPU usage will not be measured.")
-        self.thread.start()
 
-    def stop(self):
-        self.stop_event.set()
-        self.thread.join()
+###############################################################################
+# Measurement
+###############################################################################
 
-    def _run(self):
-        while not self.stop_event.is_set():
-            cpu_percent = None
-            mem_val = None
-            gpu_percent = None
 
-            if self.process:
-                cpu_percent = self.process.cpu_percent(interval=None)
-                mem_info = self.process.memory_info()
-                mem_val = mem_info.rss / (1024 * 1024)  # Convert bytes to MB
+class FrameLog:
+    """Delivery times and latencies of the frames captured during the measurement. Appended from any one thread."""
 
-            if self.gpu_handle:
-                try:
-                    util = pynvml.nvmlDeviceGetUtilizationRates(self.gpu_handle)
-                    gpu_percent = util.gpu
-                except:
-                    pass
+    def __init__(self):
+        self.recording = False
+        self.delivered_ns: list[int] = []
+        self.latencies_ns: list[int] = []
 
-            # Fallbacks if something is missing
-            if cpu_percent is None:
-                cpu_percent = 0.0
-            if mem_val is None:
-                mem_val = 0.0
-            if gpu_percent is None:
-                gpu_percent = 0.0
+    def append(self, latency_ns: int):
+        if self.recording:
+            self.delivered_ns.append(time.perf_counter_ns())
+            self.latencies_ns.append(latency_ns)
 
-            self.samples.put((cpu_percent, mem_val, gpu_percent))
-            time.sleep(self.interval)
+    def summary(self, duration: float) -> dict:
+        latencies = np.asarray(self.latencies_ns, dtype=np.float64) * NS_TO_MS
+        intervals = np.diff(np.asarray(self.delivered_ns, dtype=np.float64)) * NS_TO_MS
+        summary = dict(frames=len(latencies), fps=len(latencies) / duration)
+        if len(latencies):
+            summary["latency_ms"] = _distribution(latencies)
+        if len(intervals):
+            summary["interval_ms"] = _distribution(intervals)
+            summary["jitter_ms"] = float(intervals.std())
+            summary["max_gap_ms"] = float(intervals.max())
+        return summary
 
-        def get_averages(self):
-            count = 0
-            total_cpu = 0.0
-            total_mem = 0.0
-            total_gpu = 0.0
 
-            while True:
-                try:
-                    cpu, mem, gpu = self.samples.get_nowait()
-                    count += 1
-                    total_cpu += cpu
-                    total_mem += mem
-                    total_gpu += gpu
-                except queue.Empty:
-                    break
-
-            if count == 0:
-                return (0.0, 0.0, 0.0)
-            return (total_cpu / count, total_mem / count, total_gpu / count)
-
-    def get_averages(self):
-        count = 0
-        total_cpu = 0.0
-        total_mem = 0.0
-        total_gpu = 0.0
-
-        while True:
+def _distribution(values: np.ndarray) -> dict:
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return dict(mean=float(values.mean()), p50=float(p50), p95=float(p95), p99=float(p99), max=float(values.max()))
+
+
+class ResourceMonitor:
+    """Samples the CPU usage (100% being one core), the RSS and the GPU usage of this process in a thread."""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.timeline = dict(t=[], cpu_percent=[], rss_mib=[], gpu_percent=[])
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._process = psutil.Process(os.getpid()) if PSUTIL_AVAILABLE else None
+        self._gpu_handle = None
+        if PYNVML_AVAILABLE:
             try:
-                cpu, mem, gpu = self.samples.get_nowait()
-                count += 1
-                total_cpu += cpu
-                total_mem += mem
-                total_gpu += gpu
-            except queue.Empty:
-                break
+                pynvml.nvmlInit()
+                # By default, only look at GPU 0
+                self._gpu_handle = pynvml.nvmlDeviceGetHandleByIndex(0)
+            except pynvml.NVMLError:
+                self._gpu_handle = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        if self._process is not None:
+            self._process.cpu_percent(interval=None)  # the first call only sets the reference
+        self._last_cpu = (time.perf_counter(), time.process_time())
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop_event.set()
+        self._thread.join()
 
-        if count == 0:
-            return (0.0, 0.0, 0.0)
-        return (total_cpu / count, total_mem / count, total_gpu / count)
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter()
+            if self._process is not None:
+                cpu_percent = self._process.cpu_percent(interval=None)
+                rss_mib = self._process.memory_info().rss / 2**20
+            else:
+                # without psutil, the CPU time of this process is still known, unlike its RSS
+                cpu_time = time.process_time()
+                last_now, last_cpu_time = self._last_cpu
+                cpu_percent = 100 * (cpu_time - last_cpu_time) / (now - last_now)
+                self._last_cpu = (now, cpu_time)
+                rss_mib = None
+            gpu_percent = None
+            if self._gpu_handle is not None:
+                try:
+                    gpu_percent = pynvml.nvmlDeviceGetUtilizationRates(self._gpu_handle).gpu
+                except pynvml.NVMLError:
+                    pass
+
+            self.timeline["t"].append(round(now - self._start, 3))
+            self.timeline["cpu_percent"].append(cpu_percent)
+            self.timeline["rss_mib"].append(rss_mib)
+            self.timeline["gpu_percent"].append(gpu_percent)
+
+    def summary(self) -> dict:
+        summary = {}
+        for key in ("cpu_percent", "rss_mib", "gpu_percent"):
+            values = [value for value in self.timeline[key] if value is not None]
+            if values:
+                summary[key] = dict(mean=float(np.mean(values)), max=float(np.max(values)))
+        summary["timeline"] = self.timeline
+        return summary
 
 
 ###############################################################################
-# Screen Capture Routines
+# Backends
 ###############################################################################
 
-owa_args = dict(fps=240, window_name=None, monitor_idx=None)
+# A pulled backend yields `grab`, which captures a frame and returns its capture-to-delivery latency in
+# nanoseconds if known, None to measure the duration of the call instead.
+PullBackend = Callable[[CaptureConfig], ContextManager[Callable[[], Optional[int]]]]
+# A pushed backend captures frames in the background while open and calls `on_frame(latency_ns)` for each.
+PushBackend = Callable[[CaptureConfig, Callable[[int], None]], ContextManager[None]]
 
-def capture_owa_runnable():
-    """
-    Capture using the OWA "owa_env_gst" module in runnable mode.
-    Warm-up for 2 seconds, then measure for 2 seconds.
-    Returns: (number_of_frames, elapsed_time)
-    """
-    if not OWA_AVAILABLE:
-        raise RuntimeError("OWA environment not available.")
+PULL_BACKENDS: dict[str, PullBackend] = {}
+PUSH_BACKENDS: dict[str, PushBackend] = {}
 
-    activate_module("owa_env_gst")
-    screen_capture = RUNNABLES["screen_capture"]()
-    screen_capture.configure(**owa_args)
-    screen_capture.start()
 
-    # Warm-up: capture frames for 2 seconds
-    warmup_start = time.time()
-    while time.time() - warmup_start < 2.0:
-        _ = screen_capture.grab()
+def pull_backend(name: str):
+    def register(func):
+        PULL_BACKENDS[name] = contextmanager(func)
+        return func
 
-    # Measurement: capture frames for 2 seconds
-    start = time.time()
-    count = 0
-    while time.time() - start < 2.0:
-        _ = screen_capture.grab()
-        count += 1
-    elapsed = time.time() - start
+    return register
 
-    screen_capture.stop()
-    screen_capture.join()
-    return (count, elapsed)
 
+def push_backend(name: str):
+    def register(func):
+        PUSH_BACKENDS[name] = contextmanager(func)
+        return func
 
-def capture_owa_listener():
-    """
-    Capture using the OWA "owa_env_gst" module in listener mode.
-    Warm-up for 2 seconds, then measure for 2 seconds.
-    Returns: (number_of_frames, elapsed_time)
-    """
-    if not OWA_AVAILABLE:
-        raise RuntimeError("OWA environment not available.")
+    return register
 
-    activate_module("owa_env_gst")
-    count = 0
 
-    def callback(x, proc):
-        nonlocal count
-        count += 1
+@pull_backend("pillow")
+def pillow(config: CaptureConfig):
+    from PIL import ImageGrab
 
-    screen_capture = LISTENERS["screen"]()
-    screen_capture.configure(**owa_args, callback=callback)
-    screen_capture.start()
+    bbox = (0, 0, config.width, config.height)
 
-    # Warm-up period
-    time.sleep(2)
+    def grab():
+        ImageGrab.grab(bbox=bbox)
 
-    start_count = count
-    time.sleep(2.0)
-    frame_count = count - start_count
+    yield grab
 
-    screen_capture.stop()
-    screen_capture.join()
-    return (frame_count, 2.0)
 
+@pull_backend("mss")
+def mss_(config: CaptureConfig):
+    from mss import mss
 
-def capture_pillow():
-    """
-    Capture using Pillow's ImageGrab.grab().
-    Warm-up for 2 seconds, then measure for 2 seconds.
-    Returns: (number_of_frames, elapsed_time)
-    """
-    if not PIL_AVAILABLE:
-        raise RuntimeError("Pillow/ImageGrab not available.")
+    region = dict(left=0, top=0, width=config.width, height=config.height)
+    with mss() as sct:
 
-    # Warm-up: capture frames for 2 seconds
-    warmup_start = time.time()
-    while time.time() - warmup_start < 2.0:
-        _ = ImageGrab.grab()
+        def grab():
+            sct.grab(region)
 
-    # Measurement: capture frames for 2 seconds
-    start = time.time()
-    count = 0
-    while time.time() - start < 2.0:
-        _ = ImageGrab.grab()
-        count += 1
-    elapsed = time.time() - start
-    return (count, elapsed)
+        yield grab
 
 
-def capture_mss():
-    """
-    Capture using mss.
-    Warm-up for 2 seconds, then measure for 2 seconds.
-    Returns: (number_of_frames, elapsed_time)
-    """
-    if not MSS_AVAILABLE:
-        raise RuntimeError("mss not available.")
-
-    sct = mss()
-    # Warm-up: capture frames for 2 seconds
-    warmup_start = time.time()
-    while time.time() - warmup_start < 2.0:
-        _ = sct.grab(sct.monitors[0])
-
-    # Measurement: capture frames for 2 seconds
-    start = time.time()
-    count = 0
-    while time.time() - start < 2.0:
-        _ = sct.grab(sct.monitors[0])
-        count += 1
-    elapsed = time.time() - start
-    sct.close()
-    return (count, elapsed)
-
-
-def capture_pyscreenshot():
-    """
-    Capture using pyscreenshot.
-    Warm-up for 2 seconds, then measure for 2 seconds.
-    Returns: (number_of_frames, elapsed_time)
-    """
-    if not PYSCREENSHOT_AVAILABLE:
-        raise RuntimeError("pyscreenshot not available.")
+@pull_backend("pyscreenshot")
+def pyscreenshot(config: CaptureConfig):
+    import pyscreenshot as ImageGrab
 
-    # Warm-up: capture frames for 2 seconds
-    warmup_start = time.time()
-    while time.time() - warmup_start < 2.0:
-        _ = ImageGrab2.grab()
+    bbox = (0, 0, config.width, config.height)
 
-    # Measurement: capture frames for 2 seconds
-    start = time.time()
-    count = 0
-    while time.time() - start < 2.0:
-        _ = ImageGrab2.grab()
-        count += 1
-    elapsed = time.time() - start
-    return (count, elapsed)
+    def grab():
+        ImageGrab.grab(bbox=bbox)
 
+    yield grab
 
-def capture_pyqt5():
-    """
-    Capture using PyQt5's primary screen grab.
-    Warm-up for 2 seconds, then measure for 2 seconds.
-    Returns: (number_of_frames, elapsed_time)
-    """
-    if not PYQT5_AVAILABLE:
-        raise RuntimeError("PyQt5 not available.")
 
-    # If there's already an instance, reuse it. Otherwise, create one.
-    app = QApplication.instance()
-    if not app:
-        app = QApplication(sys.argv)
+@pull_backend("pyqt5")
+def pyqt5(config: CaptureConfig):
+    from PyQt5.QtGui import QGuiApplication
+    from PyQt5.QtWidgets import QApplication
 
+    # If there's already an instance, reuse it. Otherwise, create one.
+    _app = QApplication.instance() or QApplication(sys.argv)
     screen = QGuiApplication.primaryScreen()
-    rect = screen.availableGeometry()
 
-    # Warm-up: capture frames for 2 seconds
-    warmup_start = time.time()
-    while time.time() - warmup_start < 2.0:
-        _ = screen.grabWindow(0, rect.x(), rect.y(), rect.width(), rect.height())
+    def grab():
+        screen.grabWindow(0, 0, 0, config.width, config.height)
+
+    yield grab
+
 
-    # Measurement: capture frames for 2 seconds
-    start = time.time()
-    count = 0
-    while time.time() - start < 2.0:
-        _ = screen.grabWindow(0, rect.x(), rect.y(), rect.width(), rect.height())
-        count += 1
-    elapsed = time.time() - start
+@pull_backend("owa-runnable")
+def owa_runnable(config: CaptureConfig):
+    from owa.registry import RUNNABLES, activate_module
+
+    activate_module("owa_env_gst")
+    screen_capture = RUNNABLES["screen_capture"]().configure(fps=config.fps or 240)
 
-    return (count, elapsed)
+    def grab():
+        frame = screen_capture.grab()
+        return time.time_ns() - frame.timestamp_ns
+
+    with screen_capture.session:
+        yield grab
+
+
+@push_backend("owa-listener")
+def owa_listener(config: CaptureConfig, on_frame: Callable[[int], None]):
+    from owa.registry import LISTENERS, activate_module
+
+    activate_module("owa_env_gst")
+    listener = LISTENERS["screen"]().configure(
+        fps=config.fps or 240, callback=lambda frame: on_frame(time.time_ns() - frame.timestamp_ns)
+    )
+    with listener.session:
+        yield
+
+
+def _gst_appsink_backend(src: str, config: CaptureConfig, on_frame: Callable[[int], None]):
+    from owa_env_gst.gst_runner import GstPipelineRunner
+    from owa_env_gst.utils import sample_to_ndarray
+
+    def callback(sample, metadata):
+        sample_to_ndarray(sample)  # the frame is converted as by `ScreenListener`
+        on_frame(metadata["latency"])
+
+    runner = GstPipelineRunner().configure(
+        f"{src} ! videoconvert ! video/x-raw,format=BGRA ! queue leaky=downstream max-size-buffers=1 ! "
+        "appsink name=appsink"
+    )
+    runner.register_appsink_callback(callback)
+    with runner.session:
+        yield
+
+
+@push_backend("ximagesrc")
+def ximagesrc(config: CaptureConfig, on_frame: Callable[[int], None]):
+    """X11 capture, e.g. of an Xvfb display."""
+    framerate = f",framerate={round(config.fps)}/1" if config.fps else ""
+    src = (
+        f"ximagesrc use-damage=false startx=0 starty=0 endx={config.width - 1} endy={config.height - 1} ! "
+        f"video/x-raw{framerate}"
+    )
+    yield from _gst_appsink_backend(src, config, on_frame)
+
+
+@push_backend("videotestsrc")
+def videotestsrc(config: CaptureConfig, on_frame: Callable[[int], None]):
+    """Synthetic frames, which measure the delivery path without any capture."""
+    framerate = round(config.fps) if config.fps else 240
+    src = (
+        f"videotestsrc is-live=true pattern=ball ! "
+        f"video/x-raw,width={config.width},height={config.height},framerate={framerate}/1"
+    )
+    yield from _gst_appsink_backend(src, config, on_frame)
+
+
+def measure(backend: str, config: CaptureConfig) -> dict:
+    """Capture frames with a backend for `config.warmup + config.duration` seconds and summarize the measurement."""
+    frames = FrameLog()
+    with ResourceMonitor() as monitor:
+        if backend in PUSH_BACKENDS:
+            with PUSH_BACKENDS[backend](config, frames.append):
+                time.sleep(config.warmup)
+                frames.recording = True
+                time.sleep(config.duration)
+                frames.recording = False
+        else:
+            period = 1 / config.fps if config.fps else 0.0
+            with PULL_BACKENDS[backend](config) as grab:
+                start = deadline = time.perf_counter()
+                while (now := time.perf_counter()) < start + config.warmup + config.duration:
+                    frames.recording = now >= start + config.warmup
+                    call_ns = time.perf_counter_ns()
+                    latency_ns = grab()
+                    frames.append(time.perf_counter_ns() - call_ns if latency_ns is None else latency_ns)
+                    if period:
+                        deadline += period
+                        time.sleep(max(0.0, deadline - time.perf_counter()))
+    return frames.summary(config.duration) | monitor.summary()
 
 
 ###############################################################################
-# Benchmarking Helper
+# Commands
 ###############################################################################
 
-def run_benchmark(name, func):
-    """
-    Runs a single benchmark, measuring capture time and resource usage.
-    Each capture function is assumed to return (frame_count, elapsed_time).
-    """
-    monitor = ResourceUsageMonitor(interval=0.1)
-    monitor.start()
-    try:
-        result = func()
-    except Exception as e:
-        monitor.stop()
-        print(f"Error in {name} capture: {e}")
-        return
-
-    monitor.stop()
-    avg_cpu, avg_mem, avg_gpu = monitor.get_averages()
-    frame_count, elapsed = result
-    print(f"[{name}] {frame_count} frames captured")
-    print(f"    Elapsed: {elapsed:.3f}s, {frame_count / elapsed:.2f} FPS")
-    print(f"    Avg CPU (%): {avg_cpu:.2f}")
-    print(f"    Avg Memory (MB): {avg_mem:.2f}")
-    if PYNVML_AVAILABLE:
-        print(f"    Avg GPU Usage (%): {avg_gpu:.2f}")
-    print("")
-    return result, avg_cpu, avg_mem, avg_gpu
-
-
-def plot_results(results):
-    # This function can be implemented to plot the benchmark results.
-    # For now, it is a placeholder.
-    print("Plotting is not yet implemented.")
-
-
-def main():
-    benchmarks = [
-        ("OWA (runnable)", capture_owa_runnable),
-        ("OWA (listener)", capture_owa_listener),
-        ("Pillow", capture_pillow),
-        ("mss", capture_mss),
-        ("pyscreenshot", capture_pyscreenshot),
-        ("PyQt5", capture_pyqt5),
-    ]
+BACKENDS = [*PULL_BACKENDS, *PUSH_BACKENDS]
+
+
+def _environment() -> dict:
+    environment = dict(platform=sys.platform, machine=platform.machine(), python=platform.python_version())
+    environment["cpu_count"] = os.cpu_count()
+    environment["display"] = os.environ.get("DISPLAY")
+    return environment
+
+
+@app.command()
+def run(
+    backends: Optional[list[str]] = typer.Option(
+        None, "--backend", "-b", help=f"Backends to benchmark, defaults to all. Choose from {', '.join(BACKENDS)}"
+    ),
+    width: int = typer.Option(1920, help="Width of the captured region or of the synthetic frames"),
+    height: int = typer.Option(1080, help="Height of the captured region or of the synthetic frames"),
+    fps: float = typer.Option(60, help="Target frame rate, 0 to grab as fast as possible"),
+    duration: float = typer.Option(5.0, help="Duration of the measurement of each backend in seconds"),
+    warmup: float = typer.Option(1.0, help="Duration of the warm-up of each backend in seconds"),
+    output: Optional[Path] = typer.Option(None, "--output", "-o", help="JSON file to write the results to"),
+):
+    """Benchmark screen capture backends."""
+    config = CaptureConfig(width=width, height=height, fps=fps, duration=duration, warmup=warmup)
+    if not PSUTIL_AVAILABLE:
+        typer.echo("WARNING: psutil not available; RSS will not be measured.")
+
     results = {}
+    typer.echo(f"{'backend':<16}{'fps':>8}{'p50 (ms)':>10}{'p99 (ms)':>10}{'jitter':>8}{'cpu':>8}{'rss (MiB)':>11}")
+    for backend in backends or BACKENDS:
+        if backend not in BACKENDS:
+            raise typer.BadParameter(f"Unknown backend {backend}, choose from {', '.join(BACKENDS)}")
+        try:
+            result = measure(backend, config)
+        except Exception as e:
+            typer.echo(f"{backend:<16}failed: {e!r}")
+            results[backend] = dict(error=repr(e))
+            continue
+        results[backend] = result
+        latency = result.get("latency_ms", {})
+        typer.echo(
+            f"{backend:<16}{result['fps']:>8.1f}{latency.get('p50', float('nan')):>10.2f}"
+            f"{latency.get('p99', float('nan')):>10.2f}{result.get('jitter_ms', float('nan')):>8.2f}"
+            f"{result.get('cpu_percent', {}).get('mean', float('nan')):>7.0f}%"
+            f"{result.get('rss_mib', {}).get('max', float('nan')):>11.1f}"
+        )
+
+    if output is not None:
+        report = dict(config=asdict(config), environment=_environment(), created=time.time(), results=results)
+        output.write_text(json.dumps(report, indent=2))
+        typer.echo(f"Results written to {output}")
+
+
+# metrics compared by `compare`, as a path into a result, and whether higher values are better
+COMPARED_METRICS = {
+    "fps": ("fps", True),
+    "latency p50 (ms)": ("latency_ms.p50", False),
+    "latency p99 (ms)": ("latency_ms.p99", False),
+    "jitter (ms)": ("jitter_ms", False),
+    "max gap (ms)": ("max_gap_ms", False),
+    "cpu (%)": ("cpu_percent.mean", False),
+    "rss max (MiB)": ("rss_mib.max", False),
+}
+
+
+def _lookup(result: dict, path: str) -> Optional[float]:
+    for key in path.split("."):
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+
+def find_regressions(base: dict, new: dict, threshold: float) -> list[tuple[str, str, float, float, float, bool]]:
+    """
+    Compare the results of the backends measured in both runs.
 
-    for name, func in benchmarks:
-        print(f"==== Benchmarking {name} ====")
-        result = run_benchmark(name, func)
-        results[name] = result
+    Args:
+        base: Results of the baseline run, as written by `run`.
+        new: Results of the run to check.
+        threshold: Relative change in percent beyond which a change for the worse is a regression.
 
-    plot_results(results)
+    Returns:
+        list: `(backend, metric, base, new, change in percent, is regression)` of every compared metric.
+    """
+    rows = []
+    for backend, base_result in base["results"].items():
+        new_result = new["results"].get(backend)
+        if new_result is None or "error" in base_result or "error" in new_result:
+            continue
+        for metric, (path, higher_is_better) in COMPARED_METRICS.items():
+            base_value, new_value = _lookup(base_result, path), _lookup(new_result, path)
+            if base_value is None or new_value is None or base_value == 0:
+                continue
+            change = 100 * (new_value - base_value) / abs(base_value)
+            worse = -change if higher_is_better else change
+            rows.append((backend, metric, base_value, new_value, change, worse > threshold))
+    return rows
+
+
+@app.command()
+def compare(
+    base: Path = typer.Argument(..., help="JSON results of the baseline"),
+    new: Path = typer.Argument(..., help="JSON results to check for regressions"),
+    threshold: float = typer.Option(10.0, help="Relative change in percent beyond which a metric regressed"),
+):
+    """Compare two runs and exit with status 1 if any metric regressed by more than `threshold` percent."""
+    base_report, new_report = json.loads(base.read_text()), json.loads(new.read_text())
+    if base_report["config"] != new_report["config"]:
+        typer.echo(f"WARNING: the runs were configured differently: {base_report['config']} != {new_report['config']}")
+
+    rows = find_regressions(base_report, new_report, threshold)
+    typer.echo(f"{'backend':<16}{'metric':<20}{'base':>10}{'new':>10}{'change':>9}")
+    for backend, metric, base_value, new_value, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        typer.echo(f"{backend:<16}{metric:<20}{base_value:>10.2f}{new_value:>10.2f}{change:>+8.1f}%{flag}")
+
+    regressions = sum(row[-1] for row in rows)
+    if regressions:
+        typer.echo(f"{regressions} metrics regressed by more than {threshold}%")
+        raise typer.Exit(code=1)
+    typer.echo("No regressions")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    app()
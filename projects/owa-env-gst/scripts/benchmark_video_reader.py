@@ -0,0 +1,81 @@
+# ruff: noqa: E402
+# To suppress the warning for E402, waiting for https://github.com/astral-sh/ruff/issues/3711
+"""
+Benchmark random-access frame reads on an OWA `.mkv` recording.
+
+Compares `OwaVideoReader` against seeking the pipeline once per frame, as `SeekExtension.seek` does.
+
+Usage:
+    python benchmark_video_reader.py recording.mkv --num-frames 200
+"""
+
+import gi
+
+gi.require_version("Gst", "1.0")
+
+import time
+from pathlib import Path
+
+import numpy as np
+import typer
+from gi.repository import Gst
+
+from owa_env_gst.reader import OwaVideoReader, build_video_index
+from owa_env_gst.utils import sample_to_ndarray, try_set_state, wait_for_message
+
+if not Gst.is_initialized():
+    Gst.init(None)
+
+app = typer.Typer()
+
+
+def read_with_seek_per_frame(video_path: str, timestamps: np.ndarray) -> list[np.ndarray]:
+    """Baseline: a flushing, non-keyframe seek through a pipeline state change for every requested frame."""
+    pipeline = Gst.parse_launch(
+        f"filesrc location={Path(video_path).as_posix()} ! matroskademux name=demux "
+        "demux.video_0 ! queue ! decodebin ! videoconvert ! video/x-raw,format=BGRA ! "
+        "appsink name=sink sync=false"
+    )
+    appsink = pipeline.get_by_name("sink")
+    frames = []
+    try:
+        for pts in timestamps:
+            try_set_state(pipeline, Gst.State.PAUSED)
+            pipeline.seek(
+                1.0, Gst.Format.TIME, Gst.SeekFlags.FLUSH, Gst.SeekType.SET, int(pts), Gst.SeekType.NONE, 0
+            )
+            wait_for_message(pipeline, Gst.MessageType.ASYNC_DONE)
+            frames.append(sample_to_ndarray(appsink.emit("pull-preroll")))
+    finally:
+        pipeline.set_state(Gst.State.NULL)
+    return frames
+
+
+@app.command()
+def main(
+    video_path: str = typer.Argument(..., help="Path to the .mkv recording"),
+    num_frames: int = typer.Option(200, "--num-frames", "-n", help="Number of random timestamps to read"),
+    seed: int = typer.Option(0, help="Seed of the random timestamps"),
+):
+    """Benchmark random-access throughput of OwaVideoReader against seek-per-frame."""
+    start = time.perf_counter()
+    index = build_video_index(video_path, use_cache=False)
+    typer.echo(f"Index of {len(index.pts_ns)} frames built in {time.perf_counter() - start:.2f}s")
+
+    rng = np.random.default_rng(seed)
+    timestamps = rng.integers(index.pts_ns[0], index.pts_ns[-1], size=num_frames)
+
+    start = time.perf_counter()
+    read_with_seek_per_frame(video_path, timestamps)
+    baseline = time.perf_counter() - start
+    typer.echo(f"[seek per frame] {num_frames / baseline:.2f} frames/s ({baseline:.2f}s)")
+
+    start = time.perf_counter()
+    with OwaVideoReader(video_path) as reader:
+        reader.get_frames(timestamps)
+    elapsed = time.perf_counter() - start
+    typer.echo(f"[OwaVideoReader] {num_frames / elapsed:.2f} frames/s ({elapsed:.2f}s), {baseline / elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    app()
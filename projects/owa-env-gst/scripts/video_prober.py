@@ -1,298 +1,193 @@
-import subprocess
-import statistics
-from collections import Counter
-import typer
+"""
+Analyze the frame types, GOPs and timestamp gaps of `.mkv` recordings, one at a time or a whole corpus.
+
+Frames are demuxed and parsed in-process with GStreamer, without decoding, see `owa_env_gst.reader.probe_video`.
+Recordings are probed in parallel processes, and each result is cached next to its recording, keyed by its size and
+mtime, so that re-running over a growing corpus only probes the new recordings.
+
+Usage:
+    python video_prober.py analyze recording.mkv --max-gops 3
+    python video_prober.py corpus recordings/ --jobs 8 --output summary.json
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
 from pathlib import Path
-import shutil
-import plotext as plt
-from typing import Dict, List
+from typing import Optional
 
-app = typer.Typer()
+import numpy as np
+import typer
 
+from owa_env_gst.reader import VideoProbe, probe_video, summarize_corpus, summarize_probe
 
-def get_frame_data(video_path: str):
-    """Extract all frames and their details using FFmpeg"""
-    cmd = [
-        "ffprobe",
-        "-v",
-        "error",
-        "-select_streams",
-        "v:0",
-        "-show_frames",
-        "-show_entries",
-        "frame=pict_type,pts_time,best_effort_timestamp_time",
-        "-of",
-        "csv=p=0",
-        video_path,
-    ]
-
-    result = subprocess.run(cmd, capture_output=True, text=True)
-
-    # Parse the output to find all frame types
-    frames = []
-    for line in result.stdout.splitlines():
-        parts = line.strip().split(",")
-        if len(parts) >= 2:
-            try:
-                # Use best_effort_timestamp if available, otherwise pts_time
-                if len(parts) >= 3 and parts[0]:
-                    timestamp = float(parts[0])
-                else:
-                    timestamp = float(parts[1])
-
-                frame_type = parts[-1]
-                frames.append({"type": frame_type, "timestamp": timestamp})
-            except (ValueError, IndexError):
-                continue
-
-    return sorted(frames, key=lambda x: x["timestamp"])
-
-
-def get_video_info(video_path: str) -> Dict:
-    """Get comprehensive video information"""
-    cmd = [
-        "ffprobe",
-        "-v",
-        "error",
-        "-select_streams",
-        "v:0",
-        "-show_entries",
-        "stream=codec_name,width,height,r_frame_rate,duration",
-        "-of",
-        "json",
-        video_path,
-    ]
-
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    import json
-
-    try:
-        data = json.loads(result.stdout)
-        stream = data.get("streams", [{}])[0]
-
-        # Parse the fps which is in the format "num/den"
-        fps_str = stream.get("r_frame_rate", "0/1")
-        if "/" in fps_str:
-            num, den = map(int, fps_str.split("/"))
-            fps = num / den
-        else:
-            fps = float(fps_str or 0)
-
-        return {
-            "codec": stream.get("codec_name", "unknown"),
-            "resolution": f"{stream.get('width', 0)}x{stream.get('height', 0)}",
-            "fps": fps,
-            "duration": float(stream.get("duration", 0)),
-        }
-    except (json.JSONDecodeError, IndexError):
-        return {"codec": "unknown", "resolution": "unknown", "fps": 0, "duration": 0}
-
-
-def visualize_frame_pattern(frames: List[Dict], max_frames: int = 120):
-    """Display a visual representation of frame patterns in terminal"""
-    # Create a frame type sequence for visualization
-    sequence = [frame["type"] for frame in frames]
+app = typer.Typer()
 
-    # Limit to max_frames to prevent terminal overflow
-    if len(sequence) > max_frames:
-        sequence = sequence[:max_frames]
+# Define colors for each frame type
+TYPE_COLORS = {
+    "I": typer.colors.BRIGHT_RED,
+    "P": typer.colors.BRIGHT_BLUE,
+    "B": typer.colors.BRIGHT_GREEN,
+}
 
-    # Define colors for each frame type
-    TYPE_COLORS = {
-        "I": typer.colors.BRIGHT_RED,
-        "P": typer.colors.BRIGHT_BLUE,
-        "B": typer.colors.BRIGHT_GREEN,
-        # Other frame types if needed
-    }
+
+def visualize_frame_pattern(probe: VideoProbe, max_frames: int = 120):
+    """Display a visual representation of frame patterns in terminal"""
+    sequence = probe.frame_type[:max_frames]
 
     # Build the visualization string
     frame_viz = ""
     for i, frame_type in enumerate(sequence):
-        color = TYPE_COLORS.get(frame_type, typer.colors.WHITE)
-        frame_viz += typer.style(frame_type, fg=color)
+        frame_viz += typer.style(str(frame_type), fg=TYPE_COLORS.get(frame_type, typer.colors.WHITE))
         # Add space every 10 frames for readability
         if (i + 1) % 10 == 0:
             frame_viz += " "
 
-    typer.echo(f"\nFrame Pattern (first {len(sequence)} frames):")
+    typer.echo(f"\nFrame Pattern (first {len(sequence)} frames, in decoding order):")
     typer.echo(frame_viz)
+    typer.echo("Legend: " + " ".join(typer.style(t, fg=color) for t, color in TYPE_COLORS.items()))
 
-    # Display a legend
-    legend = "Legend: "
-    for frame_type, color in TYPE_COLORS.items():
-        legend += typer.style(f"{frame_type}", fg=color) + " "
-    typer.echo(legend)
-
-
-def visualize_frame_distribution(frames: List[Dict]):
-    """Visualize the distribution of frame types using plotext"""
-    frame_types = [frame["type"] for frame in frames]
-    counts = Counter(frame_types)
-
-    # Calculate percentages for the pie chart
-    total = len(frame_types)
-    labels = []
-    values = []
-
-    for frame_type, count in sorted(counts.items()):
-        percentage = (count / total) * 100
-        labels.append(f"{frame_type}-frames: {count} ({percentage:.1f}%)")
-        values.append(count)
 
-    # Get terminal width for sizing
-    terminal_width = shutil.get_terminal_size().columns
-
-    # Create a bar chart
-    plt.clear_figure()
-    plt.bar(labels, values, orientation="horizontal")
-    plt.title("Frame Type Distribution")
-    plt.plotsize(min(terminal_width - 10, 100), 15)
-    plt.show()
-
-
-def visualize_gop_structure(frames: List[Dict], max_gops: int = 3):
+def visualize_gop_structure(probe: VideoProbe, max_gops: int = 3):
     """Visualize the GOP (Group of Pictures) structure"""
-    # Find I-frames to identify GOP boundaries
-    gop_starts = [i for i, frame in enumerate(frames) if frame["type"] == "I"]
-
-    # Limit to a few GOPs for clarity
-    if len(gop_starts) > max_gops + 1:
-        gop_starts = gop_starts[: max_gops + 1]
-
-    # Display each GOP
-    for i in range(len(gop_starts) - 1):
-        gop_frames = frames[gop_starts[i] : gop_starts[i + 1]]
-        gop_sequence = "".join([frame["type"] for frame in gop_frames])
-
-        # Calculate GOP size in frames
-        gop_size = len(gop_frames)
-
-        # Time interval
-        time_start = gop_frames[0]["timestamp"]
-        time_end = gop_frames[-1]["timestamp"]
-        time_interval = time_end - time_start
+    # frames before the first I-frame do not belong to a GOP
+    start = int(np.argmax(probe.frame_type == "I"))
+    for i, length in enumerate(probe.gop_lengths()[:max_gops]):
+        gop_types = "".join(probe.frame_type[start : start + length])
+        gop_pts = probe.pts_ns[start : start + length]
 
         typer.echo(f"\nGOP #{i + 1}:")
-        typer.echo(f"  Size: {gop_size} frames ({time_interval:.2f} seconds)")
-        typer.echo(f"  Sequence: {gop_sequence[:50]}{'...' if len(gop_sequence) > 50 else ''}")
-
-        # Count frame types in this GOP
-        type_counts = Counter([frame["type"] for frame in gop_frames])
-        frame_counts = ", ".join([f"{count} {type_}" for type_, count in type_counts.items()])
-        typer.echo(f"  Composition: {frame_counts}")
-
-
-def analyze_iframe_intervals(frames: List[Dict], fps: float, frame_count: bool = False):
-    """Analyze I-frame intervals and return statistics"""
-    # Extract only I-frames
-    iframes = [frame for frame in frames if frame["type"] == "I"]
-
-    if len(iframes) <= 1:
-        return None
+        typer.echo(f"  Size: {length} frames ({(gop_pts.max() - gop_pts.min()) / 1e9:.2f} seconds)")
+        typer.echo(f"  Sequence: {gop_types[:50]}{'...' if len(gop_types) > 50 else ''}")
+        typer.echo(f"  Composition: {', '.join(f'{gop_types.count(t)} {t}' for t in TYPE_COLORS if t in gop_types)}")
+        start += length
 
-    # Calculate intervals
-    timestamps = [frame["timestamp"] for frame in iframes]
-    intervals = [timestamps[i] - timestamps[i - 1] for i in range(1, len(timestamps))]
 
-    # Convert to frame count if requested
-    if frame_count and fps > 0:
-        intervals = [interval * fps for interval in intervals]
-        unit = "frames"
-    else:
-        unit = "seconds"
-
-    # Calculate statistics
-    stats = {
-        "count": len(iframes),
-        "min": min(intervals),
-        "max": max(intervals),
-        "mean": statistics.mean(intervals),
-        "median": statistics.median(intervals),
-        "unit": unit,
-        "consistent": max(intervals) - min(intervals) < 0.1 * fps if fps > 0 else False,
-    }
+def echo_summary(summary: dict):
+    typer.echo(typer.style("Video Information:", fg=typer.colors.BRIGHT_CYAN))
+    typer.echo(f"  Codec: {summary['codec']}")
+    typer.echo(f"  Resolution: {summary['resolution']}")
+    typer.echo(f"  Frame Rate: {summary['framerate']:.2f} fps (0 if variable)")
+    typer.echo(f"  Duration: {summary['duration']:.2f} seconds, {summary['frames']} frames")
 
-    return stats
+    typer.echo(typer.style("\nFrame Type Distribution:", fg=typer.colors.BRIGHT_CYAN))
+    for frame_type, count in summary["frame_types"].items():
+        mean_size = summary["frame_size"][frame_type]["mean"]
+        typer.echo(
+            f"  {frame_type}-frames: {count} ({100 * count / summary['frames']:.1f}%), mean {mean_size / 1024:.1f} KiB"
+        )
+
+    gop_frames, gop_seconds = summary["gop_frames"], summary["gop_seconds"]
+    if gop_seconds["count"]:
+        typer.echo(typer.style("\nGOP Analysis:", fg=typer.colors.BRIGHT_CYAN))
+        typer.echo(f"  GOPs: {gop_frames['count']}")
+        for unit, stats in (("frames", gop_frames), ("seconds", gop_seconds)):
+            typer.echo(
+                f"  Length ({unit}): min {stats['min']:.2f}, median {stats['median']:.2f}, "
+                f"mean {stats['mean']:.2f}, max {stats['max']:.2f}"
+            )
+
+    gaps = summary["gaps"]
+    typer.echo(typer.style("\nTimestamp Gaps:", fg=typer.colors.BRIGHT_CYAN))
+    typer.echo(f"  Median frame interval: {summary['interval']['median'] * 1000:.2f} ms")
+    typer.echo(f"  Gaps: {gaps['count']}, {gaps['total']:.2f} seconds in total, longest {gaps['max']:.2f} seconds")
 
 
 @app.command()
-def analyze_video(
-    video_path: str = typer.Argument(..., help="Path to the video file"),
+def analyze(
+    video_path: Path = typer.Argument(..., help="Path to the video file"),
     detailed: bool = typer.Option(False, "--detailed", "-d", help="Show detailed frame information"),
-    frame_count: bool = typer.Option(False, "--frames", "-f", help="Show intervals in frames instead of seconds"),
     max_frames: int = typer.Option(200, "--max-frames", "-m", help="Maximum frames to show in pattern visualization"),
     max_gops: int = typer.Option(3, "--max-gops", "-g", help="Maximum GOPs to analyze in detail"),
+    gap_factor: float = typer.Option(2.0, help="Frame intervals longer than this multiple of the median are gaps"),
+    use_cache: bool = typer.Option(True, "--cache/--no-cache", help="Whether to read and write the cached result"),
 ):
     """Analyze frame types and patterns in a video file"""
-    if not Path(video_path).exists():
+    if not video_path.exists():
         typer.echo(f"Error: File {video_path} does not exist")
         raise typer.Exit(1)
 
-    # Title
-    typer.echo(typer.style("📊 Advanced Video Frame Analysis 📊", fg=typer.colors.BRIGHT_MAGENTA, bold=True))
+    typer.echo(typer.style("📊 Video Frame Analysis 📊", fg=typer.colors.BRIGHT_MAGENTA, bold=True))
     typer.echo(f"Analyzing frames in {video_path}...\n")
+    probe = probe_video(video_path, use_cache=use_cache)
+    echo_summary(summarize_probe(probe, gap_factor=gap_factor))
+    visualize_frame_pattern(probe, max_frames)
+    visualize_gop_structure(probe, max_gops)
 
-    # Get video information
-    video_info = get_video_info(video_path)
-    fps = video_info["fps"]
-
-    # Show video metadata
-    typer.echo(typer.style("Video Information:", fg=typer.colors.BRIGHT_CYAN))
-    typer.echo(f"  Codec: {video_info['codec']}")
-    typer.echo(f"  Resolution: {video_info['resolution']}")
-    typer.echo(f"  Frame Rate: {fps:.2f} fps")
-    typer.echo(f"  Duration: {video_info['duration']:.2f} seconds")
-
-    # Get all frame data
-    frames = get_frame_data(video_path)
-
-    if not frames:
-        typer.echo("No frames detected or error processing the file")
-        raise typer.Exit(1)
-
-    # Count frame types
-    frame_types = Counter([frame["type"] for frame in frames])
-
-    # Display frame type counts
-    typer.echo(typer.style("\nFrame Type Distribution:", fg=typer.colors.BRIGHT_CYAN))
-    for frame_type, count in frame_types.items():
-        percentage = (count / len(frames)) * 100
-        typer.echo(f"  {frame_type}-frames: {count} ({percentage:.1f}%)")
-
-    # Analyze I-frame intervals
-    iframe_stats = analyze_iframe_intervals(frames, fps, frame_count)
+    # Show detailed frame list if requested
+    if detailed:
+        typer.echo(typer.style("\nDetailed Frame Information:", fg=typer.colors.BRIGHT_CYAN))
+        for i in range(min(max_frames, len(probe.frame_type))):
+            typer.echo(
+                f"  Frame {i}: Type={probe.frame_type[i]}, PTS={probe.pts_ns[i] / 1e9:.3f}s, Size={probe.size[i]} B"
+            )
+        if len(probe.frame_type) > max_frames:
+            typer.echo(f"  ... and {len(probe.frame_type) - max_frames} more frames")
 
-    if iframe_stats:
-        typer.echo(typer.style("\nI-frame Interval Analysis:", fg=typer.colors.BRIGHT_CYAN))
-        typer.echo(f"  Total I-frames: {iframe_stats['count']}")
-        typer.echo(f"  I-frame intervals ({iframe_stats['unit']}):")
-        typer.echo(f"    Minimum: {iframe_stats['min']:.2f}")
-        typer.echo(f"    Maximum: {iframe_stats['max']:.2f}")
-        typer.echo(f"    Average: {iframe_stats['mean']:.2f}")
-        typer.echo(f"    Median:  {iframe_stats['median']:.2f}")
 
-        if iframe_stats["consistent"]:
-            typer.echo(f"\n  Consistent GOP size detected: {iframe_stats['mean']:.2f} {iframe_stats['unit']}")
-        else:
-            typer.echo("\n  Variable GOP size detected")
+def _probe_and_summarize(path: Path, *, use_cache: bool, gap_factor: float) -> dict:
+    """Runs in a worker process, so only the summary is sent back instead of the per-frame arrays."""
+    return summarize_probe(probe_video(path, use_cache=use_cache), gap_factor=gap_factor)
 
-    # Visualize frame pattern
-    visualize_frame_pattern(frames, max_frames)
 
-    # Visualize frame type distribution
-    visualize_frame_distribution(frames)
+def find_recordings(paths: list[Path], pattern: str) -> list[Path]:
+    recordings = []
+    for path in paths:
+        recordings += sorted(path.rglob(pattern)) if path.is_dir() else [path]
+    return recordings
 
-    # Visualize GOP structure
-    visualize_gop_structure(frames, max_gops)
 
-    # Show detailed frame list if requested
-    if detailed:
-        typer.echo(typer.style("\nDetailed Frame Information:", fg=typer.colors.BRIGHT_CYAN))
-        for i, frame in enumerate(frames[:max_frames]):
-            typer.echo(f"  Frame {i}: Type={frame['type']}, Time={frame['timestamp']:.3f}s")
+@app.command()
+def corpus(
+    paths: list[Path] = typer.Argument(..., help="Recordings, or directories searched recursively for recordings"),
+    pattern: str = typer.Option("*.mkv", help="Pattern of the recordings in directories"),
+    jobs: int = typer.Option(os.cpu_count() or 1, "--jobs", "-j", help="Number of parallel processes"),
+    gap_factor: float = typer.Option(2.0, help="Frame intervals longer than this multiple of the median are gaps"),
+    use_cache: bool = typer.Option(True, "--cache/--no-cache", help="Whether to read and write the cached results"),
+    output: Optional[Path] = typer.Option(None, "--output", "-o", help="JSON file of the per-file and corpus summary"),
+):
+    """Analyze many recordings in parallel and summarize GOPs, frame types and timestamp gaps over the corpus."""
+    recordings = find_recordings(paths, pattern)
+    if not recordings:
+        typer.echo("No recordings found")
+        raise typer.Exit(1)
 
-        if len(frames) > max_frames:
-            typer.echo(f"  ... and {len(frames) - max_frames} more frames")
+    summaries, errors = {}, {}
+    analyze_one = partial(_probe_and_summarize, use_cache=use_cache, gap_factor=gap_factor)
+    with ProcessPoolExecutor(max_workers=min(jobs, len(recordings))) as executor:
+        futures = {executor.submit(analyze_one, path): path for path in recordings}
+        with typer.progressbar(as_completed(futures), length=len(futures), label="Probing") as progress:
+            for future in progress:
+                path = futures[future].as_posix()
+                try:
+                    summaries[path] = future.result()
+                except Exception as e:
+                    errors[path] = repr(e)
+
+    summary = summarize_corpus(summaries)
+    typer.echo(typer.style("\nCorpus Summary:", fg=typer.colors.BRIGHT_CYAN))
+    typer.echo(f"  Recordings: {summary['recordings']} ({len(errors)} failed), codecs: {', '.join(summary['codecs'])}")
+    typer.echo(f"  Duration: {summary['duration'] / 3600:.2f} hours, {summary['frames']} frames")
+    typer.echo(f"  Size: {summary['bytes'] / 2**30:.2f} GiB")
+    for frame_type, stats in summary["frame_types"].items():
+        typer.echo(f"  {frame_type}-frames: {stats['count']} ({100 * stats['fraction']:.1f}%)")
+    gop_frames = summary["gop_frames"]
+    if gop_frames["mean_of_recordings"]["count"]:
+        typer.echo(
+            f"  GOP length (frames): min {gop_frames['min']:.0f}, max {gop_frames['max']:.0f}, "
+            f"median of recordings {gop_frames['mean_of_recordings']['median']:.1f}"
+        )
+    gaps = summary["gaps"]
+    typer.echo(f"  Timestamp gaps: {gaps['count']} in {gaps['recordings']} recordings")
+    for longest, path in gaps["worst"]:
+        typer.echo(f"    {longest:.2f} seconds in {path}")
+    for path, error in errors.items():
+        typer.echo(f"  Failed: {path}: {error}")
+
+    if output is not None:
+        output.write_text(json.dumps(dict(corpus=summary, recordings=summaries, errors=errors), indent=2))
+        typer.echo(f"Summary written to {output}")
 
 
 if __name__ == "__main__":
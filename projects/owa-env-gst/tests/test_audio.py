@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from owa_env_gst import gst_factory
+from owa_env_gst.audio.ring_buffer import AudioRingBuffer
+
+
+def test_ring_buffer_window():
+    ring = AudioRingBuffer(capacity=8, channels=2, rate=1000)
+    # frames before the first write are silent
+    assert np.array_equal(ring.window(4), np.zeros((4, 2), dtype=np.float32))
+
+    frames = np.arange(26, dtype=np.float32).reshape(13, 2)
+    ring.write(frames[:5])
+    ring.write(frames[5:13])  # wraps around
+    assert ring.written == 13
+
+    window = ring.window(8)
+    assert np.array_equal(window, frames[5:13])
+    # a contiguous view into the buffer, not a copy
+    assert np.shares_memory(window, ring._buffer)
+    assert not window.flags.writeable
+    assert np.array_equal(ring.window_ms(3), frames[10:13])
+    assert np.array_equal(ring.window(2, end=11), frames[9:11])
+
+
+def test_ring_buffer_overwrite():
+    ring = AudioRingBuffer(capacity=8, channels=1)
+    ring.write(np.arange(6, dtype=np.float32))
+    end = ring.written
+    window = ring.window(4, end=end)
+    assert ring.is_intact(4, end)
+
+    ring.write(np.arange(6, 10, dtype=np.float32))
+    assert ring.is_intact(4, end)
+    ring.write(np.arange(10, 11, dtype=np.float32))
+    # the oldest frame of the window was overwritten
+    assert not ring.is_intact(4, end)
+    assert not np.array_equal(window.ravel(), [2, 3, 4, 5])
+    with pytest.raises(ValueError):
+        ring.window(4, end=end)
+
+    # chunks longer than the capacity keep their newest frames
+    ring.write(np.arange(100, 120, dtype=np.float32))
+    assert np.array_equal(ring.window(8).ravel(), np.arange(112, 120))
+    with pytest.raises(ValueError):
+        ring.window(9)
+
+
+def test_audio_src():
+    assert gst_factory.audio_src("wasapi2") == (
+        "wasapi2src do-timestamp=true loopback=true low-latency=true ! audioconvert ! "
+    )
+    assert gst_factory.audio_src("pulse") == "pulsesrc device=@DEFAULT_MONITOR@ do-timestamp=true ! audioconvert ! "
+    with pytest.raises(ValueError):
+        gst_factory.audio_src("alsa")
+
+    assert gst_factory.audio_capture_pipeline(backend="test", rate=48000, channels=2, chunk_ms=20) == (
+        "audiotestsrc is-live=true ! audioconvert ! audioresample ! "
+        "audio/x-raw,format=F32LE,layout=interleaved,rate=48000,channels=2 ! "
+        "audiobuffersplit output-buffer-duration=1/50 ! "
+        "appsink name=audio sync=false max-buffers=64 drop=true emit-signals=true wait-on-eos=false"
+    )
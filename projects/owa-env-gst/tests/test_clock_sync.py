@@ -0,0 +1,26 @@
+import numpy as np
+
+from owa_env_gst.clock_sync import ClockCalibrator
+
+
+def test_clock_calibrator_fits_drift():
+    calibrator = ClockCalibrator(window=60)
+    assert not calibrator.is_calibrated and calibrator.to_utc_ns(0) is None
+
+    rng = np.random.default_rng(0)
+    epoch_ns = 1_740_000_000_000_000_000
+    drift = 20e-6  # 20 ppm
+    for i in range(100):
+        running_ns = i * 1_000_000_000
+        utc_ns = epoch_ns + running_ns + int(running_ns * drift) + int(rng.normal(0, 2_000))
+        calibrator.add_sample(running_ns, utc_ns)
+
+    assert calibrator.is_calibrated
+    assert calibrator.num_samples == 60
+    assert abs(calibrator.drift_ppm - 20) < 1
+    assert calibrator.residual_ns < 5_000
+
+    # extrapolate 50 seconds past the last sample
+    running_ns = 150 * 1_000_000_000
+    expected_ns = epoch_ns + running_ns + int(running_ns * drift)
+    assert abs(calibrator.to_utc_ns(running_ns) - expected_ns) < 10_000
@@ -0,0 +1,45 @@
+import pytest
+
+from owa_env_gst import encoders, gst_factory
+from owa_env_gst.encoders import ENCODERS, EncoderSettings, select_encoder
+
+
+def test_encoder_settings():
+    assert ENCODERS["nvd3d11h265enc"].element() == "nvd3d11h265enc ! h265parse ! "
+    settings = EncoderSettings(preset="fast", bitrate=4000, keyframe_interval=120)
+    assert ENCODERS["x264enc"].element(settings) == (
+        "x264enc speed-preset=ultrafast bitrate=4000 key-int-max=120 ! h264parse ! "
+    )
+    assert ENCODERS["vp8enc"].element(settings) == (
+        "vp8enc deadline=1 cpu-used=16 target-bitrate=4000000 keyframe-max-dist=120 ! "
+    )
+    # audio encoders have no keyframe interval
+    assert ENCODERS["opusenc"].element(settings) == "opusenc complexity=0 bitrate=4000000 ! "
+    with pytest.raises(ValueError):
+        ENCODERS["x264enc"].element(EncoderSettings(preset="fastest"))
+
+
+def test_screen_enc():
+    assert gst_factory.screen_enc("x264enc") == (
+        "d3d11download ! videoconvert ! video/x-raw,format=I420 ! x264enc ! h264parse ! "
+    )
+    assert gst_factory.screen_enc("nvd3d11h264enc", source_memory="system") == (
+        "d3d11upload ! d3d11convert ! video/x-raw(memory:D3D11Memory),format=NV12 ! nvd3d11h264enc ! h264parse ! "
+    )
+    assert gst_factory.audio_enc("opusenc") == "audioresample ! opusenc ! "
+    with pytest.raises(ValueError):
+        gst_factory.screen_enc("opusenc")
+
+
+def test_select_encoder(monkeypatch):
+    installed = {"x264enc", "x265enc", "vp8enc", "opusenc"}
+    monkeypatch.setattr(encoders, "is_available", lambda name: name in installed)
+    assert select_encoder("video", "fastest") == "x264enc"
+    assert select_encoder("video", "smallest") == "x265enc"
+    assert select_encoder("audio") == "opusenc"
+
+    installed.clear()
+    with pytest.raises(RuntimeError):
+        select_encoder("video")
+    with pytest.raises(ValueError):
+        select_encoder("video", "cheapest")
@@ -0,0 +1,66 @@
+import numpy as np
+
+from owa_env_gst.frame_timestamps import (
+    FLAG_CALIBRATED,
+    FrameTimestamps,
+    FrameTimestampWriter,
+    SegmentedFrameTimestampWriter,
+    frames_path,
+)
+
+
+def test_frame_timestamps_roundtrip(tmp_path):
+    path = frames_path(tmp_path / "recording.mkv")
+    assert path.name == "recording.frames.bin"
+
+    with FrameTimestampWriter(path, block_size=4) as writer:
+        for i in range(10):
+            writer.append(i * 100, 1_000_000 + i * 100, FLAG_CALIBRATED if i >= 2 else 0)
+        # full blocks are written while recording, the rest on close
+        assert len(FrameTimestamps(path)) == 8
+
+    timestamps = FrameTimestamps(path)
+    assert len(timestamps) == 10
+    np.testing.assert_array_equal(timestamps.records["frame_index"], np.arange(10))
+    np.testing.assert_array_equal(timestamps.pts_ns, np.arange(10) * 100)
+    np.testing.assert_array_equal(timestamps.flags[:3], [0, 0, FLAG_CALIBRATED])
+    np.testing.assert_array_equal(timestamps.frame_at_utc([0, 1_000_050, 1_000_900, 2_000_000]), [0, 0, 9, 9])
+
+
+def test_frame_timestamps_partial_record(tmp_path):
+    path = tmp_path / "recording.frames.bin"
+    with FrameTimestampWriter(path) as writer:
+        writer.append(0, 1)
+        writer.append(1, 2)
+
+    # a crash in the middle of a write leaves a partial record behind
+    with open(path, "ab") as f:
+        f.write(b"\x00" * 7)
+    timestamps = FrameTimestamps(path)
+    np.testing.assert_array_equal(timestamps.utc_ns, [1, 2])
+
+
+def test_segmented_writer_splits_frames_at_segment_starts(tmp_path):
+    second = 1_000_000_000
+    writer = SegmentedFrameTimestampWriter(segment_duration=1.0, block_size=4)
+    # frames reach the writer before splitmuxsink reports the segment they open
+    writer.append(0, 100)
+    writer.start_segment(tmp_path / "rec_00000.mkv", 0)
+    for i in range(1, 6):
+        writer.append(i * second // 4, 100 + i)
+    # the segment is split at the keyframe after its duration, at 1.25s
+    writer.start_segment(tmp_path / "rec_00001.mkv", 5 * second // 4)
+    writer.append(6 * second // 4, 106)
+    # after a restart, the running time starts over
+    writer.restart()
+    writer.append(0, 200)
+    writer.append(second // 4, 201)
+    writer.start_segment(tmp_path / "rec_00002.mkv", 0)
+    writer.close()
+
+    first, second_, third = (FrameTimestamps(frames_path(tmp_path / f"rec_0000{i}.mkv")) for i in range(3))
+    assert first.utc_ns.tolist() == [100, 101, 102, 103, 104]
+    assert second_.utc_ns.tolist() == [105, 106]
+    assert second_.pts_ns.tolist() == [0, second // 4]
+    assert third.utc_ns.tolist() == [200, 201]
+    assert third.records["frame_index"].tolist() == [0, 1]
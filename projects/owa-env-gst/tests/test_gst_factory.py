@@ -1,4 +1,5 @@
 import gi
+import pytest
 
 gi.require_version("Gst", "1.0")
 
@@ -10,6 +11,12 @@ if not Gst.is_initialized():
     Gst.init(None)
 
 
+# the expected pipelines are those of Windows, e.g. with `wasapi2src` as the default audio source
+@pytest.fixture(autouse=True)
+def windows_platform(monkeypatch):
+    monkeypatch.setattr(gst_factory.sys, "platform", "win32")
+
+
 def test_recorder():
     pipeline = gst_factory.recorder_pipeline(
         filesink_location="test.mkv",
@@ -47,3 +54,100 @@ def test_screen_capture():
     )
     assert pipeline == expected_pipeline
     pipeline = Gst.parse_launch(pipeline)
+
+
+def test_screen_fanout():
+    pipeline = gst_factory.screen_fanout_pipeline(
+        [
+            gst_factory.ScreenOutput(name="vlm", fps=10),
+            gst_factory.ScreenOutput(name="policy", fps=30, width=640, height=360, format="RGB"),
+        ]
+    )
+    expected_pipeline = (
+        "d3d11screencapturesrc show-cursor=true do-timestamp=true ! "
+        "videorate drop-only=true ! "
+        "video/x-raw(memory:D3D11Memory),framerate=0/1,max-framerate=30/1 ! "
+        "tee name=t t. ! queue leaky=downstream ! "
+        "videorate drop-only=true ! video/x-raw(memory:D3D11Memory),framerate=0/1,max-framerate=10/1 ! "
+        "d3d11download ! videoconvert ! video/x-raw,format=BGRA ! appsink name=vlm sync=false max-buffers=1 "
+        "drop=true emit-signals=true wait-on-eos=false t. ! queue leaky=downstream ! "
+        "videorate drop-only=true ! video/x-raw(memory:D3D11Memory),framerate=0/1,max-framerate=30/1 ! "
+        "d3d11scale ! video/x-raw(memory:D3D11Memory),width=640,height=360 ! "
+        "d3d11download ! videoconvert ! video/x-raw,format=RGB ! appsink name=policy sync=false max-buffers=1 "
+        "drop=true emit-signals=true wait-on-eos=false"
+    )
+    assert pipeline == expected_pipeline
+    pipeline = Gst.parse_launch(pipeline)
+
+
+def test_utctimestampsrc():
+    assert gst_factory.utctimestampsrc() == "utctimestampsrc interval=1 ! subparse ! "
+    assert gst_factory.utctimestampsrc(interval=0.01, format="text") == "utctimestampsrc interval=0.01 format=text ! "
+
+
+def test_timestamp_identity():
+    pipeline = gst_factory.recorder_pipeline(
+        filesink_location="test.mkv",
+        record_audio=False,
+        record_timestamp=False,
+        enable_fpsdisplaysink=False,
+        timestamp_identity=True,
+    )
+    expected = (
+        "d3d11screencapturesrc show-cursor=true do-timestamp=true ! videorate drop-only=true ! "
+        "video/x-raw(memory:D3D11Memory),framerate=0/1,max-framerate=60/1 ! utctimestamper name=ts ! "
+        "tee name=t t. ! queue ! d3d11convert ! video/x-raw(memory:D3D11Memory),format=NV12 ! nvd3d11h265enc ! "
+        "h265parse ! queue ! mux. matroskamux name=mux ! filesink location=test.mkv"
+    )
+    assert pipeline == expected
+
+
+def test_segmented_recorder():
+    pipeline = gst_factory.recorder_pipeline(
+        filesink_location="rec.mkv",
+        record_video=False,
+        segment_duration=60,
+    )
+    expected = (
+        "wasapi2src do-timestamp=true loopback=true low-latency=true ! audioconvert ! avenc_aac ! queue ! "
+        "mux.audio_0 utctimestampsrc interval=1 post-messages=true ! subparse ! queue ! mux.subtitle_0 "
+        "splitmuxsink name=mux muxer-factory=matroskamux location=rec_%05d.mkv max-size-time=60000000000 "
+        "send-keyframe-requests=true"
+    )
+    assert pipeline == expected
+
+
+def test_shm_output_windows(monkeypatch):
+    monkeypatch.setattr(gst_factory.sys, "platform", "win32")
+    output = gst_factory.ScreenOutput(name="preview", fps=10, width=960, height=540)
+    pipeline = gst_factory.screen_fanout_pipeline([], shm_outputs=[output])
+    expected = (
+        "d3d11screencapturesrc show-cursor=true do-timestamp=true ! videorate drop-only=true ! "
+        "video/x-raw(memory:D3D11Memory),framerate=0/1,max-framerate=10/1 ! queue leaky=downstream ! "
+        "videorate drop-only=true ! video/x-raw(memory:D3D11Memory),framerate=0/1,max-framerate=10/1 ! "
+        "d3d11scale ! video/x-raw(memory:D3D11Memory),width=960,height=540 ! "
+        "d3d11ipcsink pipe-name=\\\\\\\\.\\\\pipe\\\\owa-preview sync=false"
+    )
+    assert pipeline == expected
+
+    reader = gst_factory.shm_reader_pipeline(gst_factory.ScreenOutput(name="preview", format="RGB"))
+    expected = (
+        "d3d11ipcsrc pipe-name=\\\\\\\\.\\\\pipe\\\\owa-preview ! d3d11download ! videoconvert ! video/x-raw,format=RGB ! "
+        "appsink name=preview sync=false max-buffers=1 drop=true emit-signals=true wait-on-eos=false"
+    )
+    assert reader == expected
+
+
+def test_shm_output_posix(monkeypatch):
+    monkeypatch.setattr(gst_factory.sys, "platform", "linux")
+    monkeypatch.setattr(gst_factory.tempfile, "gettempdir", lambda: "/tmp")
+    output = gst_factory.ScreenOutput(name="preview", width=960, height=540, format="RGB")
+    assert gst_factory.screen_to_shm(output) == (
+        "videoscale ! videoconvert ! video/x-raw,format=RGB,width=960,height=540 ! "
+        "shmsink socket-path=/tmp/owa-preview wait-for-connection=false sync=false"
+    )
+    assert gst_factory.shm_reader_pipeline(output) == (
+        "shmsrc socket-path=/tmp/owa-preview is-live=true do-timestamp=true ! "
+        "video/x-raw,format=RGB,width=960,height=540,framerate=0/1 ! "
+        "appsink name=preview sync=false max-buffers=1 drop=true emit-signals=true wait-on-eos=false"
+    )
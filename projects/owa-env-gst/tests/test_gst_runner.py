@@ -0,0 +1,63 @@
+import time
+
+from owa_env_gst.gst_runner import GstPipelineRunner
+from owa_env_gst.utils import get_reference_utc_ns
+
+
+def test_timestamp_meta_reaches_appsink():
+    frames, samples = [], []
+    runner = GstPipelineRunner().configure(
+        "videotestsrc num-buffers=10 ! video/x-raw,width=64,height=64 ! utctimestamper name=ts ! appsink name=sink"
+    )
+    runner.enable_timestamp_meta(callback=lambda pts_ns, utc_ns: frames.append(utc_ns))
+    runner.register_appsink_callback(lambda sample: samples.append(get_reference_utc_ns(sample.get_buffer())))
+    runner.start()
+    runner.join(timeout=10)
+
+    assert not runner.is_alive()
+    assert len(frames) == 10
+    # the appsink may drop samples which were not pulled in time, but every delivered one carries the meta
+    assert samples and all(utc_ns is not None for utc_ns in samples)
+    assert set(samples) <= set(frames)
+
+
+def test_drop_stats_attribute_drops_to_stages():
+    samples = []
+    runner = GstPipelineRunner().configure(
+        "videotestsrc is-live=true name=src ! video/x-raw,width=64,height=64,framerate=60/1 "
+        "! videorate name=rate max-rate=10 drop-only=true ! queue name=queue leaky=downstream max-size-buffers=1 "
+        "! appsink name=sink emit-signals=true sync=false max-buffers=1 drop=false",
+        do_not_modify_appsink_properties=True,
+    )
+    runner.enable_drop_stats()
+
+    def on_sample(sample):
+        # a consumer slower than the 10 fps past the videorate, so that the leaky queue drops
+        samples.append(sample)
+        time.sleep(0.2)
+
+    runner.register_appsink_callback(on_sample)
+    with runner.session:
+        time.sleep(2.0)
+        stats = runner.get_drop_stats()
+
+    src, rate, queue, sink = stats["src"], stats["rate"], stats["queue"], stats["sink"]
+    assert (src["kind"], rate["kind"], queue["kind"], sink["kind"]) == ("source", "videorate", "queue", "appsink")
+    assert src["in"] == src["out"] >= 60 and src["dropped"] == 0
+    # stages are read one after another while frames flow, so a later stage may count one more frame
+    # videorate keeps one in six frames of the 60 fps source
+    assert 0 < rate["in"] <= src["out"] + 1
+    assert rate["dropped"] > rate["out"] > 0 and rate["duplicated"] == 0
+    assert queue["dropped"] > 0 and queue["overruns"] > 0 and queue["last_drop_ns"] is not None
+    assert 0 < sink["out"] <= sink["in"] <= queue["out"] + 1
+    assert sink["out"] <= len(samples)
+
+
+def test_drop_stats_of_appsink_without_callback_are_unknown():
+    runner = GstPipelineRunner().configure("videotestsrc is-live=true ! appsink name=sink")
+    runner.enable_drop_stats()
+    with runner.session:
+        time.sleep(0.5)
+        stats = runner.get_drop_stats()["sink"]
+
+    assert stats["in"] > 0 and stats["out"] is None and stats["dropped"] is None
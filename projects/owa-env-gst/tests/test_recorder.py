@@ -18,3 +18,29 @@ def test_screen_capture():
     time.sleep(2)
     recorder.stop()
     recorder.join()
+
+
+def test_inprocess_recorder(tmp_path):
+    from owa_env_gst.frame_timestamps import FrameTimestamps, frames_path
+    from owa_env_gst.gst_factory import ScreenOutput
+
+    samples, frames = [], []
+    recorder = RUNNABLES["owa_env_gst/omnimodal/inprocess_recorder"]()
+    recorder.configure(
+        filesink_location=str(tmp_path / "output.mkv"),
+        record_audio=False,
+        appsink_outputs=[ScreenOutput(name="agent", fps=5, format="RGB")],
+        output_callbacks={"agent": lambda metadata: samples.append(metadata)},
+        frame_callback=lambda pts_ns, utc_ns: frames.append(utc_ns),
+        stop_timeout=5.0,
+    )
+    recorder.start()
+    time.sleep(2)
+    stats = recorder.get_drop_stats()
+    recorder.stop()
+    recorder.join(timeout=10)
+
+    assert not recorder.is_alive()
+    assert samples and frames
+    assert 0 < stats["agent"]["out"] <= len(samples)
+    assert len(FrameTimestamps(frames_path(tmp_path / "output.mkv"))) == len(frames)
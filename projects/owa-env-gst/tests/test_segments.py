@@ -0,0 +1,44 @@
+from owa_env_gst.segments import SegmentTracker, parse_gst_launch_message, read_manifest
+
+S = 1_000_000_000
+
+
+def message(structure: str) -> str:
+    return f'Got message #12 from element "mux" (element): {structure}'
+
+
+def test_parse_gst_launch_message():
+    assert parse_gst_launch_message(
+        message(
+            r'splitmuxsink-fragment-opened, location=(string)"C:/my\ recordings/rec_00001.mkv", running-time=(guint64)60000000000;'
+        )
+    ) == ("splitmuxsink-fragment-opened", {"location": "C:/my recordings/rec_00001.mkv", "running-time": 60 * S})
+    assert parse_gst_launch_message("/GstPipeline:pipeline0/GstIdentity:ts: last-message = chain") is None
+
+
+def test_segment_tracker(tmp_path):
+    segments = []
+    tracker = SegmentTracker(
+        manifest_path=tmp_path / "rec.segments.json", callback=lambda segment: segments.append(segment.index)
+    )
+    lines = [
+        # the first boundary may be reported before the first UTC reference
+        message(f"splitmuxsink-fragment-opened, location=(string){tmp_path}/rec_00000.mkv, running-time=(guint64)0;"),
+        message(f"utc-reference, running-time=(guint64){S}, utc=(guint64){1000 * S};"),
+        message(
+            f"splitmuxsink-fragment-closed, location=(string){tmp_path}/rec_00000.mkv, running-time=(guint64){60 * S};"
+        ),
+        message(
+            f"splitmuxsink-fragment-opened, location=(string){tmp_path}/rec_00001.mkv, running-time=(guint64){60 * S};"
+        ),
+        message(
+            f"splitmuxsink-fragment-closed, location=(string){tmp_path}/rec_00001.mkv, running-time=(guint64){90 * S};"
+        ),
+    ]
+    for line in lines:
+        tracker.feed_line(line)
+
+    assert segments == [0, 0, 1, 1]
+    manifest = read_manifest(tmp_path / "rec.segments.json")
+    assert [(s.start_utc_ns, s.end_utc_ns) for s in manifest] == [(999 * S, 1059 * S), (1059 * S, 1089 * S)]
+    assert manifest[1].video == (tmp_path / "rec_00001.mkv").as_posix()
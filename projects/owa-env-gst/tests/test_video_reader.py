@@ -0,0 +1,198 @@
+import numpy as np
+import pytest
+
+from owa_env_gst.reader import (
+    OwaVideoReader,
+    TimestampTrack,
+    VideoIndex,
+    VideoProbe,
+    probe_video,
+    summarize_corpus,
+    summarize_probe,
+)
+from owa_env_gst.reader.cache import load_sidecar, save_sidecar
+from owa_env_gst.reader.probe import PROBE_SUFFIX, classify_frames
+from owa_env_gst.reader.timestamps import _parse_timestamp
+from owa_env_gst.reader.video_reader import _pull_samples
+from owa_env_gst.utils import sample_to_ndarray, try_set_state
+
+NUM_FRAMES = 60
+KEYFRAME_INTERVAL = 10
+FRAME_NS = 1_000_000_000 // 30
+
+
+@pytest.fixture(scope="module")
+def recording(tmp_path_factory):
+    """A 2-second, 30 fps H.264 recording with a keyframe every 10 frames, and each of its decoded frames."""
+    from gi.repository import Gst
+
+    path = tmp_path_factory.mktemp("video") / "recording.mkv"
+    # the moving ball makes every frame distinct, and scene cuts would insert keyframes of their own
+    pipeline = Gst.parse_launch(
+        f"videotestsrc pattern=ball num-buffers={NUM_FRAMES} ! video/x-raw,width=64,height=48,framerate=30/1 ! "
+        f"videoconvert ! x264enc speed-preset=ultrafast key-int-max={KEYFRAME_INTERVAL} option-string=scenecut=0 ! "
+        f"h264parse ! matroskamux ! filesink location={path.as_posix()}"
+    )
+    try_set_state(pipeline, Gst.State.PLAYING)
+    msg = pipeline.get_bus().timed_pop_filtered(10 * Gst.SECOND, Gst.MessageType.EOS | Gst.MessageType.ERROR)
+    pipeline.set_state(Gst.State.NULL)
+    assert msg is not None and msg.type == Gst.MessageType.EOS
+
+    # reference frames, decoded from start to end without seeking
+    pipeline = Gst.parse_launch(
+        f"filesrc location={path.as_posix()} ! matroskademux ! decodebin ! videoconvert ! video/x-raw,format=BGRA ! "
+        "appsink name=sink sync=false emit-signals=false"
+    )
+    try_set_state(pipeline, Gst.State.PLAYING)
+    try:
+        frames = [
+            np.array(sample_to_ndarray(sample)) for sample in _pull_samples(pipeline, pipeline.get_by_name("sink"))
+        ]
+    finally:
+        pipeline.set_state(Gst.State.NULL)
+    assert len(frames) == NUM_FRAMES
+    return path, np.stack(frames)
+
+
+def test_video_index_lookup():
+    index = VideoIndex(
+        pts_ns=np.arange(10, dtype=np.int64) * 100,
+        keyframe=np.array([1, 0, 0, 0, 1, 0, 0, 0, 1, 0], dtype=bool),
+    )
+    np.testing.assert_array_equal(index.frame_at([-5, 0, 99, 100, 450, 10_000]), [0, 0, 0, 1, 4, 9])
+    np.testing.assert_array_equal(index.keyframe_before([0, 3, 4, 7, 9]), [0, 0, 4, 4, 8])
+
+
+def test_sidecar_cache(tmp_path):
+    recording = tmp_path / "recording.mkv"
+    recording.write_bytes(b"0" * 16)
+
+    assert load_sidecar(recording, ".index.npz") is None
+    save_sidecar(recording, ".index.npz", pts_ns=np.arange(3))
+    np.testing.assert_array_equal(load_sidecar(recording, ".index.npz")["pts_ns"], np.arange(3))
+
+    # the cache is invalidated once the recording changes
+    recording.write_bytes(b"0" * 32)
+    assert load_sidecar(recording, ".index.npz") is None
+
+
+def test_timestamp_track_conversion():
+    base = 1_740_134_045_000_000_000
+    # the wall clock runs 1% faster than the pipeline clock after the second subtitle
+    track = TimestampTrack(
+        pts_ns=np.array([0, 1_000_000_000, 2_000_000_000], dtype=np.int64),
+        utc_ns=np.array([base, base + 1_000_000_000, base + 2_010_000_000], dtype=np.int64),
+    )
+    np.testing.assert_array_equal(
+        track.pts_to_utc([-500_000_000, 500_000_000, 1_500_000_000, 3_000_000_000]),
+        [base - 500_000_000, base + 500_000_000, base + 1_505_000_000, base + 3_020_000_000],
+    )
+    # nanosecond precision is kept despite the epoch's magnitude
+    pts_ns = np.array([-7, 123_456_789, 2_999_999_999], dtype=np.int64)
+    np.testing.assert_array_equal(track.utc_to_pts(track.pts_to_utc(pts_ns)), pts_ns)
+
+
+def test_parse_timestamp_payloads():
+    utc_ns = 1_740_134_045_272_214_800
+    assert _parse_timestamp(b"%d" % utc_ns) == utc_ns
+    assert _parse_timestamp(b"%d\n" % utc_ns) == utc_ns
+    assert _parse_timestamp(utc_ns.to_bytes(8, "big")) == utc_ns
+
+
+def test_classify_frames():
+    # decoding order of an IPBB GOP: I0 P3 B1 B2, then the next GOP
+    pts_ns = np.array([0, 3, 1, 2, 4, 7, 5, 6]) * 100
+    keyframe = np.array([1, 0, 0, 0, 1, 0, 0, 0], dtype=bool)
+    assert "".join(classify_frames(pts_ns, keyframe)) == "IPBBIPBB"
+    assert "".join(classify_frames(np.arange(4), np.array([1, 0, 0, 0], dtype=bool))) == "IPPP"
+
+
+def _probe(frame_type: str, pts_ns) -> VideoProbe:
+    return VideoProbe(
+        codec="video/x-h264",
+        width=1920,
+        height=1080,
+        framerate=0.0,
+        pts_ns=np.asarray(pts_ns, dtype=np.int64),
+        dts_ns=np.full(len(frame_type), -1, dtype=np.int64),
+        size=np.where(np.array(list(frame_type)) == "I", 1000, 100),
+        frame_type=np.array(list(frame_type)),
+    )
+
+
+def test_summarize_probe():
+    # 60 fps with a gap of 0.5 seconds before the 7th frame
+    pts_ns = np.array([0, 1, 2, 3, 4, 5, 35, 36]) * 16_666_667
+    summary = summarize_probe(_probe("PIPPIPPP", pts_ns))
+
+    np.testing.assert_array_equal(_probe("PIPPIPPP", pts_ns).gop_lengths(), [3, 4])
+    assert summary["frames"] == 8
+    assert summary["frame_types"] == {"I": 2, "P": 6}
+    assert summary["frame_size"]["I"]["mean"] == 1000
+    assert summary["gop_frames"]["min"] == 3 and summary["gop_frames"]["max"] == 4
+    assert summary["gaps"]["count"] == 1
+    assert abs(summary["gaps"]["max"] - 0.5) < 1e-3
+
+    corpus = summarize_corpus({"a.mkv": summary, "b.mkv": summarize_probe(_probe("IPPP", np.arange(4) * 100))})
+    assert corpus["recordings"] == 2 and corpus["frames"] == 12
+    assert corpus["frame_types"]["I"] == dict(count=3, fraction=0.25)
+    assert corpus["gop_frames"]["max"] == 4
+    assert corpus["gaps"]["recordings"] == 1 and corpus["gaps"]["worst"][0][1] == "a.mkv"
+
+
+def test_probe_video_cache(tmp_path):
+    recording = tmp_path / "recording.mkv"
+    recording.write_bytes(b"0" * 16)
+    probe = _probe("IPBB", [0, 300, 100, 200])
+    save_sidecar(recording, PROBE_SUFFIX, **probe._asdict())
+
+    cached = probe_video(recording)
+    assert cached.codec == probe.codec and cached.width == 1920 and cached.framerate == 0.0
+    np.testing.assert_array_equal(cached.frame_type, probe.frame_type)
+    np.testing.assert_array_equal(cached.pts_ns, probe.pts_ns)
+
+
+def test_video_reader_reads_exact_frames(recording):
+    path, frames = recording
+    with OwaVideoReader(path, use_cache=False) as reader:
+        assert len(reader) == NUM_FRAMES
+        np.testing.assert_array_equal(
+            np.flatnonzero(reader.index.keyframe), np.arange(0, NUM_FRAMES, KEYFRAME_INTERVAL)
+        )
+
+        # around and between keyframes, forward and backward
+        for frame_idx in [0, 9, 10, 11, 25, 19, 20, 59, 5, 30, 29]:
+            np.testing.assert_array_equal(reader.get_frame(reader.index.pts_ns[frame_idx]), frames[frame_idx])
+        # a timestamp between two frames is served by the one displayed at it
+        np.testing.assert_array_equal(reader.get_frame(reader.index.pts_ns[14] + FRAME_NS // 2), frames[14])
+
+        frame_indices = [42, 3, 17, 3, 58]
+        np.testing.assert_array_equal(reader.get_frames(reader.index.pts_ns[frame_indices]), frames[frame_indices])
+
+
+@pytest.mark.parametrize("max_forward_frames, seeks", [(3, 2), (5, 1)])
+def test_video_reader_max_forward_frames(recording, monkeypatch, max_forward_frames, seeks):
+    path, frames = recording
+    reader = OwaVideoReader(path, use_cache=False, max_forward_frames=max_forward_frames)
+    seeked = []
+    seek = reader._seek
+    monkeypatch.setattr(reader, "_seek", lambda frame_idx: (seeked.append(frame_idx), seek(frame_idx)))
+
+    with reader:
+        np.testing.assert_array_equal(reader.get_frame(reader.index.pts_ns[8]), frames[8])
+        # 4 frames ahead, in the next GOP: decoded forward only if within `max_forward_frames`
+        np.testing.assert_array_equal(reader.get_frame(reader.index.pts_ns[12]), frames[12])
+
+    assert len(seeked) == seeks
+
+
+def test_probe_video(recording):
+    path, _ = recording
+    probe = probe_video(path, use_cache=False)
+
+    assert (probe.codec, probe.width, probe.height, probe.framerate) == ("video/x-h264", 64, 48, 30.0)
+    assert len(probe.pts_ns) == NUM_FRAMES and probe.size.min() > 0
+    assert "".join(probe.frame_type) == ("I" + "P" * (KEYFRAME_INTERVAL - 1)) * (NUM_FRAMES // KEYFRAME_INTERVAL)
+    # Matroska stores timestamps in milliseconds
+    assert np.all(np.abs(np.diff(np.sort(probe.pts_ns)) - FRAME_NS) <= 1_000_000)
+    np.testing.assert_array_equal(probe.gop_lengths(), [KEYFRAME_INTERVAL] * (NUM_FRAMES // KEYFRAME_INTERVAL))
@@ -0,0 +1,32 @@
+import time
+
+from owa_env_gst.gst_runner import GstPipelineRunner
+
+
+def test_watchdog_restarts_stalled_pipeline():
+    stalls = []
+    runner = GstPipelineRunner().configure(
+        "videotestsrc is-live=true ! video/x-raw,width=64,height=64,framerate=60/1 ! valve name=valve ! fakesink"
+    )
+    runner.enable_watchdog(element_names=["valve"], stall_timeout=0.5, backoff_initial=0.5, callback=stalls.append)
+    valve = runner.pipeline.get_by_name("valve")
+
+    with runner.session:
+        time.sleep(1.0)
+        assert runner.get_watchdog_stats()["state"] == "running"
+
+        # the valve drops every buffer, as a hung source would stop producing them
+        valve.set_property("drop", True)
+        time.sleep(1.5)
+        stats = runner.get_watchdog_stats()
+        assert stats["state"] in ("waiting", "recovering") and stats["restarts"] >= 1
+        assert stats["stall"]["elements"] == ["valve"]
+
+        valve.set_property("drop", False)
+        time.sleep(2.0)
+
+    assert len(stalls) == 1
+    stall = stalls[0]
+    assert stall["restarts"] >= 1
+    assert 0.5 <= stall["duration"] and stall["recovery_time"] <= stall["duration"]
+    assert stall["start_ns"] <= stall["detected_ns"] <= stall["recovered_ns"]